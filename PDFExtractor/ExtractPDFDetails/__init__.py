@@ -1,19 +1,61 @@
 import logging
 import azure.functions as func
-import fitz  # PyMuPDF
+import hashlib
 import io
 import json
-import pandas as pd
-from dotenv import load_dotenv
 import os
+import threading
 import time
-from datetime import datetime
+from concurrent.futures import TimeoutError as FutureTimeoutError, wait as wait_futures
+from datetime import datetime, timedelta, timezone
 import math
+import random
 import traceback
-import requests
+# pandas, PyMuPDF (fitz), requests and python-dotenv are imported where they are
+# first used: they dominate cold-start import time and many requests never need them
+from .admission import ADMISSION_QUEUE_SECONDS, admission_controller, admit_extraction, release_extraction
+from .cassette import active_cassette
+from .coalescer import WriteCoalescer
+from .deadline import (
+    DeadlineExceeded, check_deadline, clear_deadline, remaining_time, request_budget, start_deadline
+)
+from .journal import journal_store, open_journal
+from .notifications import (
+    NOTIFICATION_CLIENT_STATE, NOTIFICATION_URL, SUBSCRIPTION_MINUTES, NotificationCatchUp, delta_links,
+    notified_list_id,
+)
+from .instrumentation import emit_metrics, prime_telemetry, record_graph_call, record_page, stage, start_run
+from .profiling import InvocationProfiler, requested_profile_mode
+from .resilience import (
+    CIRCUIT_BREAKER, HEDGE_ENDPOINTS, STALE_EXCLUDED_ENDPOINTS, CircuitOpenError, circuit_breaker, hedged_send, remember_response,
+    stale_response,
+)
+from .reports import CONTENT_TYPES, NO_ENTRIES_LOG_FORMAT, StreamBody, spool_report, spool_stream
+from .singleflight import SINGLE_FLIGHT, acquire_lease, pdf_locks, single_flight
+from .snapshot import open_snapshot
+from .tracing import span, start_span
+from .watermarks import open_watermarks
+
+def _load_local_env():
+    """
+    Load a local .env file the way load_dotenv() finds it (this directory and its
+    parents). Deployed apps configure app settings instead, so python-dotenv is
+    only imported when a .env file actually exists.
+    """
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        candidate = os.path.join(directory, ".env")
+        if os.path.isfile(candidate):
+            from dotenv import load_dotenv
+            load_dotenv(candidate)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
 
 # Load environment variables from .env file in the same directory
-load_dotenv()
+_load_local_env()
 
 SITE_URL = os.environ.get("SHAREPOINT_SITE_URL")
 SITE_NAME = os.environ.get("SHAREPOINT_SITE_NAME")
@@ -24,9 +66,208 @@ LIST_NAME = os.environ.get("SHAREPOINT_LIST_NAME")
 WELLPLANAON_LIST_NAME = os.environ.get("SHAREPOINT_WELLPLANAON_LIST_NAME")
 OUTPUT_LIBRARY = os.environ.get("SHAREPOINT_OUTPUT_LIBRARY")
 GRAPH_BASE = os.getenv("GRAPH_BASE", "https://graph.microsoft.com/v1.0")  # Default fallback
+LOGIN_BASE = os.getenv("LOGIN_BASE", "https://login.microsoftonline.com")  # Token authority
+GRAPH_BATCH_LIMIT = 20  # Max sub-requests per Graph $batch call
+# Larger uploads go through a resumable upload session instead of a single PUT
+SIMPLE_UPLOAD_MAX_BYTES = int(os.getenv("SIMPLE_UPLOAD_MAX_BYTES", str(4 * 1024 * 1024)))
+# Upload session chunk size; Graph requires a multiple of 320 KiB
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(10 * 320 * 1024)))
+# Shift every later WellPlanAON entry of a rig when its next move slips (overridable per request with ?cascade=)
+WELLPLANAON_CASCADE = os.getenv("WELLPLANAON_CASCADE", "false").lower() == "true"
+# per-run: a NoEntriesFound_<timestamp> file per run; daily: append to one NoEntriesFound_<date>.xlsx table
+NO_ENTRIES_LOG_MODE = os.getenv("NO_ENTRIES_LOG_MODE", "per-run").lower()
+DAILY_LOG_TABLE = "NoEntries"
+DAILY_LOG_COLUMNS = ["Logged", "Well", "Rig", "ItemID", "Error"]
+WORKBOOK_APPEND_BATCH = 500  # Rows per workbook rows/add call
+# Reuse a persistent workbook session while it is younger than this (Graph expires idle sessions after ~5 minutes)
+WORKBOOK_SESSION_IDLE = 240
+# Send DDR item creates and WellPlanAON updates through the worker-wide write coalescer
+WRITE_COALESCING = os.getenv("WRITE_COALESCING", "true").lower() == "true"
+# Once the budget is spent, wait up to this long (within DEADLINE_MARGIN) for coalesced writes already queued
+WRITE_COALESCE_DRAIN_SECONDS = float(os.getenv("WRITE_COALESCE_DRAIN_SECONDS", "5"))
+# Refresh the cached Graph token this many seconds before it expires
+TOKEN_REFRESH_MARGIN = 300
+# Seconds a WellPlanAON index (preloaded by warm-up or scanned by a lookup) serves lookups
+WELLPLANAON_INDEX_TTL = int(os.getenv("WELLPLANAON_INDEX_TTL", "300"))
+# How WellPlanAON lookups reach the list: auto ($filter when the filtered columns
+# are indexed, otherwise one scan into the index), filter (always $filter, with the
+# non-indexed query Prefer header) or scan
+WELLPLANAON_QUERY_MODE = os.getenv("WELLPLANAON_QUERY_MODE", "auto").lower()
+# The only WellPlanAON fields lookups read; list scans $select just these
+WELLPLANAON_FIELDS = ["RigName", "WellName", "StartDate", "EndDate"]
+# Send WellPlanAON updates with If-Match on the eTag they were planned from, so
+# concurrent runs and SharePoint edits are never silently overwritten
+WELLPLANAON_IF_MATCH = os.getenv("WELLPLANAON_IF_MATCH", "true").lower() == "true"
+# Re-reads and re-plans of an item whose update hit a 412 before it is logged as a conflict
+WELLPLANAON_CONFLICT_RETRIES = int(os.getenv("WELLPLANAON_CONFLICT_RETRIES", "5"))
+# Base of the jittered backoff before each re-read, so runs racing for an item take turns
+WELLPLANAON_CONFLICT_BACKOFF = float(os.getenv("WELLPLANAON_CONFLICT_BACKOFF", "0.1"))
+# Preload the WellPlanAON index on warm-up (overridable per request with ?index=)
+WARMUP_PRELOAD_INDEX = os.getenv("WARMUP_PRELOAD_INDEX", "false").lower() == "true"
+# Pooled connections kept per host; concurrent invocations beyond this open throwaway connections
+GRAPH_POOL_CONNECTIONS = int(os.getenv("GRAPH_POOL_CONNECTIONS", "32"))
+
+# Process-wide state reused across invocations on a warm instance. The Functions
+# host runs up to PYTHON_THREADPOOL_THREAD_COUNT invocations at once in this
+# process, so everything mutable here is guarded by a lock.
+_session = None
+_session_lock = threading.Lock()
+_token_lock = threading.Lock()
+_token_cache = {"access_token": None, "expires_at": 0.0}
+# Held while resolving site/list/drive IDs, so concurrent cold invocations resolve them once
+_ids_lock = threading.RLock()
+_site_id_cache = {}
+_list_id_cache = {}
+_drive_id_cache = {}
+_indexed_columns_cache = {}
+# Serializes appends to the daily workbook (one workbook session, rows in arrival order)
+_workbook_lock = threading.Lock()
+_daily_workbooks = {}
+_workbook_sessions = {}
+_coalescer = None
+_coalescer_lock = threading.Lock()
+_catch_up = None
+_catch_up_lock = threading.Lock()
+# Guards the WellPlanAON index; readers copy the rows they take while holding it
+_index_lock = threading.RLock()
+_wellplanaon_index = {"rows": None, "by_key": None, "by_id": None, "loaded_at": 0.0}
+# Held while a lookup loads the index, so concurrent invocations scan the list once
+_index_load_lock = threading.Lock()
+# PyMuPDF keeps one global MuPDF context and is not thread-safe; every call into it holds this
+_pymupdf_lock = threading.RLock()
+
+def _retry_after(resp, retries):
+    retry_after = resp.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return int(retry_after)
+    return 2 ** retries
+
+def graph_request(method, endpoint, url, max_retries=0, trace_attributes=None, **kwargs):
+    """
+    Send one HTTP request to Graph (or the token endpoint) in its own span and
+    account for it under the given endpoint name in the current invocation's
+    metrics. Throttled responses (429/503) are retried up to max_retries times,
+    honouring Retry-After. Within an invocation's deadline the request times
+    out when the budget does, and DeadlineExceeded is raised instead of
+    starting a call or retry that can't finish in time.
+
+    GETs to HEDGE_ENDPOINTS are hedged (see resilience.hedged_send). Each
+    endpoint has a circuit breaker: while it is open, GETs are answered with
+    their last good response if there is one, and anything else raises
+    CircuitOpenError without calling Graph.
+    """
+    attributes = {"http.method": method, "graph.endpoint": endpoint, "http.url": url.split("?")[0]}
+    attributes.update(trace_attributes or {})
+    with span(f"graph {endpoint}", **attributes) as graph_span:
+        retries = 0
+        throttle_delay = 0
+        while True:
+            check_deadline(f"Graph {endpoint} call", needed=0.5)
+            resp = _guarded_graph_request(method, endpoint, url, **kwargs)
+            if resp.status_code in (429, 503) and retries < max_retries:
+                retries += 1
+                wait_time = _retry_after(resp, retries)
+                # A retry that can't start before the deadline is not worth waiting for
+                check_deadline(f"retrying Graph {endpoint} call", needed=wait_time + 0.5)
+                print(f"{resp.status_code} error, retrying in {wait_time} seconds...")
+                time.sleep(wait_time)
+                throttle_delay += wait_time
+                continue
+            break
+        graph_span.set_attributes({
+            "http.status_code": resp.status_code,
+            "graph.retry_count": retries,
+            "graph.throttle_delay_s": throttle_delay,
+        })
+        return resp
+
+def _guarded_graph_request(method, endpoint, url, **kwargs):
+    breaker = circuit_breaker(endpoint) if CIRCUIT_BREAKER else None
+    if breaker and not breaker.allow():
+        cached = stale_response(url, kwargs.get("params")) if method == "GET" else None
+        if cached is not None:
+            logging.warning(f"Graph {endpoint} circuit is open; answering from the last good response")
+            return cached
+        raise CircuitOpenError(f"Graph {endpoint} is failing; not calling it until its circuit closes")
+    # Replaying or recording a cassette needs exactly one request per call
+    hedge = method == "GET" and endpoint in HEDGE_ENDPOINTS and active_cassette() is None
+    try:
+        if hedge:
+            resp = hedged_send(endpoint, lambda: _send_graph_request(method, endpoint, url, **kwargs))
+        else:
+            resp = _send_graph_request(method, endpoint, url, **kwargs)
+    except DeadlineExceeded:
+        raise
+    except Exception:
+        if breaker:
+            breaker.record_failure()
+        raise
+    if breaker:
+        if resp.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+    if method == "GET" and breaker and endpoint not in STALE_EXCLUDED_ENDPOINTS:
+        remember_response(url, kwargs.get("params"), resp)
+    return resp
+
+def _http_session():
+    """
+    Shared requests.Session, so connection pools (and their TLS handshakes) are
+    reused across Graph calls and across invocations on a warm instance.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=GRAPH_POOL_CONNECTIONS)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def _send_graph_request(method, endpoint, url, **kwargs):
+    import requests
+    started = time.perf_counter()
+    resp = None
+    cassette = active_cassette()
+    try:
+        if cassette and cassette.mode == "replay":
+            request_args = {k: v for k, v in kwargs.items() if k in ("headers", "params", "data", "json")}
+            prepared = requests.Request(method, url, **request_args).prepare()
+            resp = cassette.replay(method, endpoint, url, prepared)
+            return resp
+        remaining = remaining_time()
+        if remaining is not None:
+            kwargs.setdefault("timeout", max(remaining, 1.0))
+        resp = _http_session().request(method, url, **kwargs)
+        if cassette:
+            cassette.record(method, endpoint, url, resp, time.perf_counter() - started)
+        return resp
+    finally:
+        status = bytes_sent = bytes_received = 0
+        if resp is not None:
+            status = resp.status_code
+            body = resp.request.body
+            bytes_sent = len(body) if isinstance(body, (bytes, str)) else getattr(body, "len", 0)
+            bytes_received = len(resp.content)
+        record_graph_call(endpoint, status or None, time.perf_counter() - started, bytes_sent, bytes_received)
 
 def get_graph_token():
-    token_url = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
+    """Client-credentials token, cached until TOKEN_REFRESH_MARGIN seconds before it expires."""
+    with _token_lock:
+        if _token_cache["access_token"] and time.time() < _token_cache["expires_at"]:
+            return _token_cache["access_token"]
+        token = _fetch_graph_token()
+        _token_cache["access_token"] = token["access_token"]
+        _token_cache["expires_at"] = time.time() + int(token.get("expires_in", 0)) - TOKEN_REFRESH_MARGIN
+        return token["access_token"]
+
+def _fetch_graph_token():
+    token_url = f"{LOGIN_BASE}/{TENANT_ID}/oauth2/v2.0/token"
     payload = {
         "grant_type": "client_credentials",
         "client_id": CLIENT_ID,
@@ -34,9 +275,9 @@ def get_graph_token():
         "scope": "https://graph.microsoft.com/.default"
     }
     headers = {"Accept": "application/json"}
-    resp = requests.post(token_url, data=payload, headers=headers)
+    resp = graph_request("POST", "token", token_url, data=payload, headers=headers)
     resp.raise_for_status()
-    return resp.json()["access_token"]
+    return resp.json()
 
 def graph_headers():
     return {
@@ -45,6 +286,15 @@ def graph_headers():
     }
 
 def get_site_id():
+    # Site and list IDs never change for a deployment, so they are resolved once per instance
+    if SITE_URL in _site_id_cache:
+        return _site_id_cache[SITE_URL]
+    with _ids_lock:
+        if SITE_URL not in _site_id_cache:
+            _site_id_cache[SITE_URL] = _resolve_site_id()
+    return _site_id_cache[SITE_URL]
+
+def _resolve_site_id():
     # Extract tenant domain and site name from full site URL
     site_hostname = SITE_URL.split("/")[2]  # "slb001.sharepoint.com"
     site_path = "/" + "/".join(SITE_URL.split("/")[3:])  # "/sites/ADNOCDevelopment
@@ -53,7 +303,7 @@ def get_site_id():
     url = f"{GRAPH_BASE}/sites/{site_hostname}:{site_path}"
     
     headers = graph_headers()
-    resp = requests.get(url, headers=headers)
+    resp = graph_request("GET", "site", url, headers=headers)
     resp.raise_for_status()
     
     site_id = resp.json()["id"]
@@ -62,16 +312,59 @@ def get_site_id():
 
 
 def get_list_id(site_id, list_name):
-    url = f"{GRAPH_BASE}/sites/{site_id}/lists"
-    headers = graph_headers()
-    resp = requests.get(url, headers=headers)
-    resp.raise_for_status()
-    for l in resp.json().get("value", []):
-        if l["name"] == list_name:
-           # print(f"Resolved List ID for '{list_name}': {l['id']}")
-            return l["id"]
+    if (site_id, list_name) in _list_id_cache:
+        return _list_id_cache[(site_id, list_name)]
+    with _ids_lock:
+        if (site_id, list_name) not in _list_id_cache:
+            url = f"{GRAPH_BASE}/sites/{site_id}/lists"
+            headers = graph_headers()
+            resp = graph_request("GET", "lists", url, headers=headers)
+            resp.raise_for_status()
+            for l in resp.json().get("value", []):
+                _list_id_cache[(site_id, l["name"])] = l["id"]
+    if (site_id, list_name) in _list_id_cache:
+       # print(f"Resolved List ID for '{list_name}': {_list_id_cache[(site_id, list_name)]}")
+        return _list_id_cache[(site_id, list_name)]
     raise Exception(f"List '{list_name}' not found in site {site_id}")
 
+def get_indexed_columns(site_id, list_id):
+    """
+    Names of the list's indexed columns, from its column metadata. Past 5,000
+    items SharePoint only serves $filter queries on indexed columns.
+    """
+    if list_id in _indexed_columns_cache:
+        return _indexed_columns_cache[list_id]
+    with _ids_lock:
+        if list_id not in _indexed_columns_cache:
+            url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/columns"
+            resp = graph_request("GET", "columns", url, headers=graph_headers(), params={"$select": "name,indexed"})
+            resp.raise_for_status()
+            _indexed_columns_cache[list_id] = frozenset(
+                column["name"] for column in resp.json().get("value", []) if column.get("indexed")
+            )
+    return _indexed_columns_cache[list_id]
+
+def _wellplanaon_filterable(*columns):
+    if WELLPLANAON_QUERY_MODE in ("filter", "scan"):
+        return WELLPLANAON_QUERY_MODE == "filter"
+    site_id = get_site_id()
+    try:
+        indexed = get_indexed_columns(site_id, get_list_id(site_id, WELLPLANAON_LIST_NAME))
+    except DeadlineExceeded:
+        raise
+    except Exception as ex:
+        # A scan works whatever the list size
+        logging.warning(f"Could not read WellPlanAON column metadata, scanning the list instead: {ex}")
+        return False
+    return all(column in indexed for column in columns)
+
+def _wellplanaon_filter_headers():
+    headers = graph_headers()
+    if WELLPLANAON_QUERY_MODE == "filter":
+        # Lets $filter on non-indexed columns through on large lists, at the risk of random failures
+        headers["Prefer"] = "HonorNonIndexedQueriesWarningMayFailRandomly"
+    return headers
+
 def safe_strip(val):
     if val is None:
         return ""
@@ -79,133 +372,738 @@ def safe_strip(val):
         return ""
     return str(val).strip()
 
-def push_to_sharepoint(values, max_retries=3):
+def write_coalescer():
+    """The worker-wide WriteCoalescer shared by concurrent invocations."""
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = WriteCoalescer(send_graph_batch)
+    return _coalescer
+
+def submit_graph_writes(batch_requests):
+    """
+    Send $batch-style write sub-requests and return {request id: sub-response}.
+    With WRITE_COALESCING they are queued on the shared coalescer, so they go out
+    together with other invocations' writes; unconditional PATCHes of the same
+    item's fields are merged. Otherwise they are sent as this invocation's own $batch.
+    Writes still unanswered when the budget runs out come back with status 0;
+    callers record the ones that went through and then stop at check_deadline.
+    """
+    if not WRITE_COALESCING:
+        return send_graph_batch(batch_requests)
+    coalescer = write_coalescer()
+    futures = {}
+    for request in batch_requests:
+        headers = request.get("headers") or {}
+        # A conditional PATCH must reach Graph on its own, to fail if another one got there first
+        merge_key = ("PATCH", request["url"]) if request["method"] == "PATCH" and "If-Match" not in headers else None
+        futures[request["id"]] = coalescer.submit(
+            request["method"], request["url"], request.get("body"), merge_key, headers=headers
+        )
+    responses = {}
+    for request_id, future in futures.items():
+        remaining = remaining_time()
+        try:
+            responses[request_id] = future.result(timeout=max(remaining, 0.0) if remaining is not None else None)
+        except FutureTimeoutError:
+            # The writes are queued or in flight and may still land: wait for their flush, so the
+            # caller journals what went through before it stops, rather than sending it again on resume
+            _, unsent = wait_futures(futures.values(), timeout=WRITE_COALESCE_DRAIN_SECONDS)
+            if unsent:
+                logging.warning(f"{len(unsent)} coalesced writes still in flight as the request budget ran out")
+            for request_id, future in futures.items():
+                if request_id in responses:
+                    continue
+                if future in unsent:
+                    error = "request budget exhausted waiting for coalesced writes"
+                else:
+                    error = future.exception()
+                responses[request_id] = (
+                    future.result() if error is None
+                    else {"id": request_id, "status": 0, "body": {"error": str(error)}}
+                )
+            break
+        except Exception as ex:
+            responses[request_id] = {"id": request_id, "status": 0, "body": {"error": str(ex)}}
+    return responses
+
+def _ddr_item_properties(value):
+    return {
+        "fields": {
+            "Title": str(value.get("Date", "")),
+            "Rig": str(value.get("Rig", "")),
+            "Well": str(value.get("Well", "")),
+            "BP": str(value.get("BP", "")),
+            "EP": str(value.get("EP1", "")),
+            "Actuals": str(value.get("Actuals", "")),
+            "NextLOC": str(value.get("NextLOC", "")),
+            "NextMoveDate": str(value.get("NextMoveDate", "")),
+        }
+    }
+
+def push_to_sharepoint(values, max_retries=3, on_written=None):
+    """
+    Create a DDR list item per extracted well. on_written, if given, is called
+    with each group of values that were created successfully.
+    """
+    if WRITE_COALESCING:
+        return _push_to_sharepoint_coalesced(values, on_written)
     site_id = get_site_id()
     list_id = get_list_id(site_id, LIST_NAME)
     url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items"
     headers = graph_headers()
     headers["Content-Type"] = "application/json"
     for value in values:
-        item_properties = {
-            "fields": {
-                "Title": str(value.get("Date", "")),
-                "Rig": str(value.get("Rig", "")),
-                "Well": str(value.get("Well", "")),
-                "BP": str(value.get("BP", "")),
-                "EP": str(value.get("EP1", "")),
-                "Actuals": str(value.get("Actuals", "")),
-                "NextLOC": str(value.get("NextLOC", "")),
-                "NextMoveDate": str(value.get("NextMoveDate", "")),
-            }
-        }
-        retries = 0
-        while retries < max_retries:
-            try:
-                resp = requests.post(url, headers=headers, json=item_properties)
-                if resp.status_code == 503:
-                    retries += 1
-                    wait_time = 2 ** retries
-                    print(f"503 error, retrying in {wait_time} seconds...")
-                    time.sleep(wait_time)
-                elif resp.ok:
-                    print(f"Successfully added Well: {item_properties['fields'].get('Well', '')}")
-                    break
-                else:
-                    print(f"Failed to add item to SharePoint: {resp.text}")
-                    break
-            except Exception as e:
-                print(f"Failed to add item to SharePoint: {e}")
-                break
+        item_properties = _ddr_item_properties(value)
+        try:
+            resp = graph_request(
+                "POST", "list_items", url, max_retries=max_retries, headers=headers, json=item_properties,
+                trace_attributes={"rig": item_properties["fields"]["Rig"], "well": item_properties["fields"]["Well"]}
+            )
+            if resp.ok:
+                print(f"Successfully added Well: {item_properties['fields'].get('Well', '')}")
+                if on_written:
+                    on_written([value])
+            else:
+                print(f"Failed to add item to SharePoint: {resp.text}")
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"Failed to add item to SharePoint: {e}")
+
+def _push_to_sharepoint_coalesced(values, on_written=None):
+    site_id = get_site_id()
+    list_id = get_list_id(site_id, LIST_NAME)
+    batch_requests = [
+        {"id": str(index), "method": "POST", "url": f"/sites/{site_id}/lists/{list_id}/items",
+         "body": _ddr_item_properties(value)}
+        for index, value in enumerate(values)
+    ]
+    responses = submit_graph_writes(batch_requests)
+    written = []
+    for value, request in zip(values, batch_requests):
+        sub = responses.get(request["id"])
+        well = request["body"]["fields"]["Well"]
+        if sub and 200 <= sub.get("status", 0) < 300:
+            print(f"Successfully added Well: {well}")
+            written.append(value)
+        else:
+            print(f"Failed to add item to SharePoint: {json.dumps(sub.get('body')) if sub else 'No response in batch'}")
+    if on_written and written:
+        on_written(written)
+    check_deadline("pushing the remaining DDR items")
 
 def fetch_filtered_wellplanaon_entries(rig, next_loc, max_retries=3):
     site_id = get_site_id()
     list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
     url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items"
-    headers = graph_headers()
+    headers = _wellplanaon_filter_headers()
     filter_query = f"fields/RigName eq '{rig}' and fields/WellName eq '{next_loc}'"
     params = {"$filter": filter_query,"$expand": "fields"}
-    resp = requests.get(url, headers=headers, params=params)
+    resp = graph_request(
+        "GET", "list_items", url, headers=headers, params=params,
+        trace_attributes={"rig": rig, "well": next_loc}
+    )
     resp.raise_for_status()
     items = resp.json().get("value", [])
+    return [wellplanaon_fields(item) for item in items]
+
+def wellplanaon_fields(item):
+    """Flatten a WellPlanAON list item to its fields plus ID, DaysDiff and ETag."""
+    #print(">> Full item from Graph response:", json.dumps(item, indent=2))
+    fields = item.get("fields", {})
+    #print(">> Raw SharePoint fields:", json.dumps(fields, indent=2))
+    start_date = fields.get('StartDate')
+    end_date = fields.get('EndDate')
+    diff_days = ""
+    try:
+        if start_date and end_date:
+            # fromisoformat is ~20x faster than strptime, which adds up over a whole-list index
+            start_dt = datetime.fromisoformat(start_date[:10])
+            end_dt = datetime.fromisoformat(end_date[:10])
+            diff_days = (end_dt - start_dt).days
+    except Exception as e:
+        diff_days = f"Error: {e}"
+    fields["DaysDiff"] = diff_days
+    fields["ID"] = item.get("id")
+    # The version the item was read at, sent back as If-Match when it is updated
+    fields["ETag"] = item.get("eTag") or fields.get("@odata.etag")
+    return fields
+
+def fetch_rig_wellplanaon_entries(rig):
+    """Fetch every WellPlanAON entry of a rig, following @odata.nextLink pages."""
+    site_id = get_site_id()
+    list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
+    url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items"
+    headers = _wellplanaon_filter_headers()
+    params = {"$filter": f"fields/RigName eq '{rig}'", "$expand": "fields"}
     results = []
-    for item in items:
-        #print(">> Full item from Graph response:", json.dumps(item, indent=2))
-        fields = item.get("fields", {})
-        #print(">> Raw SharePoint fields:", json.dumps(fields, indent=2))
-        start_date = fields.get('StartDate')
-        end_date = fields.get('EndDate')
-        diff_days = ""
-        try:
-            if start_date and end_date:
-                start_dt = datetime.strptime(start_date[:10], "%Y-%m-%d")
-                end_dt = datetime.strptime(end_date[:10], "%Y-%m-%d")
-                diff_days = (end_dt - start_dt).days
-        except Exception as e:
-            diff_days = f"Error: {e}"
-        fields["DaysDiff"] = diff_days
-        fields["ID"] = item.get("id")
-        results.append(fields)
+    while url:
+        resp = graph_request("GET", "list_items", url, headers=headers, params=params, trace_attributes={"rig": rig})
+        resp.raise_for_status()
+        data = resp.json()
+        results.extend(wellplanaon_fields(item) for item in data.get("value", []))
+        # nextLink already carries the query
+        url = data.get("@odata.nextLink")
+        params = None
     return results
 
-def update_sharepoint_list_item(item_id, start_date, end_date):
+def sync_wellplanaon_snapshot(snapshot):
+    """
+    Bring the WellPlanAON snapshot up to date through Graph list item delta:
+    from its delta link when it has one, otherwise by reading the whole list.
+    Returns the number of changed and deleted items applied.
+    """
+    site_id = get_site_id()
+    list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
+    headers = graph_headers()
+    with snapshot.lock:
+        url = snapshot.delta_link()
+        full = url is None
+        params = None
+        if full:
+            url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items/delta"
+            params = {"$expand": f"fields($select={','.join(WELLPLANAON_FIELDS)})"}
+        changes = []
+        while True:
+            resp = graph_request("GET", "list_items_delta", url, max_retries=3, headers=headers, params=params)
+            if resp.status_code == 410 and not full:
+                # The delta link expired; start over from the whole list
+                snapshot.reset()
+                return sync_wellplanaon_snapshot(snapshot)
+            resp.raise_for_status()
+            data = resp.json()
+            changes.extend(data.get("value", []))
+            if "@odata.nextLink" not in data:
+                break
+            url = data["@odata.nextLink"]
+            params = None
+        snapshot.apply(changes, data.get("@odata.deltaLink"), full=full)
+    return len(changes)
+
+def load_wellplanaon_index():
+    """
+    Fetch the whole WellPlanAON list into the in-process index used by the
+    lookup stage while it is fresh (WELLPLANAON_INDEX_TTL). With a snapshot
+    (WELLPLANAON_SNAPSHOT_PATH) only the changes since its last sync are
+    fetched. Returns the row count.
+    """
+    snapshot = open_snapshot()
+    if snapshot:
+        changed = sync_wellplanaon_snapshot(snapshot)
+        rows = [wellplanaon_fields(item) for item in snapshot.items()]
+        logging.info(f"WellPlanAON snapshot synced: {changed} changes, {len(rows)} rows")
+    else:
+        rows = _scan_wellplanaon_rows()
+    by_key = {}
+    for row in rows:
+        by_key.setdefault((_join_key(row.get("RigName")), _join_key(row.get("WellName"))), []).append(row)
+    with _index_lock:
+        _wellplanaon_index.update(
+            rows=rows, by_key=by_key, by_id={row["ID"]: row for row in rows}, loaded_at=time.monotonic()
+        )
+    return len(rows)
+
+def _scan_wellplanaon_rows():
+    site_id = get_site_id()
+    list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
+    url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items"
+    headers = graph_headers()
+    params = {"$expand": f"fields($select={','.join(WELLPLANAON_FIELDS)})"}
+    rows = []
+    while url:
+        resp = graph_request("GET", "list_items", url, max_retries=3, headers=headers, params=params)
+        resp.raise_for_status()
+        data = resp.json()
+        rows.extend(wellplanaon_fields(item) for item in data.get("value", []))
+        url = data.get("@odata.nextLink")
+        params = None
+    return rows
+
+def _fresh_wellplanaon_index():
+    with _index_lock:
+        if _wellplanaon_index["rows"] is None:
+            return None
+        if time.monotonic() - _wellplanaon_index["loaded_at"] > WELLPLANAON_INDEX_TTL:
+            return None
+        return _wellplanaon_index
+
+def _lookup_index(*columns):
+    """
+    The WellPlanAON index to answer lookups on these columns from: the loaded
+    one while fresh, otherwise a newly loaded one when there is a snapshot to
+    catch up from or a $filter on them can't use column indexes. None means
+    query the list with $filter.
+    """
+    index = _fresh_wellplanaon_index()
+    if index or (not open_snapshot() and _wellplanaon_filterable(*columns)):
+        return index
+    with _index_load_lock:
+        if _fresh_wellplanaon_index() is None:
+            load_wellplanaon_index()
+    return _fresh_wellplanaon_index()
+
+def _update_wellplanaon_index(update, etag=None):
+    # Keep a loaded index consistent with the dates (and eTag) this instance just wrote
+    with _index_lock:
+        index = _fresh_wellplanaon_index()
+        row = index["by_id"].get(update["ID"]) if index else None
+        if row is None:
+            return
+        row["StartDate"] = update["StartDate"].strftime("%Y-%m-%dT%H:%M:%SZ")
+        row["EndDate"] = update["EndDate"].strftime("%Y-%m-%dT%H:%M:%SZ")
+        row["DaysDiff"] = (update["EndDate"].date() - update["StartDate"].date()).days
+        row["ETag"] = etag
+
+def _refresh_wellplanaon_index_row(item_id, current):
+    # An item re-read after a conflict replaces its stale index row; one that
+    # changed rig or well (or was deleted) drops the index instead
+    with _index_lock:
+        index = _fresh_wellplanaon_index()
+        row = index["by_id"].get(item_id) if index else None
+        if row is None:
+            return
+        if current and all(_join_key(row.get(c)) == _join_key(current.get(c)) for c in ("RigName", "WellName")):
+            row.update(current)
+        else:
+            _wellplanaon_index["rows"] = None
+
+class EditConflict(Exception):
+    """A conditional WellPlanAON write found the item changed since it was read (HTTP 412)."""
+
+def _if_match(etag):
+    return {"If-Match": etag} if WELLPLANAON_IF_MATCH and etag else {}
+
+def _conflict_backoff(attempt):
+    wait_time = random.uniform(0, WELLPLANAON_CONFLICT_BACKOFF * 2 ** attempt)
+    check_deadline("re-planning a conflicting WellPlanAON update", needed=wait_time + 0.5)
+    time.sleep(wait_time)
+
+def update_sharepoint_list_item(item_id, start_date, end_date, etag=None):
+    """
+    PATCH a WellPlanAON item's dates. With etag (and WELLPLANAON_IF_MATCH) the
+    write only lands if the item is still at that version, otherwise
+    EditConflict is raised. Returns the item's new eTag.
+    """
     site_id = get_site_id()
     list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
     url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items/{item_id}/fields"
     headers = graph_headers()
     headers["Content-Type"] = "application/json"
+    headers.update(_if_match(etag))
     payload = {
         "StartDate": start_date.strftime("%Y-%m-%dT%H:%M:%S"),
         "EndDate": end_date.strftime("%Y-%m-%dT%H:%M:%S")
     }
-    resp = requests.patch(url, headers=headers, json=payload)
+    resp = graph_request(
+        "PATCH", "item_fields", url, headers=headers, json=payload, trace_attributes={"item_id": str(item_id)}
+    )
+    if resp.status_code == 412:
+        raise EditConflict(f"WellPlanAON item {item_id} changed since it was read")
     resp.raise_for_status()
     print(f"Updated item ID {item_id} with StartDate {start_date} and EndDate {end_date}")
+    return resp.json().get("@odata.etag")
 
-def upload_no_entries_log_to_sharepoint(no_entries_log, file_name_prefix="NoEntriesFound"):
-    if not no_entries_log:
-        return
-    df = pd.DataFrame(no_entries_log)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_name = f"{file_name_prefix}_{timestamp}.xlsx"
-    excel_buffer = io.BytesIO()
-    df.to_excel(excel_buffer, index=False)
-    excel_buffer.seek(0)
+def fetch_wellplanaon_item(item_id):
+    """Re-read one WellPlanAON item, flattened like the lookup rows; None when it was deleted."""
+    site_id = get_site_id()
+    list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
+    url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items/{item_id}"
+    params = {"$expand": f"fields($select={','.join(WELLPLANAON_FIELDS)})"}
+    resp = graph_request(
+        "GET", "list_item", url, max_retries=3, headers=graph_headers(), params=params,
+        trace_attributes={"item_id": str(item_id)}
+    )
+    if resp.status_code == 404:
+        return None
+    resp.raise_for_status()
+    return wellplanaon_fields(resp.json())
+
+def fetch_wellplanaon_items(item_ids):
+    """
+    Re-read several WellPlanAON items through Graph $batch; returns {item ID:
+    flattened row, or None when it was deleted}. Items that could not be read
+    are left out.
+    """
+    site_id = get_site_id()
+    list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
+    select = ",".join(WELLPLANAON_FIELDS)
+    responses = send_graph_batch([
+        {"id": str(index), "method": "GET",
+         "url": f"/sites/{site_id}/lists/{list_id}/items/{item_id}?$expand=fields($select={select})"}
+        for index, item_id in enumerate(item_ids)
+    ])
+    rows = {}
+    for index, item_id in enumerate(item_ids):
+        sub = responses.get(str(index)) or {}
+        if sub.get("status") == 404:
+            rows[item_id] = None
+        elif sub.get("status") == 200:
+            rows[item_id] = wellplanaon_fields(sub["body"])
+    return rows
+
+def replan_wellplanaon_update(update, current):
+    """
+    Plan an update whose conditional write hit a 412 again from its item as
+    just re-read (current, None when deleted): the same StartDate, with the
+    EndDate keeping the item's current duration (as reconcile_wellplanaon
+    plans it). Returns (update, error). update is None when nothing is left to
+    write, because the item already starts that day or because it was deleted
+    or moved to another rig or well, which error then describes.
+    """
+    _refresh_wellplanaon_index_row(update["ID"], current)
+    if current is None:
+        return None, "Item was deleted while it was being updated"
+    if (_join_key(current.get("RigName")), _join_key(current.get("WellName"))) != (
+        _join_key(update["Rig"]), _join_key(update["Well"])
+    ):
+        return None, (
+            f"Item moved to {current.get('RigName')} / {current.get('WellName')} while it was being updated"
+        )
+    start = current.get("StartDate")
+    if start and datetime.fromisoformat(start[:10]).date() == update["StartDate"].date():
+        print(f"Item ID {update['ID']} already starts on {update['StartDate'].date()}; nothing to re-apply")
+        return None, None
+    diff_days = current.get("DaysDiff")
+    diff_days = diff_days if isinstance(diff_days, int) else 0
+    print(f"Item ID {update['ID']} changed since it was read; re-planned with a {diff_days}-day duration")
+    return dict(update, EndDate=update["StartDate"] + timedelta(days=diff_days), ETag=current["ETag"]), None
+
+def send_graph_batch(batch_requests, max_retries=3):
+    """
+    Send sub-requests through the Graph $batch endpoint, GRAPH_BATCH_LIMIT at a time.
+    Throttled (429/503) batches and sub-requests are retried while the budget
+    allows the wait (the rest come back with status 0); returns {request id:
+    response}. A batch that still fails doesn't discard the responses of the ones
+    before it: its sub-requests come back with status 0 and the error.
+    """
+    url = f"{GRAPH_BASE}/$batch"
+    headers = graph_headers()
+    headers["Content-Type"] = "application/json"
+    responses = {}
+    pending = list(batch_requests)
+    retries = 0
+    while pending:
+        throttled = []
+        wait_time = 0
+        for start in range(0, len(pending), GRAPH_BATCH_LIMIT):
+            chunk = pending[start:start + GRAPH_BATCH_LIMIT]
+            try:
+                resp = graph_request(
+                    "POST", "batch", url, max_retries=max_retries, headers=headers, json={"requests": chunk}
+                )
+                resp.raise_for_status()
+            except DeadlineExceeded:
+                raise
+            except Exception as ex:
+                logging.error(f"Graph batch of {len(chunk)} requests failed: {ex}")
+                for request in chunk:
+                    responses[request["id"]] = {"id": request["id"], "status": 0, "body": {"error": str(ex)}}
+                continue
+            by_id = {r["id"]: r for r in chunk}
+            for sub in resp.json().get("responses", []):
+                if sub.get("status") in (429, 503) and retries < max_retries:
+                    throttled.append(by_id[sub["id"]])
+                    retry_after = (sub.get("headers") or {}).get("Retry-After")
+                    wait_time = max(wait_time, int(retry_after) if retry_after else 2 ** (retries + 1))
+                else:
+                    responses[sub["id"]] = sub
+        remaining = remaining_time()
+        if throttled and remaining is not None and remaining <= wait_time + 0.5:
+            # A retry that can't start before the deadline is not worth waiting for
+            for request in throttled:
+                responses[request["id"]] = {
+                    "id": request["id"], "status": 0,
+                    "body": {"error": f"request budget exhausted before retrying throttled request in {wait_time}s"},
+                }
+            break
+        if throttled:
+            retries += 1
+            print(f"{len(throttled)} batched requests throttled, retrying in {wait_time} seconds...")
+            time.sleep(wait_time)
+        pending = throttled
+    return responses
+
+def get_output_drive_id():
     site_id = get_site_id()
+    if (site_id, OUTPUT_LIBRARY) in _drive_id_cache:
+        return _drive_id_cache[(site_id, OUTPUT_LIBRARY)]
+    with _ids_lock:
+        if (site_id, OUTPUT_LIBRARY) in _drive_id_cache:
+            return _drive_id_cache[(site_id, OUTPUT_LIBRARY)]
+        return _resolve_output_drive_id(site_id)
+
+def _resolve_output_drive_id(site_id):
     # Find the drive (document library) by name
     drive_url = f"{GRAPH_BASE}/sites/{site_id}/drives"
     headers = graph_headers()
-    resp = requests.get(drive_url, headers=headers)
+    resp = graph_request("GET", "drives", drive_url, headers=headers)
     resp.raise_for_status()
     drives = resp.json().get("value", [])
-    drive_id = None
     for d in drives:
         if d.get("name") == OUTPUT_LIBRARY:
-            drive_id = d["id"]
-            break
+            _drive_id_cache[(site_id, OUTPUT_LIBRARY)] = d["id"]
+            return d["id"]
+    print(f"Drive (library) '{OUTPUT_LIBRARY}' not found.")
+    return None
+
+def upload_to_output_library(file_name, data, content_type):
+    """
+    Upload a file to OUTPUT_LIBRARY and return its webUrl (None if the library
+    is missing). data is bytes, str, a seekable binary file object or an
+    iterable of byte chunks; files are streamed rather than read into memory.
+    Files above SIMPLE_UPLOAD_MAX_BYTES go through a resumable upload session.
+    """
+    drive_id = get_output_drive_id()
     if not drive_id:
-        print(f"Drive (library) '{OUTPUT_LIBRARY}' not found.")
-        return
-    upload_url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{file_name}:/content"
-    headers = graph_headers()
-    headers["Content-Type"] = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-    resp = requests.put(upload_url, headers=headers, data=excel_buffer.getvalue())
-    resp.raise_for_status()
-    file_info = resp.json()
+        return None
+    if isinstance(data, str):
+        data = data.encode()
+    spooled = None
+    if not isinstance(data, bytes) and not hasattr(data, "read"):
+        # Both upload paths need the total size up front
+        data = spooled = spool_stream(data)
+    try:
+        body = data if isinstance(data, bytes) else StreamBody(data)
+        size = len(body) if isinstance(body, bytes) else body.len
+        if size > SIMPLE_UPLOAD_MAX_BYTES:
+            source = io.BytesIO(data) if isinstance(data, bytes) else data
+            file_info = upload_in_session(drive_id, file_name, source, size)
+        else:
+            upload_url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{file_name}:/content"
+            headers = graph_headers()
+            headers["Content-Type"] = content_type
+            resp = graph_request("PUT", "drive_content", upload_url, headers=headers, data=body)
+            resp.raise_for_status()
+            file_info = resp.json()
+    finally:
+        if spooled:
+            spooled.close()
     file_url = file_info.get("webUrl")
     #print(f"Uploaded file to SharePoint: {file_name}")
     #print(f"File URL: {file_url}")
     return file_url
 
-def extract_tables_from_pdf(pdf_stream):
-    doc = fitz.open(stream=pdf_stream, filetype="pdf")
-    all_values = []
-    index_counter = 0  # Initialize the index counter
-    for page_num in range(len(doc)):
-        page = doc[page_num]
-        tables = page.find_tables()
-        if tables:
-            for t in tables:
-                df = t.to_pandas()
+def _next_expected_offset(session_info, default):
+    # nextExpectedRanges looks like ["26-"] or ["0-25", "50-"]; resume from the first gap
+    ranges = session_info.get("nextExpectedRanges") or []
+    return int(ranges[0].split("-")[0]) if ranges else default
+
+def _upload_session_offset(upload_url, default):
+    """Where the server wants the next chunk to start, or default if the session can't be queried."""
+    try:
+        resp = graph_request("GET", "upload_chunk", upload_url)
+        if resp.ok:
+            return _next_expected_offset(resp.json(), default)
+    except Exception as ex:
+        logging.warning(f"Could not query upload session status: {ex}")
+    return default
+
+def upload_in_session(drive_id, file_name, source, size, max_retries=5):
+    """
+    Upload a seekable binary file through a Graph upload session in
+    UPLOAD_CHUNK_BYTES chunks. After a failed or throttled chunk the session's
+    nextExpectedRanges say where to resume, so only the missing bytes are resent.
+    Returns the uploaded driveItem.
+    """
+    import requests
+    url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{file_name}:/createUploadSession"
+    headers = graph_headers()
+    headers["Content-Type"] = "application/json"
+    resp = graph_request(
+        "POST", "upload_session", url, max_retries=3, headers=headers,
+        json={"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+    )
+    resp.raise_for_status()
+    # The upload URL is pre-authenticated and must not carry the bearer token
+    upload_url = resp.json()["uploadUrl"]
+    offset = 0
+    failures = 0
+    while True:
+        source.seek(offset)
+        chunk = source.read(UPLOAD_CHUNK_BYTES)
+        end = offset + len(chunk) - 1
+        chunk_headers = {"Content-Length": str(len(chunk)), "Content-Range": f"bytes {offset}-{end}/{size}"}
+        resp = None
+        try:
+            resp = graph_request(
+                "PUT", "upload_chunk", upload_url, headers=chunk_headers, data=chunk,
+                trace_attributes={"upload.offset": offset, "upload.size": size}
+            )
+            if resp.status_code in (200, 201):
+                return resp.json()
+            if resp.status_code == 202:
+                offset = _next_expected_offset(resp.json(), end + 1)
+                failures = 0
+                continue
+            error = f"{resp.status_code} {resp.text[:200]}"
+            if resp.status_code == 404:
+                # The session expired or was cancelled; it cannot be resumed
+                raise Exception(f"Upload session for {file_name} is gone: {error}")
+        except requests.RequestException as ex:
+            error = str(ex)
+        failures += 1
+        if failures > max_retries:
+            try:
+                graph_request("DELETE", "upload_chunk", upload_url)
+            except Exception:
+                pass
+            raise Exception(f"Upload of {file_name} failed at byte {offset} of {size}: {error}")
+        wait_time = _retry_after(resp, failures) if resp is not None else 2 ** failures
+        print(f"Upload chunk at byte {offset} failed ({error}), resuming in {wait_time} seconds...")
+        time.sleep(wait_time)
+        offset = _upload_session_offset(upload_url, offset)
+
+def _workbook_session(drive_id, item_id, refresh=False):
+    """Persistent workbook session id for an item, reused across invocations while it is fresh."""
+    cached = _workbook_sessions.get(item_id)
+    if cached and not refresh and time.monotonic() - cached[1] < WORKBOOK_SESSION_IDLE:
+        return cached[0]
+    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{item_id}/workbook/createSession"
+    headers = graph_headers()
+    headers["Content-Type"] = "application/json"
+    resp = graph_request("POST", "workbook_session", url, max_retries=3, headers=headers, json={"persistChanges": True})
+    resp.raise_for_status()
+    session_id = resp.json()["id"]
+    _workbook_sessions[item_id] = (session_id, time.monotonic())
+    return session_id
+
+def append_workbook_rows(drive_id, item_id, table_name, rows):
+    """
+    Append rows (lists of cell values) to a workbook table through a persistent
+    workbook session, WORKBOOK_APPEND_BATCH rows per rows/add call. An expired
+    session is re-created once.
+    """
+    url = f"{GRAPH_BASE}/drives/{drive_id}/items/{item_id}/workbook/tables/{table_name}/rows/add"
+    for start in range(0, len(rows), WORKBOOK_APPEND_BATCH):
+        chunk = rows[start:start + WORKBOOK_APPEND_BATCH]
+        for refresh in (False, True):
+            session_id = _workbook_session(drive_id, item_id, refresh=refresh)
+            headers = graph_headers()
+            headers["Content-Type"] = "application/json"
+            headers["workbook-session-id"] = session_id
+            resp = graph_request("POST", "workbook_rows", url, max_retries=3, headers=headers, json={"values": chunk})
+            expired = resp.status_code == 404 or (not resp.ok and "session" in resp.text[:500].lower())
+            if not (expired and not refresh):
+                break
+        resp.raise_for_status()
+        _workbook_sessions[item_id] = (session_id, time.monotonic())
+
+def append_no_entries_log_to_daily_workbook(no_entries_log, file_name_prefix="NoEntriesFound"):
+    """
+    Append the log to the NoEntries table of today's NoEntriesFound_<date>.xlsx
+    instead of uploading a file per run. The first run of the day creates the
+    workbook with its rows; later runs append through a workbook session.
+    Returns the workbook's webUrl.
+    """
+    drive_id = get_output_drive_id()
+    if not drive_id:
+        return None
+    with _workbook_lock:
+        return _append_to_daily_workbook(drive_id, no_entries_log, file_name_prefix)
+
+def _append_to_daily_workbook(drive_id, no_entries_log, file_name_prefix):
+    logged = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [{"Logged": logged, **entry} for entry in no_entries_log]
+    file_name = f"{file_name_prefix}_{datetime.now().strftime('%Y%m%d')}.xlsx"
+    item = _daily_workbooks.get((drive_id, file_name))
+    if item is None:
+        # conflictBehavior=fail: when the workbook already exists (another run or
+        # instance created it) nothing is overwritten and the rows are appended
+        with spool_report(rows, "xlsx", columns=DAILY_LOG_COLUMNS, table_name=DAILY_LOG_TABLE) as spool:
+            headers = graph_headers()
+            headers["Content-Type"] = CONTENT_TYPES["xlsx"]
+            resp = graph_request(
+                "PUT", "drive_content", f"{GRAPH_BASE}/drives/{drive_id}/root:/{file_name}:/content",
+                headers=headers, params={"@microsoft.graph.conflictBehavior": "fail"}, data=StreamBody(spool)
+            )
+        if resp.status_code != 409:
+            resp.raise_for_status()
+            item = resp.json()
+            _daily_workbooks[(drive_id, file_name)] = item
+            return item.get("webUrl")
+        resp = graph_request("GET", "drive_item", f"{GRAPH_BASE}/drives/{drive_id}/root:/{file_name}", headers=graph_headers())
+        resp.raise_for_status()
+        item = resp.json()
+        _daily_workbooks[(drive_id, file_name)] = item
+    values = [[safe_strip(row.get(column)) for column in DAILY_LOG_COLUMNS] for row in rows]
+    try:
+        append_workbook_rows(drive_id, item["id"], DAILY_LOG_TABLE, values)
+    except Exception:
+        # The workbook may have been moved or deleted; look it up again next time
+        _daily_workbooks.pop((drive_id, file_name), None)
+        raise
+    return item.get("webUrl")
+
+def upload_no_entries_log_to_sharepoint(no_entries_log, file_name_prefix="NoEntriesFound", log_format=None):
+    if not no_entries_log:
+        return
+    if NO_ENTRIES_LOG_MODE == "daily":
+        try:
+            return append_no_entries_log_to_daily_workbook(no_entries_log, file_name_prefix)
+        except DeadlineExceeded:
+            raise
+        except Exception as ex:
+            # Never lose the log: fall back to a file for this run
+            logging.error(f"Appending to the daily {file_name_prefix} workbook failed, uploading a file instead: {ex}")
+    # Rows are streamed into a spooled workbook/CSV and uploaded straight from it
+    log_format = (log_format or NO_ENTRIES_LOG_FORMAT).lower()
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_name = f"{file_name_prefix}_{timestamp}.{log_format}"
+    with spool_report(no_entries_log, log_format) as spool:
+        return upload_to_output_library(file_name, spool, CONTENT_TYPES[log_format])
+
+def upload_profile_to_sharepoint(profiler, file_name_prefix="Profile"):
+    """Upload the raw profile and its JSON report next to the NoEntriesFound logs."""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    profile_url = upload_to_output_library(
+        f"{file_name_prefix}_{timestamp}.prof", profiler.dump(), "application/octet-stream"
+    )
+    report_url = upload_to_output_library(
+        f"{file_name_prefix}_{timestamp}.json", json.dumps(profiler.report(), indent=2), "application/json"
+    )
+    return {"profile_url": profile_url, "report_url": report_url}
+
+def extract_tables_from_pdf(pdf_stream, start_page=0, all_values=None):
+    """
+    Extract one record per DDR page. start_page and all_values continue an
+    extraction that stopped at the deadline; the DeadlineExceeded raised then
+    carries the checkpoint to continue from.
+    """
+    import fitz  # PyMuPDF
+    with _pymupdf_lock:
+        doc = fitz.open(stream=pdf_stream, filetype="pdf")
+        page_count = len(doc)
+    all_values = [] if all_values is None else all_values
+    index_counter = len(all_values)  # Initialize the index counter
+    try:
+        for page_num in range(start_page, page_count):
+            try:
+                check_deadline(f"extracting page {page_num + 1}")
+            except DeadlineExceeded as ex:
+                ex.checkpoint = {"start_page": page_num, "all_values": all_values}
+                raise
+            index_counter = _extract_page(doc, page_num, all_values, index_counter)
+    finally:
+        with _pymupdf_lock:
+            doc.close()
+    return all_values
+
+def _extract_page(doc, page_num, all_values, index_counter):
+    # Appends the page's record to all_values and returns the next index; the page's span ends either way
+    page_started = time.perf_counter()
+    page_span = start_span("extract page", page=page_num)
+    values_before = len(all_values)
+    tables = None
+    try:
+        # Only the MuPDF calls hold the lock; parsing the tables runs alongside other invocations
+        with _pymupdf_lock:
+            page = doc[page_num]
+            tables = page.find_tables()
+            frames = [t.to_pandas() for t in tables] if tables else []
+        if frames:
+            for df in frames:
                 dates = []
                 rigs = []
                 wells = []
@@ -332,12 +1230,690 @@ def extract_tables_from_pdf(pdf_stream):
                         }
                         all_values.append(record)
                         index_counter += 1  # Increment the index counter
+        record_page(page_num, time.perf_counter() - page_started, len(tables.tables) if tables else 0)
+    except Exception as ex:
+        page_span.record_exception(ex)
+        raise
+    finally:
+        page_span.set_attribute("tables", len(tables.tables) if tables else 0)
+        if len(all_values) > values_before:
+            page_span.set_attributes({"rig": all_values[-1]["Rig"], "well": all_values[-1]["Well"]})
+        page_span.end()
+    return index_counter
 
-    doc.close()
-    return all_values
+def reconcile_wellplanaon_reference(unique_data, fetch_entries=None, update_item=None):
+    """
+    Per-item reconciliation of extracted wells against WellPlanAON.
+    Kept as the reference implementation for reconcile_wellplanaon; fetches and
+    updates each matched item one at a time and returns the no-entries log.
+    """
+    import pandas as pd
+    fetch_entries = fetch_entries or fetch_filtered_wellplanaon_entries
+    update_item = update_item or update_sharepoint_list_item
+    no_entries_log = []
+    for entry in unique_data:
+        rig = entry.get("Rig", "")
+        next_loc = entry.get("NextLOC", "")
+        filtered = fetch_entries(rig, next_loc)
+        if filtered:
+            print(f"Filtered entries for Well: {next_loc}, Rig: {rig}")
+            for item in filtered:
+                try:
+                    next_move_date = entry.get("NextMoveDate", "")
+                    print(f"Next move date:{next_move_date}")
+                    if next_move_date:
+                        start_date = parse_date(next_move_date)
+                        #print(f"Parsed Start Date: {start_date} (type: {type(start_date)})")
+                        item_start_date_str = item.get("StartDate")
+                        #print(f"Str Start Date: {item_start_date_str} (type: {type(item_start_date_str)})")
+                        # Parse item_start_date_str to datetime for accurate comparison
+                        item_start_date = None
+                        if item_start_date_str:
+                            try:
+                                item_start_date = parse_date(item_start_date_str)
+                                #print(f"Parsed Item Start Date: {item_start_date} (type: {type(item_start_date)})")
+                            except Exception as ex:
+                                print(f"Error parsing item_start_date_str: {ex}")
+                        # Only update if dates are different
+                        if not item_start_date or item_start_date.date() != start_date.date():
+                            diff_days = item.get("DaysDiff")
+                            if diff_days is None or isinstance(diff_days, str):
+                                s = item.get("StartDate")
+                                e = item.get("EndDate")
+                                #print(f"Raw Start: {s}, Raw End: {e}")
+                                if s and e:
+                                    try:
+                                        s_dt = parse_date(s)
+                                        e_dt = parse_date(e)
+                                        diff_days = (e_dt - s_dt).days
+                                    except Exception as ex:
+                                        print(f"Error parsing dates: {ex}")
+                                        diff_days = 0
+                                else:
+                                    diff_days = 0
+                            end_date = start_date + pd.Timedelta(days=diff_days)
+                            #print(f"StartDate: {start_date}, EndDate: {end_date}, DiffDays: {diff_days}")
+                            update_item(item['ID'], start_date, end_date)
+                        else:
+                            print(f"Skipped update for item ID {item['ID']} as StartDate matches NextMoveDate")
+                except Exception as ex:
+                    logging.error(f"Error updating item ID {item.get('ID')}: {ex}")
+                    no_entries_log.append({
+                        "Well": next_loc,
+                        "Rig": rig,
+                        "ItemID": item.get('ID'),
+                        "Error": str(ex)
+                    })
+        else:    
+            print(f"No entries found for Well: {next_loc}, Rig: {rig}")
+            no_entries_log.append({"Well": next_loc, "Rig": rig})
+    return no_entries_log
+
+def _join_key(val):
+    # SharePoint text filters are case-insensitive, so join on the same terms
+    return safe_strip(val).casefold()
+
+def _parse_date_column(values):
+    """
+    Parse a column of date strings with parse_date, once per distinct value.
+    Returns (timestamps, errors) where unparseable values are NaT and carry the
+    parse_date error message.
+    """
+    import pandas as pd
+    parsed = {}
+    errors = {}
+    for value in pd.unique(values.dropna()):
+        if not value:
+            continue
+        try:
+            parsed[value] = pd.Timestamp(parse_date(value)).tz_localize(None)
+        except Exception as ex:
+            errors[value] = str(ex)
+    return pd.to_datetime(values.map(parsed)), values.map(errors)
+
+def fetch_wellplanaon_rows(unique_data):
+    """
+    Fetch WellPlanAON entries for every distinct (Rig, NextLOC) pair of the
+    extracted wells. Each pair is queried once.
+    """
+    plan_rows = []
+    seen = set()
+    index = _lookup_index("RigName", "WellName") if unique_data else None
+    for entry in unique_data:
+        rig = entry.get("Rig", "")
+        next_loc = entry.get("NextLOC", "")
+        key = (_join_key(rig), _join_key(next_loc))
+        if key in seen:
+            continue
+        seen.add(key)
+        if index:
+            with _index_lock:
+                plan_rows.extend(dict(row) for row in index["by_key"].get(key, []))
+        else:
+            plan_rows.extend(fetch_filtered_wellplanaon_entries(rig, next_loc))
+    return plan_rows
+
+def fetch_rig_wellplanaon_rows(unique_data):
+    """
+    Fetch the full WellPlanAON schedule of every distinct rig in the extracted
+    wells. Each rig is queried once.
+    """
+    plan_rows = []
+    seen = set()
+    index = _lookup_index("RigName") if unique_data else None
+    for entry in unique_data:
+        rig = entry.get("Rig", "")
+        if _join_key(rig) in seen:
+            continue
+        seen.add(_join_key(rig))
+        if index:
+            with _index_lock:
+                plan_rows.extend(
+                    dict(row) for row in index["rows"] if _join_key(row.get("RigName")) == _join_key(rig)
+                )
+        else:
+            plan_rows.extend(fetch_rig_wellplanaon_entries(rig))
+    return plan_rows
+
+def reconcile_wellplanaon(unique_data, plan_rows):
+    """
+    Vectorized reconciliation of extracted wells against WellPlanAON rows.
+    Joins (Rig, NextLOC) to (RigName, WellName), computes the new StartDate/EndDate
+    for every matched item and returns (updates, no_entries_log). Each update is a
+    dict with ID, Rig, Well, StartDate, EndDate and the ETag the item was read at;
+    an item matched by several records is updated once, from the last of them.
+    """
+    import pandas as pd
+    records = pd.DataFrame(unique_data, columns=["Rig", "NextLOC", "NextMoveDate"]).fillna("")
+    records["_order"] = range(len(records))
+    records["_rig_key"] = records["Rig"].map(_join_key)
+    records["_well_key"] = records["NextLOC"].map(_join_key)
+
+    plan = pd.DataFrame(plan_rows, columns=["ID", "RigName", "WellName", "StartDate", "EndDate", "DaysDiff", "ETag"])
+    plan = plan.drop_duplicates(subset="ID")
+    plan["_item_order"] = range(len(plan))
+    plan["_rig_key"] = plan["RigName"].map(_join_key)
+    plan["_well_key"] = plan["WellName"].map(_join_key)
+
+    joined = records.merge(plan, how="left", on=["_rig_key", "_well_key"], indicator=True)
+    joined = joined.sort_values(["_order", "_item_order"], kind="stable").reset_index(drop=True)
+
+    missing = joined["_merge"] == "left_only"
+    has_move_date = joined["NextMoveDate"].astype(bool)
+    new_start, start_errors = _parse_date_column(joined["NextMoveDate"])
+    item_start, _ = _parse_date_column(joined["StartDate"])
+    item_end, _ = _parse_date_column(joined["EndDate"])
+
+    # Keep each item's duration: DaysDiff when fetched, else EndDate - StartDate, else 0
+    diff_days = pd.to_numeric(joined["DaysDiff"], errors="coerce")
+    diff_days = diff_days.fillna((item_end - item_start).dt.days).fillna(0)
+    new_end = new_start + pd.to_timedelta(diff_days, unit="D")
+
+    matched = ~missing & has_move_date
+    failed = matched & new_start.isna()
+    # Records resolving to the same item (e.g. one Rig/NextLOC on two pages) plan it once: the
+    # last one wins, as it would record by record, and the item's ETag is written only once
+    planned = matched & ~failed
+    superseded = planned & joined["ID"].where(planned).duplicated(keep="last")
+    changed = planned & ~superseded & (item_start.isna() | (item_start.dt.normalize() != new_start.dt.normalize()))
+
+    updates = [
+        {
+            "ID": row.ID,
+            "Rig": row.Rig,
+            "Well": row.NextLOC,
+            "StartDate": start.to_pydatetime(),
+            "EndDate": end.to_pydatetime(),
+            "ETag": row.ETag if isinstance(row.ETag, str) else None,
+        }
+        for row, start, end in zip(
+            joined.loc[changed].itertuples(index=False), new_start[changed], new_end[changed]
+        )
+    ]
+
+    no_entries_log = []
+    for index in joined.index[missing | failed]:
+        row = joined.loc[index]
+        if missing[index]:
+            print(f"No entries found for Well: {row['NextLOC']}, Rig: {row['Rig']}")
+            no_entries_log.append({"Well": row["NextLOC"], "Rig": row["Rig"]})
+        else:
+            no_entries_log.append({
+                "Well": row["NextLOC"],
+                "Rig": row["Rig"],
+                "ItemID": row["ID"],
+                "Error": start_errors[index]
+            })
+    print(f"Reconciled {int(matched.sum())} WellPlanAON entries, {len(updates)} to update")
+    return updates, no_entries_log
+
+def cascade_wellplanaon_updates(anchor_updates, plan_rows):
+    """
+    Shift every WellPlanAON item scheduled after an updated anchor item on the same
+    rig by the anchor's slip in days, keeping each item's duration. Items are placed
+    in their rig's sequence by StartDate and take the slip of the nearest anchor
+    before them. Returns updates in the shape produced by reconcile_wellplanaon,
+    plus the AnchorID of the update each one follows.
+    """
+    import pandas as pd
+    plan = pd.DataFrame(plan_rows, columns=["ID", "RigName", "WellName", "StartDate", "EndDate", "ETag"])
+    plan = plan.drop_duplicates(subset="ID")
+    plan["_start"], _ = _parse_date_column(plan["StartDate"])
+    plan["_end"], _ = _parse_date_column(plan["EndDate"])
+    # Items without a StartDate have no place in the sequence and are left alone
+    plan = plan.dropna(subset=["_start"])
+    plan["_rig_key"] = plan["RigName"].map(_join_key)
+    plan = plan.sort_values(["_rig_key", "_start", "ID"], kind="stable")
+    plan["_pos"] = plan.groupby("_rig_key").cumcount()
+
+    anchors = pd.DataFrame(anchor_updates, columns=["ID", "StartDate"])
+    anchors = anchors.rename(columns={"StartDate": "_new_start"})
+    anchors = anchors.merge(plan[["ID", "_rig_key", "_pos", "_start"]], on="ID")
+    anchors["_slip"] = pd.to_datetime(anchors["_new_start"]).dt.normalize() - anchors["_start"].dt.normalize()
+    anchors["AnchorID"] = anchors["ID"]
+
+    downstream = plan[~plan["ID"].isin([u["ID"] for u in anchor_updates])]
+    shifted = pd.merge_asof(
+        downstream.sort_values("_pos"),
+        anchors[["_rig_key", "_pos", "_slip", "AnchorID"]].sort_values("_pos"),
+        on="_pos",
+        by="_rig_key",
+        direction="backward",
+    )
+    shifted = shifted[shifted["_slip"].notna() & (shifted["_slip"] != pd.Timedelta(0))]
+    shifted = shifted.sort_values(["_rig_key", "_pos"], kind="stable")
+    new_start = shifted["_start"] + shifted["_slip"]
+    new_end = shifted["_end"].fillna(shifted["_start"]) + shifted["_slip"]
+
+    updates = [
+        {
+            "ID": row.ID,
+            "Rig": row.RigName,
+            "Well": row.WellName,
+            "StartDate": start.to_pydatetime(),
+            "EndDate": end.to_pydatetime(),
+            "ETag": row.ETag if isinstance(row.ETag, str) else None,
+            "AnchorID": row.AnchorID,
+        }
+        for row, start, end in zip(shifted.itertuples(index=False), new_start, new_end)
+    ]
+    print(f"Cascading {len(updates)} downstream WellPlanAON entries")
+    return updates
+
+def _update_failed(update, error):
+    logging.error(f"Error updating item ID {update['ID']}: {error}")
+    return {
+        "Well": update["Well"],
+        "Rig": update["Rig"],
+        "ItemID": update["ID"],
+        "Error": error
+    }
+
+def apply_wellplanaon_updates(updates, on_written=None):
+    """
+    Write the planned WellPlanAON updates (as coalesced batches when
+    WRITE_COALESCING is on); returns log entries for the items that failed to update.
+    on_written, if given, is called with each group of updates that succeeded.
+    An update whose item changed since it was read is re-planned from the
+    item's current state and retried, up to WELLPLANAON_CONFLICT_RETRIES times.
+    """
+    if WRITE_COALESCING:
+        return batch_update_sharepoint_list_items(updates, on_written)
+    no_entries_log = []
+    for update in updates:
+        try:
+            error = _write_wellplanaon_update(update)
+        except DeadlineExceeded:
+            raise
+        except Exception as ex:
+            error = str(ex)
+        if error:
+            no_entries_log.append(_update_failed(update, error))
+        elif on_written:
+            on_written([update])
+    return no_entries_log
+
+def _write_wellplanaon_update(update):
+    # One item's write, re-planned after each 412; returns the error to log, if any
+    attempt = 0
+    while True:
+        try:
+            etag = update_sharepoint_list_item(
+                update["ID"], update["StartDate"], update["EndDate"], etag=update.get("ETag")
+            )
+            _update_wellplanaon_index(update, etag)
+            return None
+        except EditConflict:
+            if attempt == WELLPLANAON_CONFLICT_RETRIES:
+                raise
+            _conflict_backoff(attempt)
+            attempt += 1
+            update, error = replan_wellplanaon_update(update, fetch_wellplanaon_item(update["ID"]))
+            if update is None:
+                return error
+
+def batch_update_sharepoint_list_items(updates, on_written=None):
+    """
+    Write WellPlanAON updates as one batched write set through Graph $batch
+    (shared with concurrent invocations when WRITE_COALESCING is on).
+    Returns log entries for the items that failed to update; on_written, if
+    given, is called once with the updates that succeeded. Updates whose item
+    changed since it was read are re-planned from the item's current state and
+    sent again together, for up to WELLPLANAON_CONFLICT_RETRIES rounds.
+    """
+    if not updates:
+        return []
+    site_id = get_site_id()
+    list_id = get_list_id(site_id, WELLPLANAON_LIST_NAME)
+    no_entries_log = []
+    written = []
+    # (update as planned, update to write now)
+    pending = [(update, update) for update in updates]
+    attempt = 0
+    while pending:
+        batch_requests = [
+            {
+                "id": str(index),
+                "method": "PATCH",
+                "url": f"/sites/{site_id}/lists/{list_id}/items/{update['ID']}/fields",
+                "headers": {"Content-Type": "application/json", **_if_match(update.get("ETag"))},
+                "body": {
+                    "StartDate": update["StartDate"].strftime("%Y-%m-%dT%H:%M:%S"),
+                    "EndDate": update["EndDate"].strftime("%Y-%m-%dT%H:%M:%S")
+                }
+            }
+            for index, (_, update) in enumerate(pending)
+        ]
+        batch_error = "No response in batch"
+        try:
+            responses = submit_graph_writes(batch_requests)
+        except DeadlineExceeded:
+            raise
+        except Exception as ex:
+            logging.error(f"Error sending WellPlanAON batch update: {ex}")
+            responses = {}
+            batch_error = str(ex)
+        conflicts = []
+        for index, (planned, update) in enumerate(pending):
+            sub = responses.get(str(index))
+            if sub and 200 <= sub.get("status", 0) < 300:
+                _update_wellplanaon_index(update, (sub.get("body") or {}).get("@odata.etag"))
+                written.append(planned)
+                print(f"Updated item ID {update['ID']} with StartDate {update['StartDate']} and EndDate {update['EndDate']}")
+            elif sub and sub.get("status") == 412 and attempt < WELLPLANAON_CONFLICT_RETRIES:
+                conflicts.append((planned, update))
+            else:
+                no_entries_log.append(_update_failed(planned, json.dumps(sub.get("body")) if sub else batch_error))
+        if conflicts:
+            try:
+                check_deadline("re-planning conflicting WellPlanAON updates")
+            except DeadlineExceeded:
+                # Record what went through before stopping, so a resumed run doesn't write it again
+                if on_written and written:
+                    on_written(written)
+                raise
+        pending = []
+        current = {}
+        if conflicts:
+            _conflict_backoff(attempt)
+            try:
+                current = fetch_wellplanaon_items([update["ID"] for _, update in conflicts])
+            except DeadlineExceeded:
+                raise
+            except Exception as ex:
+                logging.error(f"Error re-reading conflicting WellPlanAON items: {ex}")
+        for planned, update in conflicts:
+            if update["ID"] in current:
+                update, error = replan_wellplanaon_update(update, current[update["ID"]])
+            else:
+                update, error = None, "Item changed while it was being updated and could not be re-read"
+            if update:
+                pending.append((planned, update))
+            elif error:
+                no_entries_log.append(_update_failed(planned, error))
+            else:
+                written.append(planned)
+        attempt += 1
+    if on_written and written:
+        on_written(written)
+    return no_entries_log
+
+def pull_list_changes(site_id, list_id):
+    """
+    Items of a list changed since the last pull, through Graph list item delta
+    (deleted items come back as {"id", "deleted"}). Without a delta link for
+    the list (first pull on this instance, or an expired link) tracking only
+    starts now.
+    """
+    links = delta_links()
+    with links.lock:
+        url = links.get(list_id)
+        params = None
+        if url is None:
+            url = f"{GRAPH_BASE}/sites/{site_id}/lists/{list_id}/items/delta"
+            params = {"token": "latest", "$expand": "fields"}
+        changes = []
+        while True:
+            resp = graph_request("GET", "list_items_delta", url, max_retries=3, headers=graph_headers(), params=params)
+            if resp.status_code == 410 and params is None:
+                logging.warning(f"Delta link of list {list_id} expired; changes since the last pull are lost")
+                links.set(list_id, None)
+                return pull_list_changes(site_id, list_id)
+            resp.raise_for_status()
+            data = resp.json()
+            changes.extend(data.get("value", []))
+            if "@odata.nextLink" not in data:
+                break
+            url = data["@odata.nextLink"]
+            params = None
+        links.set(list_id, data.get("@odata.deltaLink"))
+    return changes
+
+def sync_subscriptions():
+    """
+    Create or renew the Graph change-notification subscriptions of the DDR and
+    WellPlanAON lists (to GRAPH_NOTIFICATION_URL), each expiring
+    SUBSCRIPTION_MINUTES from now. Returns {list_name: {"id", "expires", "action"}}.
+    """
+    if not NOTIFICATION_URL:
+        logging.info("GRAPH_NOTIFICATION_URL is not set; no change-notification subscriptions")
+        return {}
+    site_id = get_site_id()
+    url = f"{GRAPH_BASE}/subscriptions"
+    headers = graph_headers()
+    headers["Content-Type"] = "application/json"
+    resp = graph_request("GET", "subscriptions", url, headers=headers)
+    resp.raise_for_status()
+    existing = {
+        sub["resource"]: sub for sub in resp.json().get("value", []) if sub.get("notificationUrl") == NOTIFICATION_URL
+    }
+    expires = (datetime.now(timezone.utc) + timedelta(minutes=SUBSCRIPTION_MINUTES)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    synced = {}
+    for name in (LIST_NAME, WELLPLANAON_LIST_NAME):
+        list_id = get_list_id(site_id, name)
+        resource = f"sites/{site_id}/lists/{list_id}"
+        subscription = existing.get(resource)
+        action = "renewed"
+        if subscription:
+            resp = graph_request(
+                "PATCH", "subscriptions", f"{url}/{subscription['id']}", headers=headers,
+                json={"expirationDateTime": expires}
+            )
+        if not subscription or resp.status_code == 404:
+            # Graph validates notificationUrl before answering, so the function must be reachable
+            action = "created"
+            resp = graph_request("POST", "subscriptions", url, headers=headers, json={
+                "changeType": "updated",
+                "notificationUrl": NOTIFICATION_URL,
+                "resource": resource,
+                "expirationDateTime": expires,
+                "clientState": NOTIFICATION_CLIENT_STATE,
+            })
+        resp.raise_for_status()
+        subscription = resp.json()
+        if name == LIST_NAME and delta_links().get(list_id) is None:
+            # Start tracking DDR item edits, so the first notification has a delta to pull
+            pull_list_changes(site_id, list_id)
+        synced[name] = {"id": subscription["id"], "expires": subscription["expirationDateTime"], "action": action}
+        logging.info(f"Change notifications for {name} {action} until {subscription['expirationDateTime']}")
+    return synced
+
+def refresh_wellplanaon_cache():
+    """
+    Bring the WellPlanAON index up to date after the list changed: through
+    delta when there is a snapshot, otherwise by dropping it so the next lookup
+    reloads or queries the list.
+    """
+    if open_snapshot():
+        with _index_load_lock:
+            return {"refreshed": True, "rows": load_wellplanaon_index()}
+    with _index_lock:
+        loaded = _wellplanaon_index["rows"] is not None
+        _wellplanaon_index["rows"] = None
+    return {"refreshed": False, "index_dropped": loaded}
+
+def _forget_edited_ddr_watermarks(site_id, list_id):
+    watermarks = open_watermarks()
+    if not watermarks:
+        return {"changes": None, "watermarks_forgotten": 0}
+    changes = pull_list_changes(site_id, list_id)
+    # Deleted items carry no fields, so only edits can be matched to a well
+    edited = [item["fields"] for item in changes if "fields" in item]
+    return {"changes": len(changes), "watermarks_forgotten": watermarks.invalidate(edited)}
+
+def handle_list_notifications(notifications):
+    """
+    Update what this instance caches about the lists named in Graph change
+    notifications: WellPlanAON changes refresh the index (refresh_wellplanaon_cache),
+    and DDR items edited in SharePoint lose their watermarks so the next DDR
+    syncs those wells again. Each list is handled once per call. Returns
+    {list_name: summary}.
+    """
+    site_id = get_site_id()
+    names = {get_list_id(site_id, name): name for name in (LIST_NAME, WELLPLANAON_LIST_NAME)}
+    handled = {}
+    for list_id in dict.fromkeys(notified_list_id(notification) for notification in notifications):
+        name = names.get(list_id)
+        if name is None:
+            logging.warning(f"Ignoring change notification for list {list_id}")
+        elif name == WELLPLANAON_LIST_NAME:
+            handled[name] = refresh_wellplanaon_cache()
+        else:
+            handled[name] = _forget_edited_ddr_watermarks(site_id, list_id)
+    return handled
+
+def notification_catch_up():
+    """The worker-wide NotificationCatchUp running handle_list_notifications."""
+    global _catch_up
+    if _catch_up is None:
+        with _catch_up_lock:
+            if _catch_up is None:
+                _catch_up = NotificationCatchUp(handle_list_notifications)
+    return _catch_up
+
+def _prime_imports():
+    import pandas  # noqa: F401
+    import fitz  # noqa: F401
+    import requests  # noqa: F401
+    import openpyxl  # noqa: F401
+
+def _prime_pymupdf():
+    # The first find_tables() call initializes PyMuPDF's table detection
+    import fitz
+    with _pymupdf_lock:
+        doc = fitz.open()
+        page = doc.new_page()
+        page.insert_text((72, 72), "warmup")
+        page.find_tables()
+        page.get_text()
+        doc.close()
+
+def _prime_lists():
+    site_id = get_site_id()
+    return {name: get_list_id(site_id, name) for name in (LIST_NAME, WELLPLANAON_LIST_NAME) if name}
+
+def _prime_wellplanaon_columns():
+    site_id = get_site_id()
+    return sorted(get_indexed_columns(site_id, get_list_id(site_id, WELLPLANAON_LIST_NAME)))
+
+def warmup(preload_index=False):
+    """
+    Do ahead of the first DDR request what it would otherwise pay for inline:
+    heavy imports, PyMuPDF initialization, the metric and trace exporters, the
+    Graph token, site/list/drive ID resolution (which also opens the pooled
+    connections to both hosts) and, optionally (always with a snapshot), the WellPlanAON index. A failed part
+    is reported and the rest still run. Returns {"ok", "total_ms", "primed": {part: {"ok", "ms", ...}}}.
+    """
+    stats = start_run()
+    parts = [
+        ("imports", _prime_imports),
+        ("pymupdf", _prime_pymupdf),
+        ("telemetry", prime_telemetry),
+        ("token", lambda: bool(get_graph_token())),
+        ("site", get_site_id),
+        ("lists", _prime_lists),
+        ("output_drive", get_output_drive_id),
+    ]
+    if WELLPLANAON_QUERY_MODE == "auto":
+        parts.append(("wellplanaon_columns", _prime_wellplanaon_columns))
+    if preload_index or open_snapshot():
+        parts.append(("wellplanaon_index", load_wellplanaon_index))
+    primed = {}
+    started = time.perf_counter()
+    with span("warmup", preload_index=preload_index):
+        for name, prime in parts:
+            part_started = time.perf_counter()
+            try:
+                with span(f"warmup {name}"):
+                    result = prime()
+                primed[name] = {"ok": True}
+                if result is not None and not isinstance(result, bool):
+                    primed[name]["result"] = result
+            except Exception as ex:
+                logging.warning(f"Warm-up of {name} failed: {ex}")
+                primed[name] = {"ok": False, "error": str(ex)}
+            primed[name]["ms"] = round((time.perf_counter() - part_started) * 1000, 1)
+    report = {
+        "ok": all(part["ok"] for part in primed.values()),
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+        "primed": primed,
+        "graph_calls": stats.summary()["graph_calls"],
+    }
+    logging.info(f"Warm-up finished in {report['total_ms']}ms: {json.dumps(primed)}")
+    return report
 
 def main(req: func.HttpRequest) -> func.HttpResponse:
+    with span("ExtractPDFDetails", **{"http.method": req.method, "pdf.bytes": len(req.get_body())}) as root:
+        resp = process_single_flight(req)
+        root.set_attribute("http.status_code", resp.status_code)
+        return resp
+
+def _still_in_flight(key):
+    result = {
+        "message": "An identical PDF is still being processed; send it again later to get its result",
+        "complete": False,
+        "resume_token": key if journal_store() else None,
+    }
+    return func.HttpResponse(body=json.dumps(result, indent=4), status_code=202, mimetype="application/json")
+
+def _process_with_lease(req, key):
+    started = time.monotonic()
+    budget = request_budget(req)
+    # A run of the same PDF with other parameters goes first; this one then continues from its journal
+    with pdf_locks().hold(key, timeout=budget) as held:
+        if not held:
+            return _still_in_flight(key)
+        lease = acquire_lease(key, timeout=budget - (time.monotonic() - started))
+        if lease is False:
+            return _still_in_flight(key)
+        try:
+            # Once the other worker is done its journal answers for it (or lets this run resume)
+            return process_request(req, budget=budget - (time.monotonic() - started))
+        finally:
+            if lease:
+                lease.release()
+
+def _flight_key(req, pdf_sha256):
+    # Only requests asking for the same operation may share a response
+    cascade = req.params.get("cascade", str(WELLPLANAON_CASCADE)).lower() == "true"
+    full_sync = req.params.get("full", "false").lower() == "true"
+    profile = (req.params.get("profile") or req.headers.get("x-profile") or "").lower()
+    return f"{pdf_sha256}:cascade={cascade}:full={full_sync}:profile={profile}"
+
+def process_single_flight(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    process_request, except that a PDF identical to one already being processed
+    (same SHA-256, with the same cascade, full and profile parameters) waits for
+    that invocation and gets its response instead of running again. With SINGLE_FLIGHT_LEASE, invocations on other workers are
+    kept out by a lease and then continue from the run journal.
+    """
+    pdf_bytes = req.get_body()
+    if not SINGLE_FLIGHT or not pdf_bytes or req.params.get("restart", "false").lower() == "true":
+        return process_request(req)
+    key = hashlib.sha256(pdf_bytes).hexdigest()
+    try:
+        resp, shared = single_flight().do(
+            _flight_key(req, key), lambda: _process_with_lease(req, key), timeout=request_budget(req)
+        )
+    except FutureTimeoutError:
+        return _still_in_flight(key)
+    if not shared:
+        return resp
+    logging.info(f"Identical PDF {key} was already in flight; returning its response")
+    return func.HttpResponse(
+        body=resp.get_body(),
+        status_code=resp.status_code,
+        headers={**resp.headers, "x-single-flight": "attached"},
+        mimetype=resp.mimetype,
+        charset=resp.charset,
+    )
+
+def process_request(req: func.HttpRequest, budget=None) -> func.HttpResponse:
     logging.info("Python HTTP trigger function processed a request.")
+    stats = start_run()
+    deadline = start_deadline(request_budget(req) if budget is None else budget)
+    profiler = None
+    journal = None
 
     try:
         # Get PDF bytes from HTTP request body
@@ -346,102 +1922,217 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
             return func.HttpResponse(
                 "No PDF content found in request body", status_code=400
             )
-        
-        pdf_stream = io.BytesIO(pdf_bytes)
-        all_values = extract_tables_from_pdf(pdf_stream)
-        unique_wells = {}
-        for row in all_values:
-            well = row["Well"]
-            if well not in unique_wells:
-                unique_wells[well] = row
-
-        unique_data = list(unique_wells.values())
+
+        # Work already done for this PDF by an earlier, failed attempt is skipped
+        journal = open_journal(pdf_bytes)
+        resume_token = req.params.get("resume") or req.headers.get("x-resume-token")
+        if resume_token and (not journal or resume_token != journal.key):
+            return func.HttpResponse(
+                "Resume token does not match this PDF (or run journals are off)", status_code=400
+            )
+        if journal and req.params.get("restart", "false").lower() == "true":
+            journal.reset()
+        full_sync = req.params.get("full", "false").lower() == "true"
+        cascade = req.params.get("cascade", str(WELLPLANAON_CASCADE)).lower() == "true"
+        # The parameters that change what a run writes; a stored result only answers the same ones
+        run_params = {"cascade": cascade, "full": full_sync}
+        if journal and journal.result is not None and journal.result_params == run_params:
+            result = dict(journal.result)
+            result["journal"] = {"pdf_sha256": journal.key, "resumed": True, "completed_earlier": True}
+            return func.HttpResponse(body=json.dumps(result, indent=4), status_code=200, mimetype="application/json")
+
+        # Opt-in deep profiling for authorized callers; normal requests skip it entirely
+        profile_mode = requested_profile_mode(req)
+        if profile_mode:
+            profiler = InvocationProfiler(stats)
+            if not profiler.start():
+                profiler = None
+
+        if journal and journal.extracted:
+            unique_data = journal.extracted["rows"]
+            tables_extracted = journal.extracted["tables"]
+        else:
+            # Only so many extractions fit on this worker at once; the rest queue briefly or are turned away
+            with stage("admission"):
+                admitted = admit_extraction(pdf_bytes, timeout=min(ADMISSION_QUEUE_SECONDS, max(remaining_time(), 0)))
+            if admitted is None:
+                return func.HttpResponse(
+                    "Too many PDFs are being processed on this worker; retry later",
+                    status_code=429,
+                    headers={"Retry-After": str(admission_controller().retry_after())},
+                )
+            try:
+                with stage("extract"):
+                    pdf_stream = io.BytesIO(pdf_bytes)
+                    try:
+                        all_values = extract_tables_from_pdf(pdf_stream, **(journal.extracting if journal else {}))
+                    except DeadlineExceeded as ex:
+                        if journal and ex.checkpoint:
+                            journal.record("extracting", **ex.checkpoint)
+                        raise
+            finally:
+                release_extraction(admitted)
+
+            with stage("dedup"):
+                unique_wells = {}
+                for row in all_values:
+                    well = row["Well"]
+                    if well not in unique_wells:
+                        unique_wells[well] = row
+
+                unique_data = list(unique_wells.values())
+            tables_extracted = len(all_values)
+            if journal:
+                journal.record("extracted", rows=unique_data, tables=tables_extracted)
         print("Total number of Unique Wells found:", len(unique_data))
 
+        # Wells extracted exactly as they were last synced need no push or WellPlanAON update
+        watermarks = open_watermarks()
+        with stage("changes"):
+            changed = unique_data if full_sync or not watermarks else watermarks.changed(unique_data)
+        print(f"Wells changed since their last sync: {len(changed)}")
+
         # Call push_to_sharepoint before updating WellPlanAON entries
-        push_to_sharepoint(unique_data)
-
-        no_entries_log = []
-
-        #Fetch filtered Wellplanaon entries for each unique well
-        for entry in unique_data:
-            rig = entry.get("Rig", "")
-            next_loc = entry.get("NextLOC", "")
-            filtered = fetch_filtered_wellplanaon_entries(rig, next_loc)
-            if filtered:
-                print(f"Filtered entries for Well: {next_loc}, Rig: {rig}")
-                for item in filtered:
-                    try:
-                        next_move_date = entry.get("NextMoveDate", "")
-                        print(f"Next move date:{next_move_date}")
-                        if next_move_date:
-                            start_date = parse_date(next_move_date)
-                            #print(f"Parsed Start Date: {start_date} (type: {type(start_date)})")
-                            item_start_date_str = item.get("StartDate")
-                            #print(f"Str Start Date: {item_start_date_str} (type: {type(item_start_date_str)})")
-                            # Parse item_start_date_str to datetime for accurate comparison
-                            item_start_date = None
-                            if item_start_date_str:
-                                try:
-                                    item_start_date = parse_date(item_start_date_str)
-                                    #print(f"Parsed Item Start Date: {item_start_date} (type: {type(item_start_date)})")
-                                except Exception as ex:
-                                    print(f"Error parsing item_start_date_str: {ex}")
-                            # Only update if dates are different
-                            if not item_start_date or item_start_date.date() != start_date.date():
-                                diff_days = item.get("DaysDiff")
-                                if diff_days is None or isinstance(diff_days, str):
-                                    s = item.get("StartDate")
-                                    e = item.get("EndDate")
-                                    #print(f"Raw Start: {s}, Raw End: {e}")
-                                    if s and e:
-                                        try:
-                                            s_dt = parse_date(s)
-                                            e_dt = parse_date(e)
-                                            diff_days = (e_dt - s_dt).days
-                                        except Exception as ex:
-                                            print(f"Error parsing dates: {ex}")
-                                            diff_days = 0
-                                    else:
-                                        diff_days = 0
-                                end_date = start_date + pd.Timedelta(days=diff_days)
-                                #print(f"StartDate: {start_date}, EndDate: {end_date}, DiffDays: {diff_days}")
-                                update_sharepoint_list_item(item['ID'], start_date, end_date)
-                            else:
-                                print(f"Skipped update for item ID {item['ID']} as StartDate matches NextMoveDate")
-                    except Exception as ex:
-                        logging.error(f"Error updating item ID {item.get('ID')}: {ex}")
-                        no_entries_log.append({
-                            "Well": next_loc,
-                            "Rig": rig,
-                            "ItemID": item.get('ID'),
-                            "Error": str(ex)
-                        })
-            else:    
-                print(f"No entries found for Well: {next_loc}, Rig: {rig}")
-                no_entries_log.append({"Well": next_loc, "Rig": rig})
-
-        uploaded_file_url = upload_no_entries_log_to_sharepoint(no_entries_log)
+        with stage("push"):
+            pushed = set(journal.pushed) if journal else set()
+
+            def on_pushed(rows):
+                pushed.update(row["Well"] for row in rows)
+                if journal:
+                    journal.record("pushed", wells=[row["Well"] for row in rows])
 
+            push_to_sharepoint([row for row in changed if row["Well"] not in pushed], on_written=on_pushed)
+
+        unpushed = [row["Well"] for row in changed if row["Well"] not in pushed]
+
+        if journal and journal.plan and journal.plan["cascade"] == cascade and journal.plan["full"] == full_sync:
+            # Re-reconciling would miss updates whose anchors were already written
+            updates, no_entries_log = journal.plan["updates"], list(journal.plan["log"])
+        else:
+            if cascade:
+                # Reschedule each rig's whole sequence
+                with stage("lookup"):
+                    plan_rows = fetch_rig_wellplanaon_rows(changed)
+                with stage("reconcile"):
+                    updates, no_entries_log = reconcile_wellplanaon(changed, plan_rows)
+                    updates.extend(cascade_wellplanaon_updates(updates, plan_rows))
+            else:
+                # Fetch WellPlanAON entries once per (Rig, NextLOC) and reconcile them in one pass
+                with stage("lookup"):
+                    plan_rows = fetch_wellplanaon_rows(changed)
+                with stage("reconcile"):
+                    updates, no_entries_log = reconcile_wellplanaon(changed, plan_rows)
+            if journal:
+                journal.record("planned", cascade=cascade, full=full_sync, updates=updates, log=no_entries_log)
+
+        with stage("update"):
+            # Cascades go out as one batched write set
+            write_updates = batch_update_sharepoint_list_items if cascade else apply_wellplanaon_updates
+            if journal:
+                pending = [update for update in updates if update["ID"] not in journal.updated]
+                failed_updates = write_updates(
+                    pending, on_written=lambda done: journal.record("updated", ids=[u["ID"] for u in done])
+                )
+            else:
+                failed_updates = write_updates(updates)
+            no_entries_log.extend(failed_updates)
+        # A run with failed writes is not done: resending the PDF retries just those
+        complete = not unpushed and not failed_updates
+
+        with stage("log_upload"):
+            if journal and journal.log_done:
+                uploaded_file_url = journal.log_url
+            else:
+                uploaded_file_url = upload_no_entries_log_to_sharepoint(no_entries_log)
+                if journal and complete:
+                    journal.record("log_uploaded", url=uploaded_file_url)
+
+        if watermarks:
+            # Wells that failed to push or had no (or a failed) WellPlanAON update are retried next time
+            with stage("watermarks"):
+                unsynced = {(_join_key(entry["Rig"]), _join_key(entry["Well"])) for entry in no_entries_log}
+                # ...and so are wells whose cascade didn't fully go through
+                failed_ids = {entry["ItemID"] for entry in failed_updates}
+                anchors = {update["ID"]: update for update in updates if "AnchorID" not in update}
+                for update in updates:
+                    anchor = anchors.get(update.get("AnchorID")) if update["ID"] in failed_ids else None
+                    if anchor:
+                        unsynced.add((_join_key(anchor["Rig"]), _join_key(anchor["Well"])))
+                watermarks.commit([
+                    row for row in changed
+                    if row["Well"] in pushed and (_join_key(row["Rig"]), _join_key(row["NextLOC"])) not in unsynced
+                ])
 
         # Always return a valid JSON response
         result = {
             "message": "PDF processed successfully!",
-            "tables_extracted": len(all_values),
+            "tables_extracted": tables_extracted,
             "Total number of Unique Wells found:": len(unique_data),
-            "uploaded_file_url": uploaded_file_url
+            "unchanged_wells_skipped": len(unique_data) - len(changed),
+            "full_sync": full_sync,
+            "wellplanaon_updates": len(updates),
+            "cascade": cascade,
+            "uploaded_file_url": uploaded_file_url,
+            "complete": complete,
+            "failed_pushes": len(unpushed),
+            "failed_updates": len(failed_updates),
         }
+        if journal:
+            if complete:
+                journal.record("completed", result=result, params=run_params)
+            else:
+                result["resume_token"] = journal.key
+            result["journal"] = {"pdf_sha256": journal.key, "resumed": journal.resumed}
+        result["metrics"] = stats.summary()
+        if profiler:
+            profiler.stop()
+            if profile_mode == "inline":
+                result["profile"] = profiler.report()
+            else:
+                result["profile"] = upload_profile_to_sharepoint(profiler)
         return func.HttpResponse(
             body=json.dumps(result, indent=4),
             status_code=200,
             mimetype="application/json",
         )
 
+    except DeadlineExceeded as e:
+        # Everything finished so far is in the journal; resending the PDF picks up from there
+        stopped_in = list(stats.stages)[-1] if stats.stages else None
+        logging.warning(f"Stopping in stage {stopped_in}: {e}")
+        result = {
+            "message": "Stopped before the function timeout; send the same PDF again to resume",
+            "complete": False,
+            "stopped_in": stopped_in,
+            "reason": str(e),
+            "budget_s": round(deadline.budget, 1),
+            "resume_token": journal.key if journal else None,
+        }
+        if journal:
+            result["progress"] = {
+                "extracted": journal.extracted is not None,
+                "pages_extracted": journal.extracting.get("start_page", 0) if journal.extracted is None else None,
+                "wells": len(journal.extracted["rows"]) if journal.extracted else None,
+                "pushed": len(journal.pushed),
+                "updates_planned": len(journal.plan["updates"]) if journal.plan else None,
+                "updates_written": len(journal.updated),
+                "log_uploaded": journal.log_done,
+            }
+        result["metrics"] = stats.summary()
+        return func.HttpResponse(body=json.dumps(result, indent=4), status_code=202, mimetype="application/json")
     except Exception as e:
         logging.error(f"Error in processing request: {e}\n{traceback.format_exc()}")
         return func.HttpResponse(
             "Internal server error: " + str(e), status_code=500
         )
+    finally:
+        clear_deadline()
+        if profiler:
+            profiler.stop()
+        try:
+            emit_metrics(stats)
+        except Exception as ex:
+            logging.warning(f"Failed to emit metrics: {ex}")
 
 def parse_date(date_str):
     """
@@ -462,6 +2153,7 @@ def parse_date(date_str):
             continue
     # Try to parse with pandas if all else fails
     try:
+        import pandas as pd
         return pd.to_datetime(date_str)
     except Exception:
         pass
@@ -0,0 +1,155 @@
+import collections
+import logging
+import math
+import os
+import re
+import threading
+import time
+
+# Turn admission control off entirely
+ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+# Extractions allowed to run at once on this worker (extraction is CPU-bound, one core each)
+ADMISSION_CPU_SLOTS = int(os.getenv("ADMISSION_CPU_SLOTS", str(os.cpu_count() or 1)))
+# Estimated extraction memory allowed at once on this worker
+ADMISSION_MEMORY_MB = float(os.getenv("ADMISSION_MEMORY_MB", "1024"))
+# How long a request may queue for a slot before it is turned away with a 429
+ADMISSION_QUEUE_SECONDS = float(os.getenv("ADMISSION_QUEUE_SECONDS", "5"))
+# Memory estimate: a fixed cost (PyMuPDF document, table finder) plus the body and each page
+ADMISSION_BASE_MB = 50
+ADMISSION_BODY_FACTOR = 4
+ADMISSION_PAGE_MB = 0.1
+
+# Page objects in an uncompressed page tree; "/Type /Pages" (the tree nodes) doesn't match
+_PAGE_OBJECT = re.compile(rb"/Type\s*/Page(?![A-Za-z])")
+# Pages per MB assumed when the page tree sits in compressed object streams
+_PAGES_PER_MB = 40
+
+
+def count_pages(pdf_bytes):
+    """Page count from the PDF bytes without parsing the document (estimated from the size if hidden)."""
+    pages = len(_PAGE_OBJECT.findall(pdf_bytes))
+    return pages or max(1, math.ceil(len(pdf_bytes) / 1024 / 1024 * _PAGES_PER_MB))
+
+
+def estimate_cost(pdf_bytes):
+    """(cpu_slots, memory_mb) that extracting this PDF is expected to need."""
+    body_mb = len(pdf_bytes) / 1024 / 1024
+    memory_mb = ADMISSION_BASE_MB + ADMISSION_BODY_FACTOR * body_mb + ADMISSION_PAGE_MB * count_pages(pdf_bytes)
+    return 1, memory_mb
+
+
+class _Ticket:
+    __slots__ = ("cpu", "memory_mb", "started")
+
+    def __init__(self, cpu, memory_mb):
+        self.cpu = cpu
+        self.memory_mb = memory_mb
+        self.started = None
+
+
+class AdmissionController:
+    """
+    Worker-wide CPU-slot and memory budget for extractions. Requests are
+    admitted first come, first served while their estimated cost fits; a
+    request larger than the whole budget runs alone. Callers that can't be
+    admitted within their timeout are refused, with a Retry-After suggestion
+    from the recent extraction times.
+    """
+
+    def __init__(self, cpu_slots=ADMISSION_CPU_SLOTS, memory_mb=ADMISSION_MEMORY_MB):
+        self.cpu_slots = cpu_slots
+        self.memory_mb = memory_mb
+        self.cond = threading.Condition()
+        self.queue = collections.deque()
+        self.cpu_in_use = 0
+        self.memory_in_use = 0.0
+        self.running = 0
+        self.mean_hold = None
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    def _fits(self, ticket):
+        if self.running == 0:
+            return True
+        return (
+            self.cpu_in_use + ticket.cpu <= self.cpu_slots
+            and self.memory_in_use + ticket.memory_mb <= self.memory_mb
+        )
+
+    def admit(self, cpu, memory_mb, timeout):
+        """Wait up to timeout seconds for room; returns a ticket to release, or None if refused."""
+        ticket = _Ticket(min(cpu, self.cpu_slots), min(memory_mb, self.memory_mb))
+        give_up = time.monotonic() + timeout
+        with self.cond:
+            self.queue.append(ticket)
+            try:
+                if self.queue[0] is not ticket or not self._fits(ticket):
+                    self.stats["queued"] += 1
+                while self.queue[0] is not ticket or not self._fits(ticket):
+                    remaining = give_up - time.monotonic()
+                    if remaining <= 0:
+                        self.stats["rejected"] += 1
+                        return None
+                    self.cond.wait(remaining)
+            finally:
+                self.queue.remove(ticket)
+                # Whoever is next in line may fit now
+                self.cond.notify_all()
+            self.cpu_in_use += ticket.cpu
+            self.memory_in_use += ticket.memory_mb
+            self.running += 1
+            self.stats["admitted"] += 1
+        ticket.started = time.monotonic()
+        return ticket
+
+    def release(self, ticket):
+        held = time.monotonic() - ticket.started
+        with self.cond:
+            self.cpu_in_use -= ticket.cpu
+            self.memory_in_use -= ticket.memory_mb
+            self.running -= 1
+            self.mean_hold = held if self.mean_hold is None else 0.8 * self.mean_hold + 0.2 * held
+            self.cond.notify_all()
+
+    def retry_after(self):
+        """Seconds a refused caller should wait before trying again."""
+        with self.cond:
+            waiting = len(self.queue) + 1
+            mean_hold = self.mean_hold if self.mean_hold is not None else ADMISSION_QUEUE_SECONDS
+        return max(1, math.ceil(mean_hold * waiting / max(self.cpu_slots, 1)))
+
+    def snapshot(self):
+        with self.cond:
+            return {
+                "running": self.running,
+                "queued": len(self.queue),
+                "cpu_in_use": self.cpu_in_use,
+                "memory_mb_in_use": round(self.memory_in_use, 1),
+                **self.stats,
+            }
+
+
+_controller = AdmissionController()
+
+
+def admission_controller():
+    """The worker-wide AdmissionController."""
+    return _controller
+
+
+def admit_extraction(pdf_bytes, timeout=ADMISSION_QUEUE_SECONDS):
+    """
+    Admit one extraction of pdf_bytes. Returns a ticket for release_extraction
+    (True when admission control is off), or None when the worker is too busy.
+    """
+    if not ADMISSION_CONTROL:
+        return True
+    cpu, memory_mb = estimate_cost(pdf_bytes)
+    admitted = _controller.admit(cpu, memory_mb, timeout)
+    if admitted is None:
+        logging.warning(f"Worker busy, turning away a {len(pdf_bytes)}-byte PDF ({_controller.snapshot()})")
+    return admitted
+
+
+def release_extraction(admitted):
+    if admitted and admitted is not True:
+        _controller.release(admitted)
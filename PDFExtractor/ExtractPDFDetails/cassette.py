@@ -0,0 +1,227 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# off, record or replay
+CASSETTE_MODE = os.getenv("GRAPH_CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = os.getenv("GRAPH_CASSETTE_PATH", "graph_cassette.jsonl")
+# Sleep for each interaction's recorded duration when replaying
+CASSETTE_REPLAY_TIMING = os.getenv("GRAPH_CASSETTE_REPLAY_TIMING", "false").lower() == "true"
+# Answer writes that were not recorded (e.g. $batch when the recording used per-item PATCHes)
+CASSETTE_SYNTHESIZE_WRITES = os.getenv("GRAPH_CASSETTE_SYNTHESIZE_WRITES", "true").lower() == "true"
+
+REDACTED = "REDACTED"
+_SECRET_FIELDS = ("access_token", "refresh_token", "id_token", "client_secret", "clientState")
+# Pre-authenticated URLs carry their credential (tempauth, the function key) in the query
+_PREAUTHENTICATED_URL_FIELDS = ("uploadUrl", "@microsoft.graph.downloadUrl", "notificationUrl")
+# Endpoints called on a pre-authenticated URL: recorded and matched without its query
+_PREAUTHENTICATED_ENDPOINTS = ("upload_chunk",)
+_KEPT_HEADERS = ("content-type", "retry-after", "etag", "location")
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def _path_and_query(url, endpoint=None):
+    # Match on path and sorted query so replays work against a different GRAPH_BASE host
+    split = urlsplit(url)
+    if not split.query or endpoint in _PREAUTHENTICATED_ENDPOINTS:
+        return split.path
+    return split.path + "?" + urlencode(sorted(parse_qsl(split.query)))
+
+
+def _without_query(url):
+    return urlsplit(url)._replace(query="").geturl()
+
+
+def _body_bytes(body):
+    if body is None:
+        return b""
+    if isinstance(body, str):
+        return body.encode()
+    if isinstance(body, bytes):
+        return body
+    return b""
+
+
+def _redact_value(key, value):
+    if key in _SECRET_FIELDS:
+        return REDACTED
+    if key in _PREAUTHENTICATED_URL_FIELDS and isinstance(value, str):
+        return _without_query(value)
+    return _redact_json(value)
+
+
+def _redact_json(data):
+    if isinstance(data, dict):
+        return {k: _redact_value(k, v) for k, v in data.items()}
+    if isinstance(data, list):
+        return [_redact_json(v) for v in data]
+    return data
+
+
+class Cassette:
+    """
+    Recorded Graph traffic. Recording appends one redacted JSON line per
+    request/response to the cassette file (tokens, secrets and client states
+    replaced, pre-authenticated URLs kept without their query); replaying serves those responses
+    back, matched on method, path+query and request body.
+    """
+
+    def __init__(self, path, mode):
+        self.path = path
+        self.mode = mode
+        self.lock = threading.Lock()
+        self.interactions = []
+        self.queues = {}
+        if mode == "replay":
+            self.load()
+
+    # --- recording ---------------------------------------------------------
+
+    def record(self, method, endpoint, url, resp, elapsed):
+        request_body = _body_bytes(resp.request.body)
+        if endpoint == "token":
+            request_body = REDACTED.encode()
+        content_type = resp.headers.get("Content-Type", "")
+        if "json" in content_type:
+            try:
+                body = {"json": _redact_json(resp.json())}
+            except ValueError:
+                body = {"text": resp.text}
+        elif content_type.startswith("text/"):
+            body = {"text": resp.text}
+        else:
+            body = {"base64": base64.b64encode(resp.content).decode()}
+        interaction = {
+            "method": method,
+            "endpoint": endpoint,
+            "url": _path_and_query(resp.request.url or url, endpoint),
+            "request_sha256": hashlib.sha256(request_body).hexdigest(),
+            "status": resp.status_code,
+            "headers": {
+                k: (_without_query(v) if k.lower() == "location" else v)
+                for k, v in resp.headers.items() if k.lower() in _KEPT_HEADERS
+            },
+            "body": body,
+            "elapsed": round(elapsed, 4),
+        }
+        line = json.dumps(interaction)
+        with self.lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+    # --- replaying ---------------------------------------------------------
+
+    def load(self):
+        with open(self.path) as f:
+            self.interactions = [json.loads(line) for line in f if line.strip()]
+        self.reset()
+        logging.info(f"Loaded {len(self.interactions)} Graph interactions from {self.path}")
+
+    def reset(self):
+        """Re-arm every recorded response, e.g. between A/B replays of one cassette."""
+        queues = defaultdict(deque)
+        for interaction in self.interactions:
+            method, url = interaction["method"], interaction["url"]
+            queues[(method, url, interaction["request_sha256"])].append(interaction)
+            queues[(method, url)].append(interaction)
+            queues[(method, interaction["endpoint"])].append(interaction)
+        with self.lock:
+            self.queues = {key: [queue, None] for key, queue in queues.items()}
+
+    def _take(self, key):
+        # Serve recorded responses in order, then keep repeating the last one
+        entry = self.queues.get(key)
+        if entry is None:
+            return None
+        queue, last = entry
+        if queue:
+            entry[1] = queue.popleft()
+        return entry[1]
+
+    def _latency(self, endpoint):
+        import statistics
+
+        samples = [i["elapsed"] for i in self.interactions if i["endpoint"] == endpoint]
+        if not samples:
+            samples = [i["elapsed"] for i in self.interactions if i["method"] != "GET"]
+        return statistics.median(samples) if samples else 0.0
+
+    def replay(self, method, endpoint, url, prepared):
+        url = _path_and_query(prepared.url, endpoint)
+        request_hash = hashlib.sha256(_body_bytes(prepared.body)).hexdigest()
+        with self.lock:
+            interaction = (
+                self._take((method, url, request_hash))
+                or self._take((method, url))
+                or (self._take((method, endpoint)) if method != "GET" or endpoint == "token" else None)
+            )
+        if interaction is None:
+            if method == "GET" or not CASSETTE_SYNTHESIZE_WRITES:
+                raise LookupError(f"No recorded Graph response for {method} {url}")
+            interaction = self._synthesize(method, endpoint, prepared)
+        if CASSETTE_REPLAY_TIMING:
+            time.sleep(interaction["elapsed"])
+        return self._response(interaction, prepared)
+
+    def _synthesize(self, method, endpoint, prepared):
+        """Successful response for a write the recording never made."""
+        body = {}
+        if endpoint == "batch":
+            requests_ = json.loads(_body_bytes(prepared.body) or b"{}").get("requests", [])
+            responses = []
+            for sub in requests_:
+                recorded = None
+                if sub["method"] == "GET":
+                    with self.lock:
+                        recorded = self._take(("GET", _path_and_query(sub["url"])))
+                if recorded:
+                    responses.append({"id": sub["id"], "status": recorded["status"], "body": recorded["body"].get("json")})
+                else:
+                    responses.append({"id": sub["id"], "status": 200, "body": {}})
+            body = {"responses": responses}
+        return {
+            "status": 201 if method == "POST" and endpoint != "batch" else 200,
+            "headers": {"Content-Type": "application/json"},
+            "body": {"json": body},
+            "elapsed": self._latency(endpoint),
+        }
+
+    @staticmethod
+    def _response(interaction, prepared):
+        import requests
+
+        resp = requests.Response()
+        resp.status_code = interaction["status"]
+        resp.headers.update(interaction["headers"])
+        body = interaction["body"]
+        if "json" in body:
+            resp._content = json.dumps(body["json"]).encode()
+            resp.headers.setdefault("Content-Type", "application/json")
+        elif "text" in body:
+            resp._content = body["text"].encode()
+        else:
+            resp._content = base64.b64decode(body["base64"])
+        resp.url = prepared.url
+        resp.request = prepared
+        resp.encoding = "utf-8"
+        return resp
+
+
+def active_cassette():
+    """The process-wide cassette when GRAPH_CASSETTE_MODE is record or replay, else None."""
+    global _cassette
+    if CASSETTE_MODE not in ("record", "replay"):
+        return None
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+    return _cassette
@@ -0,0 +1,119 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from .instrumentation import attributed_to
+
+# Collect writes for up to this long after the first pending one before flushing
+COALESCE_WINDOW_MS = float(os.getenv("WRITE_COALESCE_WINDOW_MS", "50"))
+# ...or flush as soon as this many writes are pending
+COALESCE_MAX_WRITES = int(os.getenv("WRITE_COALESCE_MAX_WRITES", "100"))
+
+
+class _PendingWrite:
+    __slots__ = ("method", "url", "body", "merge_key", "headers", "futures", "contexts", "submitted")
+
+    def __init__(self, method, url, body, merge_key, headers):
+        self.method = method
+        self.url = url
+        self.body = body
+        self.merge_key = merge_key
+        self.headers = headers
+        self.futures = [Future()]
+        # Each submitter's context, to account the flush to its invocation
+        self.contexts = [contextvars.copy_context()]
+        self.submitted = time.monotonic()
+
+
+class WriteCoalescer:
+    """
+    Collects Graph writes from every invocation running on this worker and
+    sends them together through send_batch (a callable taking $batch
+    sub-requests and returning {id: sub-response}). Writes sharing a merge_key,
+    e.g. PATCHes of the same item's fields, are merged into one sub-request,
+    later fields winning. Each submitter gets a Future for its own sub-response.
+    The $batch calls a flush makes are accounted to every invocation with a
+    write in it (metrics, trace and profile) before its Futures resolve.
+    """
+
+    def __init__(self, send_batch, window_ms=COALESCE_WINDOW_MS, max_writes=COALESCE_MAX_WRITES):
+        self.send_batch = send_batch
+        self.window = window_ms / 1000
+        self.max_writes = max_writes
+        self.cond = threading.Condition()
+        self.pending = []
+        self.by_key = {}
+        self.stats = {"submitted": 0, "merged": 0, "flushes": 0, "sub_requests": 0}
+        self.thread = None
+
+    def submit(self, method, url, body=None, merge_key=None, headers=None):
+        """
+        Queue one write (url and headers as in a $batch sub-request); returns a
+        Future of its sub-response.
+        """
+        with self.cond:
+            self.stats["submitted"] += 1
+            existing = self.by_key.get(merge_key) if merge_key is not None else None
+            if existing is not None:
+                existing.body = {**(existing.body or {}), **(body or {})}
+                future = Future()
+                existing.futures.append(future)
+                existing.contexts.append(contextvars.copy_context())
+                self.stats["merged"] += 1
+                return future
+            write = _PendingWrite(method, url, body, merge_key, headers)
+            self.pending.append(write)
+            if merge_key is not None:
+                self.by_key[merge_key] = write
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="graph-write-coalescer", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+            return write.futures[0]
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                deadline = self.pending[0].submitted + self.window
+                while len(self.pending) < self.max_writes:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.cond.wait(remaining)
+                writes, self.pending, self.by_key = self.pending, [], {}
+            self._flush(writes)
+
+    def _flush(self, writes):
+        batch_requests = []
+        for index, write in enumerate(writes):
+            request = {"id": str(index), "method": write.method, "url": write.url}
+            headers = dict(write.headers or {})
+            if write.body is not None:
+                headers["Content-Type"] = "application/json"
+                request["body"] = write.body
+            if headers:
+                request["headers"] = headers
+            batch_requests.append(request)
+        self.stats["flushes"] += 1
+        self.stats["sub_requests"] += len(batch_requests)
+        try:
+            with attributed_to([context for write in writes for context in write.contexts]):
+                responses = self.send_batch(batch_requests)
+        except Exception as ex:
+            logging.error(f"Coalesced Graph batch of {len(writes)} writes failed: {ex}")
+            for write in writes:
+                for future in write.futures:
+                    future.set_exception(ex)
+            return
+        for index, write in enumerate(writes):
+            sub = responses.get(str(index))
+            for future in write.futures:
+                if sub is None:
+                    future.set_exception(Exception("No response in batch"))
+                else:
+                    future.set_result(sub)
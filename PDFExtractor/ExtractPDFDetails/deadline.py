@@ -0,0 +1,111 @@
+import contextvars
+import json
+import logging
+import os
+import time
+
+# Seconds kept back from the budget to stop cleanly and send the partial response
+DEADLINE_MARGIN = float(os.getenv("DEADLINE_MARGIN_SECONDS", "10"))
+# Azure's front end drops HTTP requests that take longer than this, whatever functionTimeout says
+HTTP_RESPONSE_LIMIT = 230
+# functionTimeout when neither the app settings nor host.json set one (Consumption plan default)
+DEFAULT_FUNCTION_TIMEOUT = 300
+HOST_JSON = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "host.json")
+
+_current_deadline = contextvars.ContextVar("pdf_extractor_deadline", default=None)
+_function_timeout = None
+
+
+class DeadlineExceeded(Exception):
+    """The request budget ran out; the run stops and reports what it finished."""
+
+    # Set by work that can continue where it stopped (e.g. extraction's next page)
+    checkpoint = None
+
+
+class Deadline:
+    def __init__(self, budget):
+        self.budget = budget
+        self.expires = time.monotonic() + budget
+
+    def remaining(self):
+        return self.expires - time.monotonic()
+
+    def check(self, what, needed=0.0):
+        if self.remaining() <= needed:
+            raise DeadlineExceeded(f"request budget of {self.budget:.0f}s exhausted before {what}")
+
+
+def _parse_timespan(value):
+    # functionTimeout is a TimeSpan ("00:05:00", "1.00:00:00") or -1 for unbounded
+    value = str(value).strip()
+    if value == "-1":
+        return None
+    days = 0
+    if "." in value.split(":")[0]:
+        day_part, value = value.split(".", 1)
+        days = int(day_part)
+    hours, minutes, seconds = (float(part) for part in value.split(":"))
+    return days * 86400 + hours * 3600 + minutes * 60 + seconds
+
+
+def function_timeout():
+    """The host's functionTimeout in seconds (app setting override, then host.json), None if unbounded."""
+    global _function_timeout
+    if _function_timeout is None:
+        setting = os.getenv("AzureFunctionsJobHost__functionTimeout")
+        if setting is None:
+            try:
+                with open(HOST_JSON) as f:
+                    setting = json.load(f).get("functionTimeout")
+            except (OSError, ValueError) as ex:
+                logging.warning(f"Could not read functionTimeout from {HOST_JSON}: {ex}")
+        try:
+            _function_timeout = (_parse_timespan(setting) if setting else DEFAULT_FUNCTION_TIMEOUT,)
+        except ValueError:
+            logging.warning(f"Unrecognized functionTimeout '{setting}', using {DEFAULT_FUNCTION_TIMEOUT}s")
+            _function_timeout = (DEFAULT_FUNCTION_TIMEOUT,)
+    return _function_timeout[0]
+
+
+def request_budget(req):
+    """
+    Seconds this request may run: the caller's x-deadline-ms header, the host's
+    functionTimeout and the HTTP response limit, whichever is smallest, less
+    DEADLINE_MARGIN.
+    """
+    limits = [HTTP_RESPONSE_LIMIT]
+    timeout = function_timeout()
+    if timeout:
+        limits.append(timeout)
+    header = req.headers.get("x-deadline-ms")
+    if header:
+        try:
+            limits.append(float(header) / 1000)
+        except ValueError:
+            logging.warning(f"Ignoring invalid x-deadline-ms header: {header}")
+    return max(0.0, min(limits) - DEADLINE_MARGIN)
+
+
+def start_deadline(budget):
+    """Start the deadline for the current invocation."""
+    deadline = Deadline(budget)
+    _current_deadline.set(deadline)
+    return deadline
+
+
+def remaining_time():
+    """Seconds left in the current invocation's budget, or None outside one."""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline else None
+
+
+def check_deadline(what, needed=0.0):
+    """Raise DeadlineExceeded unless more than needed seconds are left for the next piece of work."""
+    deadline = _current_deadline.get()
+    if deadline:
+        deadline.check(what, needed)
+
+
+def clear_deadline():
+    _current_deadline.set(None)
@@ -0,0 +1,264 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .tracing import _get_tracer, record_span, span
+
+# Upper bounds (ms) of the Graph latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_current_run = contextvars.ContextVar("pdf_extractor_run", default=None)
+_meter = None
+_meter_ready = False
+_meter_lock = threading.Lock()
+
+
+class RunStats:
+    """
+    Per-invocation timing and Graph call accounting.
+    Stages record wall and CPU time; Graph calls are grouped by endpoint with
+    call counts, bytes sent/received and a latency histogram.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.graph = {}
+        self.latencies = []
+        # Hedged Graph requests record from more than one thread
+        self.lock = threading.Lock()
+        # Only collected while an invocation is being profiled
+        self.timeline = None
+        self.pages = None
+
+    def add_stage(self, name, wall, cpu):
+        stage = self.stages.setdefault(name, {"wall_ms": 0.0, "cpu_ms": 0.0, "count": 0})
+        stage["wall_ms"] += wall * 1000
+        stage["cpu_ms"] += cpu * 1000
+        stage["count"] += 1
+
+    def add_graph_call(self, endpoint, status, elapsed, bytes_sent, bytes_received):
+        with self.lock:
+            self._add_graph_call(endpoint, status, elapsed, bytes_sent, bytes_received)
+
+    def _add_graph_call(self, endpoint, status, elapsed, bytes_sent, bytes_received):
+        calls = self.graph.get(endpoint)
+        if calls is None:
+            calls = self.graph[endpoint] = {
+                "calls": 0,
+                "errors": 0,
+                "bytes_sent": 0,
+                "bytes_received": 0,
+                "latency_ms_total": 0.0,
+                "latency_ms_max": 0.0,
+                "latency_histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+            }
+        elapsed_ms = elapsed * 1000
+        self.latencies.append((endpoint, elapsed_ms))
+        if self.timeline is not None:
+            self.timeline.append({
+                "offset_ms": round((time.perf_counter() - self.started) * 1000 - elapsed_ms, 1),
+                "endpoint": endpoint,
+                "status": status,
+                "elapsed_ms": round(elapsed_ms, 1),
+                "bytes_sent": bytes_sent,
+                "bytes_received": bytes_received,
+            })
+        calls["calls"] += 1
+        if status is None or status >= 400:
+            calls["errors"] += 1
+        calls["bytes_sent"] += bytes_sent
+        calls["bytes_received"] += bytes_received
+        calls["latency_ms_total"] += elapsed_ms
+        calls["latency_ms_max"] = max(calls["latency_ms_max"], elapsed_ms)
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[bucket]:
+            bucket += 1
+        calls["latency_histogram"][bucket] += 1
+
+    def summary(self):
+        """JSON-serializable summary block for the HTTP response."""
+        graph = {}
+        for endpoint, calls in self.graph.items():
+            graph[endpoint] = dict(calls)
+            graph[endpoint]["latency_ms_total"] = round(calls["latency_ms_total"], 1)
+            graph[endpoint]["latency_ms_max"] = round(calls["latency_ms_max"], 1)
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "stages": {
+                name: {"wall_ms": round(s["wall_ms"], 1), "cpu_ms": round(s["cpu_ms"], 1), "count": s["count"]}
+                for name, s in self.stages.items()
+            },
+            "graph_calls": sum(c["calls"] for c in self.graph.values()),
+            "graph": graph,
+            "latency_buckets_ms": list(LATENCY_BUCKETS_MS),
+        }
+
+
+def start_run():
+    """Start accounting for the current invocation and return its RunStats."""
+    stats = RunStats()
+    _current_run.set(stats)
+    return stats
+
+
+def current_run():
+    return _current_run.get()
+
+
+@contextmanager
+def stage(name):
+    """Time a stage of the current invocation (wall and thread CPU time) in its own span."""
+    stats = _current_run.get()
+    with span(f"stage {name}", stage=name):
+        if stats is None:
+            yield
+            return
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            stats.add_stage(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+
+def record_graph_call(endpoint, status, elapsed, bytes_sent=0, bytes_received=0):
+    stats = _current_run.get()
+    if stats is not None:
+        stats.add_graph_call(endpoint, status, elapsed, bytes_sent, bytes_received)
+
+
+class _SharedCalls:
+    """Stands in for a RunStats while Graph calls are made on behalf of several runs."""
+
+    pages = None
+
+    def __init__(self):
+        self.calls = []
+
+    def add_graph_call(self, endpoint, status, elapsed, bytes_sent, bytes_received):
+        self.calls.append((endpoint, status, elapsed, bytes_sent, bytes_received, time.time_ns()))
+
+
+@contextmanager
+def attributed_to(contexts):
+    """
+    Account the Graph calls made in the block to every invocation whose
+    contextvars.copy_context() is in contexts: each call is added to their
+    RunStats and recorded as a span in their trace, under the span they were in
+    when they copied the context. For work done on a worker thread on behalf of
+    several invocations, such as a coalesced $batch.
+    """
+    shared = _SharedCalls()
+    token = _current_run.set(shared)
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+        submitters = {}
+        for context in contexts:
+            stats = context.get(_current_run)
+            submitters.setdefault(id(stats), (stats, context))
+        for stats, context in submitters.values():
+            for endpoint, status, elapsed, bytes_sent, bytes_received, ended in shared.calls:
+                if stats is not None:
+                    stats.add_graph_call(endpoint, status, elapsed, bytes_sent, bytes_received)
+                context.run(
+                    record_span, f"graph {endpoint}", ended - int(elapsed * 1e9), ended,
+                    **{"graph.endpoint": endpoint, "http.status_code": status or 0, "graph.shared": True},
+                )
+
+
+def record_page(page_num, elapsed, tables):
+    stats = _current_run.get()
+    if stats is not None and stats.pages is not None:
+        stats.pages.append({"page": page_num, "elapsed_ms": round(elapsed * 1000, 1), "tables": tables})
+
+
+def _get_meter():
+    """
+    OpenTelemetry meter exporting to Application Insights, or None when
+    azure-monitor-opentelemetry-exporter is not installed or not configured.
+    Only metrics are exported: the Functions host already ships the logs, so
+    no logging handlers or auto-instrumentation are installed, and the meter
+    provider is the function's own rather than the global one.
+    """
+    global _meter, _meter_ready
+    if _meter_ready:
+        return _meter
+    with _meter_lock:
+        if _meter_ready:
+            return _meter
+        try:
+            connection_string = os.environ.get("APPLICATIONINSIGHTS_CONNECTION_STRING")
+            if not connection_string:
+                return None
+            try:
+                from azure.monitor.opentelemetry.exporter import AzureMonitorMetricExporter
+                from opentelemetry.sdk.metrics import MeterProvider
+                from opentelemetry.sdk.metrics.export import PeriodicExportingMetricReader
+                from opentelemetry.sdk.resources import Resource
+            except ImportError:
+                return None
+            try:
+                reader = PeriodicExportingMetricReader(AzureMonitorMetricExporter(connection_string=connection_string))
+                provider = MeterProvider(
+                    metric_readers=[reader], resource=Resource.create({"service.name": "PDFExtractor"})
+                )
+                _meter = provider.get_meter("PDFExtractor")
+            except Exception as ex:
+                logging.warning(f"Application Insights metrics unavailable: {ex}")
+            return _meter
+        finally:
+            _meter_ready = True
+
+
+def prime_telemetry():
+    """
+    Set up the metric and trace exporters now (e.g. in warm-up) instead of in
+    the first invocation's emit_metrics; returns which of them are active.
+    """
+    return {"metrics": _get_meter() is not None, "traces": _get_tracer() is not None}
+
+
+_instruments = {}
+
+
+def _instrument(kind, name, unit):
+    key = (kind, name)
+    if key not in _instruments:
+        meter = _get_meter()
+        with _meter_lock:
+            if key not in _instruments:
+                create = meter.create_histogram if kind == "histogram" else meter.create_counter
+                _instruments[key] = create(name, unit=unit)
+    return _instruments[key]
+
+
+def emit_metrics(stats):
+    """
+    Emit the invocation's numbers as Application Insights custom metrics.
+    Falls back to one structured log line when no meter is available.
+    """
+    summary = stats.summary()
+    meter = _get_meter()
+    if meter is None:
+        logging.info("PDFExtractor metrics: %s", json.dumps(summary))
+        return
+    _instrument("histogram", "pdfextractor.run.duration", "ms").record(summary["total_ms"])
+    for name, s in summary["stages"].items():
+        _instrument("histogram", "pdfextractor.stage.wall", "ms").record(s["wall_ms"], {"stage": name})
+        _instrument("histogram", "pdfextractor.stage.cpu", "ms").record(s["cpu_ms"], {"stage": name})
+    for endpoint, calls in summary["graph"].items():
+        attributes = {"endpoint": endpoint}
+        _instrument("counter", "pdfextractor.graph.calls", "1").add(calls["calls"], attributes)
+        _instrument("counter", "pdfextractor.graph.errors", "1").add(calls["errors"], attributes)
+        _instrument("counter", "pdfextractor.graph.bytes_sent", "By").add(calls["bytes_sent"], attributes)
+        _instrument("counter", "pdfextractor.graph.bytes_received", "By").add(calls["bytes_received"], attributes)
+    latency = _instrument("histogram", "pdfextractor.graph.latency", "ms")
+    for endpoint, elapsed_ms in stats.latencies:
+        latency.record(elapsed_ms, {"endpoint": endpoint})
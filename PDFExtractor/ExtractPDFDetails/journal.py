@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# file (local disk), blob (Azure Storage append blobs) or off
+JOURNAL_BACKEND = os.getenv("JOURNAL_BACKEND", "file").lower()
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", os.path.join(tempfile.gettempdir(), "pdfextractor-journal"))
+JOURNAL_CONTAINER = os.getenv("JOURNAL_CONTAINER", "pdfextractor-journal")
+JOURNAL_CONNECTION_STRING = os.getenv("JOURNAL_CONNECTION_STRING") or os.getenv("AzureWebJobsStorage")
+# A journal older than this is discarded, so re-sending a PDF later processes it again
+JOURNAL_TTL_HOURS = float(os.getenv("JOURNAL_TTL_HOURS", "24"))
+
+
+class FileJournalStore:
+    """Journals as JSON-lines files on local disk (fine for one instance and for local runs)."""
+
+    def __init__(self, directory=JOURNAL_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.jsonl")
+
+    def read(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def append(self, key, data):
+        with open(self._path(key), "ab") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class BlobJournalStore:
+    """Journals as append blobs, so a retry that lands on another instance still finds them."""
+
+    def __init__(self, connection_string=JOURNAL_CONNECTION_STRING, container=JOURNAL_CONTAINER):
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.blob import BlobServiceClient
+
+        self.container = BlobServiceClient.from_connection_string(connection_string).get_container_client(container)
+        try:
+            self.container.create_container()
+        except ResourceExistsError:
+            pass
+
+    def read(self, key):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            return self.container.get_blob_client(f"{key}.jsonl").download_blob().readall()
+        except ResourceNotFoundError:
+            return None
+
+    def append(self, key, data):
+        from azure.core.exceptions import ResourceExistsError
+
+        blob = self.container.get_blob_client(f"{key}.jsonl")
+        if not blob.exists():
+            try:
+                blob.create_append_blob()
+            except ResourceExistsError:
+                pass
+        blob.append_block(data)
+
+    def delete(self, key):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            self.container.get_blob_client(f"{key}.jsonl").delete_blob()
+        except ResourceNotFoundError:
+            pass
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj):
+    if "$datetime" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+class RunJournal:
+    """
+    Append-only record of the work done for one PDF: the pages extracted so
+    far, the extracted rows, the DDR items pushed, the WellPlanAON update plan
+    and the updates written, the uploaded log and finally the response (only
+    once every push and update went through). A retry of the same PDF reads it
+    back and only does what is missing.
+    """
+
+    def __init__(self, store, key):
+        self.store = store
+        self.key = key
+        self.lock = threading.Lock()
+        self.started = None
+        self.extracting = {}
+        self.extracted = None
+        self.pushed = set()
+        self.plan = None
+        self.updated = set()
+        self.log_url = None
+        self.log_done = False
+        self.result = None
+        self.result_params = None
+        self.resumed = False
+        self._load()
+
+    def _load(self):
+        raw = self.store.read(self.key)
+        events = []
+        for line in (raw or b"").splitlines():
+            try:
+                events.append(json.loads(line, object_hook=_decode))
+            except ValueError:
+                # A torn last line from a crash mid-append
+                logging.warning(f"Ignoring unreadable journal line for {self.key}")
+        if events and time.time() - events[0].get("at", 0) > JOURNAL_TTL_HOURS * 3600:
+            self.store.delete(self.key)
+            events = []
+        for event in events:
+            self._apply(event)
+        self.resumed = bool(events)
+        if not events:
+            self.record("started")
+
+    def _apply(self, event):
+        kind = event["event"]
+        if kind == "started":
+            self.started = event["at"]
+        elif kind == "extracting":
+            self.extracting = {"start_page": event["start_page"], "all_values": event["all_values"]}
+        elif kind == "extracted":
+            self.extracted = {"rows": event["rows"], "tables": event["tables"]}
+        elif kind == "pushed":
+            self.pushed.update(event["wells"])
+        elif kind == "planned":
+            self.plan = {
+                "cascade": event["cascade"], "full": event.get("full", False),
+                "updates": event["updates"], "log": event["log"],
+            }
+            self.updated = set()
+        elif kind == "updated":
+            self.updated.update(event["ids"])
+        elif kind == "log_uploaded":
+            self.log_url = event["url"]
+            self.log_done = True
+        elif kind == "completed":
+            self.result = event["result"]
+            self.result_params = event.get("params")
+
+    def record(self, kind, **data):
+        """Durably append one event before returning."""
+        event = {"event": kind, "at": time.time(), **data}
+        line = json.dumps(event, default=_encode) + "\n"
+        with self.lock:
+            self.store.append(self.key, line.encode())
+            self._apply(event)
+
+    def reset(self):
+        """Forget everything recorded for this PDF (e.g. ?restart=true)."""
+        with self.lock:
+            self.store.delete(self.key)
+        self.__init__(self.store, self.key)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def journal_store():
+    """The configured journal store, or None when JOURNAL_BACKEND is off."""
+    global _store
+    if JOURNAL_BACKEND not in ("file", "blob"):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobJournalStore() if JOURNAL_BACKEND == "blob" else FileJournalStore()
+    return _store
+
+
+def open_journal(pdf_bytes):
+    """RunJournal for this PDF (keyed by its SHA-256), or None when journaling is off."""
+    store = journal_store()
+    if store is None:
+        return None
+    return RunJournal(store, hashlib.sha256(pdf_bytes).hexdigest())
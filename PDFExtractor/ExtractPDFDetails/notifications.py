@@ -0,0 +1,165 @@
+import hmac
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from .deadline import DeadlineExceeded, clear_deadline, start_deadline
+
+# Public URL of the ListNotifications function (with its ?code= key); empty turns subscriptions off
+NOTIFICATION_URL = os.getenv("GRAPH_NOTIFICATION_URL", "")
+# Secret sent back in every notification; notifications without it are ignored
+NOTIFICATION_CLIENT_STATE = os.getenv("GRAPH_NOTIFICATION_CLIENT_STATE", "")
+# Lifetime requested on every create/renewal (SharePoint lists allow up to 30 days)
+SUBSCRIPTION_MINUTES = int(os.getenv("GRAPH_SUBSCRIPTION_MINUTES", str(3 * 24 * 60)))
+# Where each list's delta link is kept between notifications
+DELTA_LINK_DIR = os.getenv("GRAPH_DELTA_LINK_DIR", os.path.join(tempfile.gettempdir(), "pdfextractor-delta"))
+# Time budget of each catch-up (delta pull or index reload) run after a notification was acknowledged
+CATCH_UP_SECONDS = float(os.getenv("GRAPH_NOTIFICATION_CATCH_UP_SECONDS", "120"))
+
+
+def parse_notifications(body):
+    """
+    The change notifications in a Graph notification POST body whose
+    clientState matches, and the number rejected for a wrong or missing one.
+    """
+    accepted = []
+    rejected = 0
+    for notification in (body or {}).get("value", []):
+        client_state = notification.get("clientState") or ""
+        if NOTIFICATION_CLIENT_STATE and hmac.compare_digest(client_state, NOTIFICATION_CLIENT_STATE):
+            accepted.append(notification)
+        else:
+            rejected += 1
+    return accepted, rejected
+
+
+def notified_list_id(notification):
+    """The list ID in a notification's resource (sites/{site-id}/lists/{list-id}), or None."""
+    match = re.search(r"lists/([^/]+)", notification.get("resource", ""))
+    return match.group(1) if match else None
+
+
+class DeltaLinks:
+    """The latest Graph delta link of each list, in one JSON file on local disk."""
+
+    def __init__(self, directory=DELTA_LINK_DIR):
+        self.path = os.path.join(directory, "delta_links.json")
+        # Held for a whole delta pull, so concurrent notifications don't pull the same changes twice
+        self.lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logging.warning(f"Ignoring unreadable delta links in {self.path}")
+            return {}
+
+    def get(self, list_id):
+        with self.lock:
+            return self._read().get(list_id)
+
+    def set(self, list_id, link):
+        with self.lock:
+            links = self._read()
+            links[list_id] = link
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(links, f)
+            os.replace(tmp, self.path)
+
+
+_delta_links = None
+_delta_links_lock = threading.Lock()
+
+
+def delta_links():
+    global _delta_links
+    if _delta_links is None:
+        with _delta_links_lock:
+            if _delta_links is None:
+                _delta_links = DeltaLinks()
+    return _delta_links
+
+
+class NotificationCatchUp:
+    """
+    Runs the work behind change notifications on a background thread, so the
+    endpoint can acknowledge Graph at once. Notifications for a list that is
+    already queued are folded into the queued one. Each run of handle (called
+    with the queued notifications) gets its own CATCH_UP_SECONDS deadline.
+    """
+
+    def __init__(self, handle, budget=CATCH_UP_SECONDS):
+        self.handle = handle
+        self.budget = budget
+        self.cond = threading.Condition()
+        self.pending = {}
+        self.running = False
+        self.handled = {}
+        self.stats = {"queued": 0, "folded": 0, "runs": 0, "failed": 0}
+        self.thread = None
+
+    def submit(self, notifications):
+        """Queue notifications for catch-up; returns how many lists are now waiting."""
+        with self.cond:
+            for notification in notifications:
+                self.stats["queued"] += 1
+                list_id = notified_list_id(notification)
+                if list_id in self.pending:
+                    self.stats["folded"] += 1
+                else:
+                    self.pending[list_id] = notification
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="graph-notification-catch-up", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+            return len(self.pending)
+
+    def wait(self, timeout=None):
+        """
+        Block until everything queued has been handled (or timeout seconds
+        passed); returns whether it was, and the summary of each list's last run.
+        """
+        expires = None if timeout is None else time.monotonic() + timeout
+        with self.cond:
+            while self.pending or self.running:
+                remaining = None if expires is None else expires - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False, dict(self.handled)
+                self.cond.wait(remaining)
+            return True, dict(self.handled)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+                notifications, self.pending = list(self.pending.values()), {}
+                self.running = True
+            handled = {}
+            start_deadline(self.budget)
+            try:
+                handled = self.handle(notifications)
+                logging.info(f"Change notifications handled: {json.dumps(handled)}")
+            except DeadlineExceeded as ex:
+                self.stats["failed"] += 1
+                logging.warning(f"Change-notification catch-up stopped: {ex}")
+            except Exception:
+                # Delta links only move on after a successful pull, so the next notification retries
+                self.stats["failed"] += 1
+                logging.exception("Change-notification catch-up failed")
+            finally:
+                clear_deadline()
+                with self.cond:
+                    self.stats["runs"] += 1
+                    self.handled.update(handled)
+                    self.running = False
+                    self.cond.notify_all()
@@ -0,0 +1,88 @@
+import hmac
+import logging
+import marshal
+import os
+import threading
+
+# Shared secret callers must send in x-profile-key to profile an invocation
+PROFILING_KEY = os.environ.get("PROFILING_KEY")
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "40"))
+
+# Python 3.12+ allows one active cProfile profiler per process, so profiled invocations take turns
+_active_lock = threading.Lock()
+
+
+def requested_profile_mode(req):
+    """
+    "upload" or "inline" when an authorized caller asked for a profile through
+    ?profile= or the x-profile header, else None.
+    """
+    mode = req.params.get("profile") or req.headers.get("x-profile")
+    if not mode:
+        return None
+    key = req.headers.get("x-profile-key", "")
+    if not PROFILING_KEY or not hmac.compare_digest(key.encode(), PROFILING_KEY.encode()):
+        logging.warning("Ignoring profile request without a valid x-profile-key")
+        return None
+    return "inline" if mode.lower() == "inline" else "upload"
+
+
+class InvocationProfiler:
+    """
+    Runs one invocation under cProfile and collects per-page extraction timings
+    and the Graph call timeline through the invocation's RunStats.
+    """
+
+    def __init__(self, stats):
+        import cProfile
+
+        self.stats = stats
+        self.stats.timeline = []
+        self.stats.pages = []
+        self.profile = cProfile.Profile()
+        self.active = False
+
+    def start(self):
+        """Start profiling; False when another invocation on this worker is being profiled."""
+        if not _active_lock.acquire(blocking=False):
+            logging.warning("Another invocation is being profiled; running this one without a profile")
+            return False
+        self.active = True
+        self.profile.enable()
+        return True
+
+    def stop(self):
+        if self.active:
+            self.profile.disable()
+            self.active = False
+            _active_lock.release()
+
+    def report(self):
+        """Hotspots, PyMuPDF hotspots, page timings and Graph timeline as a dict."""
+        import pstats
+
+        stats = pstats.Stats(self.profile)
+        rows = []
+        for (file_name, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+            rows.append({
+                "function": f"{os.path.basename(file_name)}:{line}({function})",
+                "file": file_name,
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 2),
+                "cumtime_ms": round(cumtime * 1000, 2),
+            })
+        rows.sort(key=lambda r: r["cumtime_ms"], reverse=True)
+        pymupdf_rows = [r for r in rows if "pymupdf" in r["file"] or "fitz" in r["file"]]
+        for r in rows:
+            del r["file"]
+        return {
+            "hotspots": rows[:PROFILE_TOP_FUNCTIONS],
+            "pymupdf_hotspots": pymupdf_rows[:PROFILE_TOP_FUNCTIONS],
+            "pages": self.stats.pages,
+            "graph_timeline": self.stats.timeline,
+        }
+
+    def dump(self):
+        """Raw profile in pstats format (loadable with pstats.Stats or snakeviz)."""
+        self.profile.create_stats()
+        return marshal.dumps(self.profile.stats)
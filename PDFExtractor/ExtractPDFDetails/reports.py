@@ -0,0 +1,111 @@
+import csv
+import io
+import os
+import tempfile
+import warnings
+
+# xlsx (openpyxl write-only workbook) or csv
+NO_ENTRIES_LOG_FORMAT = os.getenv("NO_ENTRIES_LOG_FORMAT", "xlsx").lower()
+# Reports are kept in memory up to this size, then spill to a temporary file
+REPORT_SPOOL_MAX_BYTES = int(os.getenv("REPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+
+
+class StreamBody:
+    """
+    File-like request body of known length. requests sends it with a
+    Content-Length, reading it in blocks, instead of loading it into memory (or
+    rolling a SpooledTemporaryFile over to disk just to fstat it).
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        fileobj.seek(0, os.SEEK_END)
+        self.len = fileobj.tell()
+        fileobj.seek(0)
+
+    def read(self, size=-1):
+        return self.fileobj.read(size)
+
+
+def spool_stream(chunks):
+    """Copy an iterable of byte chunks into a SpooledTemporaryFile, rewound to the start."""
+    spool = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES)
+    for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def report_columns(rows):
+    """Column names in order of first appearance across the rows (like pandas.DataFrame(rows))."""
+    return list(dict.fromkeys(key for row in rows for key in row))
+
+
+def _write_xlsx(rows, columns, out, table_name=None):
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+    from openpyxl.worksheet.table import Table, TableColumn, TableStyleInfo
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Sheet1")
+    header = []
+    for name in columns:
+        cell = WriteOnlyCell(sheet, value=name)
+        cell.font = Font(bold=True)
+        header.append(cell)
+    sheet.append(header)
+    for row in rows:
+        sheet.append([row.get(name) for name in columns])
+    if table_name:
+        # An Excel table needs at least one row below its header
+        ref = f"A1:{get_column_letter(len(columns))}{max(len(rows), 1) + 1}"
+        table = Table(displayName=table_name, ref=ref)
+        # Write-only worksheets can't derive the table columns from the header cells
+        table.tableColumns = [TableColumn(id=index, name=str(name)) for index, name in enumerate(columns, 1)]
+        table.tableStyleInfo = TableStyleInfo(name="TableStyleMedium2", showRowStripes=True)
+        with warnings.catch_warnings():
+            # openpyxl warns on every write-only add_table, even with the columns set
+            warnings.simplefilter("ignore", UserWarning)
+            sheet.add_table(table)
+    workbook.save(out)
+
+
+def _write_csv(rows, columns, out, table_name=None):
+    # utf-8-sig so Excel detects the encoding when the file is opened directly
+    text = io.TextIOWrapper(out, encoding="utf-8-sig", newline="")
+    writer = csv.DictWriter(text, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(rows)
+    text.flush()
+    text.detach()
+
+
+WRITERS = {"xlsx": _write_xlsx, "csv": _write_csv}
+
+
+def spool_report(rows, report_format=None, columns=None, table_name=None):
+    """
+    Stream rows (dicts) into a SpooledTemporaryFile as an xlsx workbook or CSV,
+    without building a DataFrame. columns defaults to every key in order of first
+    appearance; table_name (xlsx only) formats the rows as a named Excel table.
+    Returns the spool rewound to the start; the caller closes it.
+    """
+    report_format = (report_format or NO_ENTRIES_LOG_FORMAT).lower()
+    if report_format not in WRITERS:
+        raise ValueError(f"Unsupported report format '{report_format}' (expected one of {sorted(WRITERS)})")
+    rows = list(rows)
+    spool = tempfile.SpooledTemporaryFile(max_size=REPORT_SPOOL_MAX_BYTES)
+    try:
+        WRITERS[report_format](rows, columns or report_columns(rows), spool, table_name)
+        spool.seek(0)
+    except Exception:
+        spool.close()
+        raise
+    return spool
@@ -0,0 +1,239 @@
+import collections
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+# GETs to these Graph endpoints are hedged: a duplicate goes out when the first is slow ("" turns hedging off)
+HEDGE_ENDPOINTS = {e.strip() for e in os.getenv("GRAPH_HEDGE_ENDPOINTS", "site,lists,list_items").split(",") if e.strip()}
+# Send the duplicate once the first request is slower than this percentile of the endpoint's recent latencies
+HEDGE_PERCENTILE = float(os.getenv("GRAPH_HEDGE_PERCENTILE", "95"))
+# ...but never sooner than this, and after this long while too few latencies are known
+HEDGE_MIN_DELAY_MS = float(os.getenv("GRAPH_HEDGE_MIN_DELAY_MS", "50"))
+HEDGE_DEFAULT_DELAY_MS = float(os.getenv("GRAPH_HEDGE_DEFAULT_DELAY_MS", "1000"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_WINDOW = 200  # Recent latencies kept per endpoint
+HEDGE_THREADS = 16  # Backup requests in flight at once; primaries never wait for these
+
+# Fail fast on an endpoint after this many consecutive failures (errors, timeouts, 5xx)...
+CIRCUIT_BREAKER = os.getenv("GRAPH_CIRCUIT_BREAKER", "true").lower() == "true"
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("GRAPH_CIRCUIT_FAILURES", "5"))
+# ...for this long, then let one probe request through to test it
+CIRCUIT_OPEN_SECONDS = float(os.getenv("GRAPH_CIRCUIT_OPEN_SECONDS", "30"))
+# Last good GET responses kept to answer from while an endpoint's circuit is open (least recent dropped first)
+STALE_CACHE_MAX_BYTES = int(os.getenv("GRAPH_STALE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+# Never answered from a stale response: replaying an old delta page would undo later changes,
+# and an item re-read after a write conflict has to be its current version
+STALE_EXCLUDED_ENDPOINTS = {"list_items_delta", "list_item"}
+
+stats = collections.Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _stats_lock:
+        stats[name] += 1
+
+
+class CircuitOpenError(Exception):
+    """Graph calls to an endpoint are being refused until it recovers."""
+
+
+class LatencyTracker:
+    """Recent latencies of one endpoint and the hedge delay derived from them."""
+
+    def __init__(self, window=HEDGE_WINDOW):
+        self.lock = threading.Lock()
+        self.samples = collections.deque(maxlen=window)
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def hedge_delay(self):
+        with self.lock:
+            if len(self.samples) < HEDGE_MIN_SAMPLES:
+                return HEDGE_DEFAULT_DELAY_MS / 1000
+            ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))
+        return max(ordered[index], HEDGE_MIN_DELAY_MS / 1000)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. Open (after CIRCUIT_FAILURE_THRESHOLD consecutive
+    failures): calls are refused for CIRCUIT_OPEN_SECONDS. Half-open: one probe
+    goes through; its success closes the circuit, its failure opens it again.
+    """
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def allow(self):
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.probing or time.monotonic() - self.opened_at < CIRCUIT_OPEN_SECONDS:
+                return False
+            self.probing = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logging.info(f"Graph {self.endpoint} recovered; closing its circuit")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.probing or (self.opened_at is None and self.failures >= CIRCUIT_FAILURE_THRESHOLD):
+                if self.opened_at is None:
+                    _count("circuit_opened")
+                    logging.warning(
+                        f"Graph {self.endpoint} failed {self.failures} times in a row; "
+                        f"failing fast for {CIRCUIT_OPEN_SECONDS:.0f}s"
+                    )
+                self.opened_at = time.monotonic()
+                self.probing = False
+
+    @property
+    def state(self):
+        with self.lock:
+            if self.opened_at is None:
+                return "closed"
+            return "half-open" if self.probing else "open"
+
+
+_trackers = {}
+_breakers = {}
+_registry_lock = threading.Lock()
+_stale = collections.OrderedDict()
+_stale_bytes = 0
+_stale_lock = threading.Lock()
+_executor = None
+
+
+def latency_tracker(endpoint):
+    with _registry_lock:
+        if endpoint not in _trackers:
+            _trackers[endpoint] = LatencyTracker()
+        return _trackers[endpoint]
+
+
+def circuit_breaker(endpoint):
+    with _registry_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def _hedge_executor():
+    global _executor
+    if _executor is None:
+        with _registry_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(HEDGE_THREADS, thread_name_prefix="graph-hedge")
+    return _executor
+
+
+def _timed(tracker, send):
+    started = time.monotonic()
+    resp = send()
+    tracker.record(time.monotonic() - started)
+    return resp
+
+
+def _discard(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+def _start_primary(tracker, send):
+    # Started on its own thread at once: queueing behind other calls' backups would
+    # count against the hedge delay and fire backups the endpoint didn't earn
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(_timed, tracker, send))
+        except BaseException as ex:
+            future.set_exception(ex)
+
+    threading.Thread(target=run, name="graph-hedge-primary", daemon=True).start()
+    return future
+
+
+def hedged_send(endpoint, send):
+    """
+    Call send() (an idempotent request returning a response) and, if it hasn't
+    answered within the endpoint's hedge delay, call it once more on the shared
+    hedge pool; the first answer wins and the other is discarded when it
+    arrives. Both run with the caller's context (deadline, metrics).
+    """
+    tracker = latency_tracker(endpoint)
+    attempts = [_start_primary(tracker, send)]
+    done, _ = wait(attempts, timeout=tracker.hedge_delay())
+    if not done:
+        _count("hedged")
+        attempts.append(_hedge_executor().submit(contextvars.copy_context().run, _timed, tracker, send))
+    pending = list(attempts)
+    error = None
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            if future.exception() is None:
+                for other in pending:
+                    other.add_done_callback(_discard)
+                if future is not attempts[0]:
+                    _count("hedge_won")
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+def _stale_key(url, params):
+    return url, tuple(sorted((params or {}).items()))
+
+
+def remember_response(url, params, resp):
+    """Keep a successful GET response to answer from while its endpoint's circuit is open."""
+    global _stale_bytes
+    size = len(resp.content)
+    if resp.status_code != 200 or size > STALE_CACHE_MAX_BYTES // 16:
+        return
+    key = _stale_key(url, params)
+    with _stale_lock:
+        previous = _stale.pop(key, None)
+        if previous is not None:
+            _stale_bytes -= len(previous.content)
+        _stale[key] = resp
+        _stale_bytes += size
+        while _stale_bytes > STALE_CACHE_MAX_BYTES:
+            _, dropped = _stale.popitem(last=False)
+            _stale_bytes -= len(dropped.content)
+
+
+def stale_response(url, params):
+    """The last good response to this GET, or None."""
+    with _stale_lock:
+        return _stale.get(_stale_key(url, params))
+
+
+def snapshot():
+    """Hedging and circuit breaker counters and the state of every circuit that isn't closed."""
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    with _stats_lock:
+        counters = dict(stats)
+    return {**counters, "circuits": {b.endpoint: b.state for b in breakers if b.state != "closed"}}
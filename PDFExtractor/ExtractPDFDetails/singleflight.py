@@ -0,0 +1,239 @@
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+# Attach identical concurrent submissions on this worker to the one already running
+SINGLE_FLIGHT = os.getenv("SINGLE_FLIGHT", "true").lower() == "true"
+# Cross-worker coordination: off, file (local stand-in: lease files on a shared disk) or blob
+SINGLE_FLIGHT_LEASE = os.getenv("SINGLE_FLIGHT_LEASE", "off").lower()
+LEASE_DIR = os.getenv("SINGLE_FLIGHT_LEASE_DIR", os.path.join(tempfile.gettempdir(), "pdfextractor-leases"))
+LEASE_CONTAINER = os.getenv("SINGLE_FLIGHT_LEASE_CONTAINER", "pdfextractor-leases")
+LEASE_CONNECTION_STRING = os.getenv("JOURNAL_CONNECTION_STRING") or os.getenv("AzureWebJobsStorage")
+# A lease not renewed for this long is abandoned (blob leases allow 15-60s); holders renew at a third of it
+LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "30"))
+# How often a worker waiting on another worker's lease retries it
+LEASE_POLL_SECONDS = float(os.getenv("SINGLE_FLIGHT_LEASE_POLL_SECONDS", "1"))
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time on this worker. Callers arriving
+    while a call is in flight wait for it and share its result (or exception)
+    instead of running their own.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    def do(self, key, fn, timeout=None):
+        """
+        fn() once for concurrent callers of the same key. Returns (result, shared),
+        shared being True for callers that attached to another's call; raises
+        concurrent.futures.TimeoutError if that call outlasts timeout seconds.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+                self.stats["leaders"] += 1
+            else:
+                self.stats["followers"] += 1
+        if not leader:
+            return future.result(timeout), True
+        try:
+            result = fn()
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self.lock:
+                del self.calls[key]
+
+
+class KeyedLocks:
+    """One lock per key, created on first use and dropped once nobody holds or waits for it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.locks = {}
+
+    @contextlib.contextmanager
+    def hold(self, key, timeout=None):
+        """Hold key's lock for the with block; yields False if it wasn't free within timeout seconds."""
+        with self.lock:
+            entry = self.locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        acquired = entry[0].acquire(timeout=-1 if timeout is None else max(timeout, 0))
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                entry[0].release()
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self.locks[key]
+
+
+class FileLeaseStore:
+    """Leases as exclusively created files (a stand-in for blob leases on one machine or a shared mount)."""
+
+    def __init__(self, directory=LEASE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.lease")
+
+    def acquire(self, key):
+        path = self._path(key)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return path
+        except FileExistsError:
+            pass
+        try:
+            if time.time() - os.path.getmtime(path) <= LEASE_SECONDS:
+                return None
+            # The holder stopped renewing (crashed or was killed); take the lease over
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return self.acquire(key)
+
+    def renew(self, lease):
+        os.utime(lease)
+
+    def release(self, lease):
+        try:
+            os.remove(lease)
+        except FileNotFoundError:
+            pass
+
+
+class BlobLeaseStore:
+    """Azure Storage blob leases, so the workers of every instance see each other's submissions."""
+
+    def __init__(self, connection_string=LEASE_CONNECTION_STRING, container=LEASE_CONTAINER):
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.blob import BlobServiceClient
+
+        self.container = BlobServiceClient.from_connection_string(connection_string).get_container_client(container)
+        try:
+            self.container.create_container()
+        except ResourceExistsError:
+            pass
+
+    def acquire(self, key):
+        from azure.core.exceptions import HttpResponseError, ResourceExistsError
+
+        blob = self.container.get_blob_client(f"{key}.lease")
+        try:
+            blob.upload_blob(b"", overwrite=False)
+        except ResourceExistsError:
+            pass
+        try:
+            return blob.acquire_lease(lease_duration=LEASE_SECONDS)
+        except HttpResponseError as ex:
+            if ex.status_code == 409:  # LeaseAlreadyPresent
+                return None
+            raise
+
+    def renew(self, lease):
+        lease.renew()
+
+    def release(self, lease):
+        lease.release()
+
+
+class Lease:
+    """A held lease, renewed in the background until released."""
+
+    def __init__(self, store, key, handle):
+        self.store = store
+        self.key = key
+        self.handle = handle
+        self.released = threading.Event()
+        self.thread = threading.Thread(target=self._renew, name=f"lease-{key[:12]}", daemon=True)
+        self.thread.start()
+
+    def _renew(self):
+        while not self.released.wait(LEASE_SECONDS / 3):
+            try:
+                self.store.renew(self.handle)
+            except Exception as ex:
+                logging.warning(f"Could not renew the single-flight lease for {self.key}: {ex}")
+
+    def release(self):
+        self.released.set()
+        try:
+            self.store.release(self.handle)
+        except Exception as ex:
+            logging.warning(f"Could not release the single-flight lease for {self.key}: {ex}")
+
+
+_single_flight = SingleFlight()
+_pdf_locks = KeyedLocks()
+_lease_store = None
+_lease_store_lock = threading.Lock()
+
+
+def single_flight():
+    """The worker-wide SingleFlight."""
+    return _single_flight
+
+
+def pdf_locks():
+    """Worker-wide per-PDF locks: runs of one PDF with different parameters take turns."""
+    return _pdf_locks
+
+
+def lease_store():
+    """The configured lease store, or None when SINGLE_FLIGHT_LEASE is off."""
+    global _lease_store
+    if SINGLE_FLIGHT_LEASE not in ("file", "blob"):
+        return None
+    if _lease_store is None:
+        with _lease_store_lock:
+            if _lease_store is None:
+                _lease_store = BlobLeaseStore() if SINGLE_FLIGHT_LEASE == "blob" else FileLeaseStore()
+    return _lease_store
+
+
+def acquire_lease(key, timeout):
+    """
+    Wait up to timeout seconds for the cross-worker lease on key. Returns the
+    Lease, None when leases are off (or the store failed, so work goes ahead
+    uncoordinated), or False when another worker still holds it.
+    """
+    store = lease_store()
+    if store is None:
+        return None
+    give_up = time.monotonic() + timeout
+    waited = False
+    while True:
+        try:
+            handle = store.acquire(key)
+        except Exception as ex:
+            logging.warning(f"Single-flight lease store unavailable, running without it: {ex}")
+            return None
+        if handle is not None:
+            if waited:
+                logging.info(f"Another worker finished {key}; continuing from its journal")
+            return Lease(store, key, handle)
+        if not waited:
+            logging.info(f"Another worker is processing {key}; waiting for its lease")
+            waited = True
+        if time.monotonic() + LEASE_POLL_SECONDS > give_up:
+            return False
+        time.sleep(LEASE_POLL_SECONDS)
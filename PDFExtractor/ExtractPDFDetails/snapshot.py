@@ -0,0 +1,117 @@
+import logging
+import os
+import threading
+import time
+
+# SQLite file holding a WellPlanAON snapshot (local disk, or mounted storage shared by
+# every instance); empty turns snapshots off
+WELLPLANAON_SNAPSHOT_PATH = os.getenv("WELLPLANAON_SNAPSHOT_PATH", "")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    rig_name TEXT,
+    well_name TEXT,
+    start_date TEXT,
+    end_date TEXT,
+    etag TEXT,
+    rig_key TEXT,
+    well_key TEXT
+);
+CREATE INDEX IF NOT EXISTS items_lookup ON items (rig_key, well_key);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def _key(val):
+    # Same normalization as the lookup join keys
+    return "" if val is None else str(val).strip().casefold()
+
+
+class WellPlanSnapshot:
+    """
+    WellPlanAON rows (ID, RigName, WellName, StartDate, EndDate, eTag) plus the
+    Graph delta link they are current as of, in one SQLite file. Rows come back
+    shaped like Graph list items, so they flatten the same way.
+    """
+
+    def __init__(self, path):
+        import sqlite3
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Held for the whole of a sync, so one invocation per instance talks to Graph
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+
+    def delta_link(self):
+        with self.lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'delta_link'").fetchone()
+        return row[0] if row else None
+
+    def items(self):
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT id, rig_name, well_name, start_date, end_date, etag FROM items "
+                "ORDER BY CAST(id AS INTEGER), id"
+            ).fetchall()
+        return [
+            {
+                "id": item_id,
+                "eTag": etag,
+                "fields": {"RigName": rig, "WellName": well, "StartDate": start, "EndDate": end, "@odata.etag": etag},
+            }
+            for item_id, rig, well, start, end, etag in rows
+        ]
+
+    def apply(self, changes, delta_link, full=False):
+        """
+        Apply Graph list item delta results (changed items and deleted
+        markers) and record the delta link they lead to, in one transaction.
+        With full, the changes are the whole list and replace what is stored.
+        """
+        upserts = []
+        deletes = []
+        for item in changes:
+            if "deleted" in item:
+                deletes.append((item["id"],))
+                continue
+            fields = item.get("fields", {})
+            etag = item.get("eTag") or fields.get("@odata.etag")
+            upserts.append((
+                item["id"], fields.get("RigName"), fields.get("WellName"), fields.get("StartDate"),
+                fields.get("EndDate"), etag, _key(fields.get("RigName")), _key(fields.get("WellName")),
+            ))
+        with self.lock, self.db:
+            if full:
+                self.db.execute("DELETE FROM items")
+            self.db.executemany("DELETE FROM items WHERE id = ?", deletes)
+            self.db.executemany("INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?, ?)", upserts)
+            self.db.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("delta_link", delta_link), ("synced_at", str(time.time()))],
+            )
+
+    def reset(self):
+        """Forget the delta link, so the next sync reads the whole list again."""
+        with self.lock, self.db:
+            self.db.execute("DELETE FROM meta WHERE key = 'delta_link'")
+        logging.info(f"WellPlanAON snapshot {self.path} reset")
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def open_snapshot():
+    """The process-wide WellPlanAON snapshot, or None when WELLPLANAON_SNAPSHOT_PATH is unset."""
+    global _snapshot
+    if not WELLPLANAON_SNAPSHOT_PATH:
+        return None
+    if _snapshot is None:
+        with _snapshot_lock:
+            if _snapshot is None:
+                _snapshot = WellPlanSnapshot(WELLPLANAON_SNAPSHOT_PATH)
+    return _snapshot
@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+# otlp (default when OTEL_EXPORTER_OTLP_ENDPOINT is set), console, file or none
+TRACES_EXPORTER = os.getenv(
+    "OTEL_TRACES_EXPORTER", "otlp" if os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") else "none"
+).lower()
+# Span JSON lines are appended here when OTEL_TRACES_EXPORTER=file
+TRACES_FILE = os.getenv("OTEL_TRACES_FILE", "traces.jsonl")
+
+_tracer = None
+_tracer_ready = False
+_tracer_lock = threading.Lock()
+
+
+class _NoopSpan:
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _configure_exporter(trace):
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SimpleSpanProcessor
+
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(resource=Resource.create({"service.name": "PDFExtractor"}))
+        trace.set_tracer_provider(provider)
+    if TRACES_EXPORTER == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    elif TRACES_EXPORTER == "console":
+        provider.add_span_processor(SimpleSpanProcessor(ConsoleSpanExporter()))
+    elif TRACES_EXPORTER == "file":
+        out = open(TRACES_FILE, "a")
+        exporter = ConsoleSpanExporter(out=out, formatter=lambda span: span.to_json(indent=None) + os.linesep)
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+
+def _get_tracer():
+    """
+    OpenTelemetry tracer for the configured exporter, or None when the
+    opentelemetry packages are not installed.
+    """
+    global _tracer, _tracer_ready
+    if _tracer_ready:
+        return _tracer
+    with _tracer_lock:
+        if _tracer_ready:
+            return _tracer
+        try:
+            from opentelemetry import trace
+        except ImportError:
+            _tracer_ready = True
+            return None
+        if TRACES_EXPORTER != "none":
+            try:
+                _configure_exporter(trace)
+            except Exception as ex:
+                logging.warning(f"Trace exporter '{TRACES_EXPORTER}' unavailable: {ex}")
+        _tracer = trace.get_tracer("PDFExtractor")
+        _tracer_ready = True
+        return _tracer
+
+
+@contextmanager
+def span(name, **attributes):
+    """Run the block in a child span of the current span; yields the span."""
+    tracer = _get_tracer()
+    if tracer is None:
+        yield _NOOP_SPAN
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def start_span(name, **attributes):
+    """
+    Start a child span of the current span without making it current.
+    The caller ends it with span.end().
+    """
+    tracer = _get_tracer()
+    if tracer is None:
+        return _NOOP_SPAN
+    return tracer.start_span(name, attributes=attributes)
+
+
+def record_span(name, start_ns, end_ns, **attributes):
+    """Record a finished child span of the current span with the given timing."""
+    tracer = _get_tracer()
+    if tracer is None:
+        return
+    tracer.start_span(name, attributes=attributes, start_time=start_ns).end(end_time=end_ns)
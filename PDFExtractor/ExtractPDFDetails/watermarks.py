@@ -0,0 +1,181 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+# file (local disk), blob (Azure Storage block blobs) or off (every run syncs every record)
+WATERMARK_BACKEND = os.getenv("WATERMARK_BACKEND", "file").lower()
+WATERMARK_DIR = os.getenv("WATERMARK_DIR", os.path.join(tempfile.gettempdir(), "pdfextractor-watermarks"))
+WATERMARK_CONTAINER = os.getenv("WATERMARK_CONTAINER", "pdfextractor-watermarks")
+WATERMARK_CONNECTION_STRING = os.getenv("JOURNAL_CONNECTION_STRING") or os.getenv("AzureWebJobsStorage")
+# Extracted fields that make a record worth syncing again when they change. The
+# report date, BP/EP and actual days move every day and don't affect WellPlanAON.
+WATERMARK_FIELDS = [f.strip() for f in os.getenv("WATERMARK_FIELDS", "Rig,Well,NextLOC,NextMoveDate").split(",")]
+
+
+def fingerprint(record, fields=None):
+    """Short hash of the record's watermark fields."""
+    values = [str(record.get(field, "")).strip().casefold() for field in fields or WATERMARK_FIELDS]
+    return hashlib.sha256(json.dumps(values).encode()).hexdigest()[:16]
+
+
+def _rig_key(rig):
+    # Rig names become file/blob names
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(rig).strip().casefold()) or "_"
+
+
+class FileWatermarkStore:
+    """One JSON document per rig on local disk, replaced atomically."""
+
+    def __init__(self, directory=WATERMARK_DIR):
+        self.directory = directory
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, rig):
+        return os.path.join(self.directory, f"{_rig_key(rig)}.json")
+
+    def read(self, rig):
+        try:
+            with open(self._path(rig)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logging.warning(f"Ignoring unreadable watermarks for rig {rig}")
+            return {}
+
+    def merge(self, rig, marks):
+        with self.lock:
+            merged = {**self.read(rig), **marks}
+            path = self._path(rig)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(merged, f)
+            os.replace(tmp, path)
+
+
+class BlobWatermarkStore:
+    """One JSON blob per rig, merged with an ETag check so concurrent runs on other instances don't lose marks."""
+
+    def __init__(self, connection_string=WATERMARK_CONNECTION_STRING, container=WATERMARK_CONTAINER):
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.blob import BlobServiceClient
+
+        self.container = BlobServiceClient.from_connection_string(connection_string).get_container_client(container)
+        try:
+            self.container.create_container()
+        except ResourceExistsError:
+            pass
+
+    def _read(self, rig):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            download = self.container.get_blob_client(f"{_rig_key(rig)}.json").download_blob()
+            return json.loads(download.readall()), download.properties.etag
+        except ResourceNotFoundError:
+            return {}, None
+
+    def read(self, rig):
+        return self._read(rig)[0]
+
+    def merge(self, rig, marks, attempts=5):
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+        blob = self.container.get_blob_client(f"{_rig_key(rig)}.json")
+        for _ in range(attempts):
+            current, etag = self._read(rig)
+            data = json.dumps({**current, **marks})
+            try:
+                if etag is None:
+                    blob.upload_blob(data, overwrite=False)
+                else:
+                    blob.upload_blob(data, overwrite=True, etag=etag, match_condition=MatchConditions.IfNotModified)
+                return
+            except (ResourceExistsError, ResourceModifiedError):
+                continue  # Another run wrote in between; merge into its version
+        raise RuntimeError(f"Could not update watermarks for rig {rig} after {attempts} attempts")
+
+
+class Watermarks:
+    """
+    Last synced fingerprint of every (Rig, Well), kept per rig. Records whose
+    fingerprint matches were synced unchanged by an earlier run and can skip
+    the push and WellPlanAON stages.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.rigs = {}
+
+    def _marks(self, rig):
+        if rig not in self.rigs:
+            self.rigs[rig] = self.store.read(rig)
+        return self.rigs[rig]
+
+    def changed(self, records):
+        """The records that are new or differ from their last synced version."""
+        changed = []
+        for record in records:
+            mark = self._marks(record.get("Rig", "")).get(str(record.get("Well", "")))
+            if mark is None or mark["fingerprint"] != fingerprint(record):
+                changed.append(record)
+        return changed
+
+    def commit(self, records):
+        """Record these records as synced."""
+        by_rig = {}
+        now = time.time()
+        for record in records:
+            by_rig.setdefault(record.get("Rig", ""), {})[str(record.get("Well", ""))] = {
+                "fingerprint": fingerprint(record),
+                "synced_at": now,
+            }
+        for rig, marks in by_rig.items():
+            self.store.merge(rig, marks)
+            self.rigs.pop(rig, None)
+
+    def invalidate(self, records):
+        """
+        Forget the watermark of every record that no longer matches it (e.g. its
+        DDR item was edited in SharePoint), so the next run syncs it again.
+        Returns how many were forgotten.
+        """
+        by_rig = {}
+        for record in records:
+            rig, well = record.get("Rig", ""), str(record.get("Well", ""))
+            mark = self._marks(rig).get(well)
+            if mark and mark["fingerprint"] != fingerprint(record):
+                by_rig.setdefault(rig, {})[well] = None
+        for rig, marks in by_rig.items():
+            self.store.merge(rig, marks)
+            self.rigs.pop(rig, None)
+        return sum(len(marks) for marks in by_rig.values())
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def watermark_store():
+    """The configured watermark store, or None when WATERMARK_BACKEND is off."""
+    global _store
+    if WATERMARK_BACKEND not in ("file", "blob"):
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BlobWatermarkStore() if WATERMARK_BACKEND == "blob" else FileWatermarkStore()
+    return _store
+
+
+def open_watermarks():
+    """Watermarks backed by the configured store, or None when they are off."""
+    store = watermark_store()
+    return Watermarks(store) if store else None
@@ -0,0 +1,36 @@
+import json
+import logging
+import azure.functions as func
+
+from ..ExtractPDFDetails import notification_catch_up
+from ..ExtractPDFDetails.notifications import parse_notifications
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Graph change-notification endpoint for the DDR and WellPlanAON lists
+    (GRAPH_NOTIFICATION_URL). Echoes the validation token when a subscription
+    is created; otherwise acknowledges the notifications at once and queues the
+    pull of the lists' changes (and the refresh of what this instance caches
+    about them) for the background catch-up. Notifications with the wrong
+    clientState are ignored.
+    """
+    validation_token = req.params.get("validationToken")
+    if validation_token is not None:
+        logging.info("Validating a Graph change-notification subscription.")
+        return func.HttpResponse(validation_token, status_code=200, mimetype="text/plain")
+    try:
+        body = req.get_json()
+    except ValueError:
+        return func.HttpResponse("Expected a JSON body of change notifications", status_code=400)
+    notifications, rejected = parse_notifications(body)
+    if rejected:
+        logging.warning(f"Ignoring {rejected} change notification(s) with a wrong clientState")
+    # Graph drops subscriptions whose endpoint is slow to answer, so the catch-up runs after the 202
+    waiting = notification_catch_up().submit(notifications) if notifications else 0
+    # The body is for whoever calls it by hand
+    return func.HttpResponse(
+        body=json.dumps({"accepted": len(notifications), "lists_waiting": waiting, "rejected": rejected}, indent=4),
+        status_code=202,
+        mimetype="application/json",
+    )
@@ -0,0 +1,14 @@
+import logging
+import azure.functions as func
+
+from ..ExtractPDFDetails import sync_subscriptions
+
+
+def main(timer: func.TimerRequest) -> None:
+    """
+    Every 12 hours, create or renew the change-notification subscriptions of
+    the DDR and WellPlanAON lists before they expire.
+    """
+    if timer.past_due:
+        logging.warning("Subscription renewal is running late.")
+    sync_subscriptions()
@@ -0,0 +1,21 @@
+import json
+import logging
+import azure.functions as func
+
+from ..ExtractPDFDetails import WARMUP_PRELOAD_INDEX, warmup
+
+
+def main(req: func.HttpRequest) -> func.HttpResponse:
+    """
+    Prime a new instance before it takes DDR traffic (call after a deployment or
+    scale-out, or from a health check). ?index=true also preloads the
+    WellPlanAON index. Returns 503 when any part could not be primed.
+    """
+    logging.info("Warm-up requested over HTTP.")
+    preload_index = req.params.get("index", str(WARMUP_PRELOAD_INDEX)).lower() == "true"
+    report = warmup(preload_index=preload_index)
+    return func.HttpResponse(
+        body=json.dumps(report, indent=4),
+        status_code=200 if report["ok"] else 503,
+        mimetype="application/json",
+    )
@@ -0,0 +1,13 @@
+import logging
+import azure.functions as func
+
+from ..ExtractPDFDetails import WARMUP_PRELOAD_INDEX, warmup
+
+
+def main(warmupContext: func.Context) -> None:
+    """
+    Runs on every new instance when the platform warms it up (/admin/warmup on
+    the Premium and Dedicated plans) before it is added to the load balancer.
+    """
+    logging.info("Warm-up trigger fired.")
+    warmup(preload_index=WARMUP_PRELOAD_INDEX)
@@ -0,0 +1,147 @@
+"""
+Admission-control benchmark: a burst of large PDFs on one worker.
+
+Runs --concurrency invocations of main() with distinct --pages-page PDFs in
+parallel threads against the local Graph stub, with admission control off and
+on, each pass in a fresh process. Reports wall time, per-request latency
+percentiles of the requests that were served, peak RSS and how many requests
+were turned away with a 429 (and their Retry-After). With admission control on,
+checks that the CPU slots and memory in use never went over the budget, that
+every request was either served or refused with a 429 carrying a Retry-After,
+and that the controller counted them alike. Exits non-zero on any failed check.
+
+Usage:
+    python test/bench_admission.py --concurrency 8 --pages 60 --cpu-slots 2 --memory-mb 400
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from ddr_generator import generate_ddr_pdf  # noqa: E402
+from graph_stub import default_stub, function_for, post_pdf, quiet  # noqa: E402
+
+
+def invoke(module, pdf_bytes):
+    status, _, headers, seconds = post_pdf(module, pdf_bytes)
+    return status, seconds, headers.get("Retry-After")
+
+
+def watch(controller, peak, stop):
+    # The most CPU slots and memory the controller ever handed out at once
+    while not stop.is_set():
+        state = controller.snapshot()
+        peak["cpu"] = max(peak["cpu"], state["cpu_in_use"])
+        peak["memory_mb"] = max(peak["memory_mb"], state["memory_mb_in_use"])
+        stop.wait(0.005)
+
+
+def admission_problems(args, row, outcomes, peak):
+    problems = []
+    if any(status not in (200, 429) for status, _, _ in outcomes):
+        problems.append(f"statuses {sorted(status for status, _, _ in outcomes)}")
+    if any(status == 429 and not retry for status, _, retry in outcomes):
+        problems.append("429 without Retry-After")
+    controller = row["controller"]
+    if (controller["admitted"], controller["rejected"]) != (row["ok"], row["rejected"]):
+        problems.append(f"controller counted {controller['admitted']} admitted, {controller['rejected']} rejected")
+    if peak["cpu"] > args.cpu_slots or peak["memory_mb"] > args.memory_mb:
+        problems.append(f"budget exceeded: {peak['cpu']} CPU slots, {peak['memory_mb']}MB")
+    return problems
+
+
+def run_pass(args, enabled, pdfs, queue):
+    # Each pass runs in a fresh process, so these settings apply
+    stub = default_stub(latency_ms=args.latency_ms).start()
+    ExtractPDFDetails = function_for(
+        stub,
+        ADMISSION_CONTROL=str(enabled).lower(),
+        ADMISSION_CPU_SLOTS=args.cpu_slots,
+        ADMISSION_MEMORY_MB=args.memory_mb,
+        ADMISSION_QUEUE_SECONDS=args.queue_seconds,
+    )
+    peak = {"cpu": 0, "memory_mb": 0.0}
+    stop = threading.Event()
+    watcher = threading.Thread(target=watch, args=(ExtractPDFDetails.admission_controller(), peak, stop))
+    watcher.start()
+    try:
+        with quiet():
+            started = time.perf_counter()
+            with ThreadPoolExecutor(len(pdfs)) as pool:
+                outcomes = list(pool.map(lambda pdf: invoke(ExtractPDFDetails, pdf), pdfs))
+            elapsed = time.perf_counter() - started
+    finally:
+        stop.set()
+        watcher.join()
+        stub.stop()
+    served = sorted(seconds for status, seconds, _ in outcomes if status != 429)
+    row = {
+        "admission": enabled,
+        "invocations": len(outcomes),
+        "ok": sum(status == 200 for status, _, _ in outcomes),
+        "rejected": sum(status == 429 for status, _, _ in outcomes),
+        "retry_after": sorted({int(retry) for status, _, retry in outcomes if retry}),
+        "seconds": round(elapsed, 2),
+        "p50_s": round(statistics.median(served), 2) if served else None,
+        "max_s": round(served[-1], 2) if served else None,
+        "rss_peak_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "controller": ExtractPDFDetails.admission_controller().snapshot(),
+        "peak": peak,
+    }
+    if enabled:
+        row["problems"] = admission_problems(args, row, outcomes, peak)
+    elif any(status != 200 for status, _, _ in outcomes):
+        row["problems"] = [f"statuses {sorted(status for status, _, _ in outcomes)}"]
+    else:
+        row["problems"] = []
+    queue.put(row)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=60, help="pages per PDF")
+    parser.add_argument("--cpu-slots", type=int, default=2)
+    parser.add_argument("--memory-mb", type=float, default=400)
+    parser.add_argument("--queue-seconds", type=float, default=5)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    pdfs = [generate_ddr_pdf(args.pages, noise=0.1, seed=seed)[0] for seed in range(args.concurrency)]
+    results = []
+    failed = False
+    context = multiprocessing.get_context("spawn")
+    for enabled in (False, True):
+        queue = context.Queue()
+        proc = context.Process(target=run_pass, args=(args, enabled, pdfs, queue))
+        proc.start()
+        row = queue.get()
+        proc.join()
+        results.append(row)
+        print(
+            f"admission={str(enabled):<5} ok={row['ok']}/{row['invocations']} 429={row['rejected']} "
+            f"retry_after={row['retry_after']} {row['seconds']:>6}s p50={row['p50_s']}s max={row['max_s']}s "
+            f"rss_peak={row['rss_peak_mb']}MB in_use_peak={row['peak']['cpu']} slots/{row['peak']['memory_mb']}MB "
+            + ("OK" if not row["problems"] else "FAIL: " + "; ".join(row["problems"]))
+        )
+        failed = failed or bool(row["problems"])
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Burst benchmark: many DDR PDFs arriving at once on one worker.
+
+Runs --concurrency invocations of main() in parallel threads (as the Functions
+host does with PYTHON_THREADPOOL_THREAD_COUNT) against the local Graph stub,
+with the worker-wide write coalescer on and off. Reports wall time, mean
+push+update stage time per invocation, HTTP requests seen by the stub and how
+many were throttled. Checks that both passes served every invocation and
+created one DDR item per well, that coalescing cut the HTTP requests, and that
+each invocation's metrics count the coalesced $batch calls its writes went out in.
+Exits non-zero on any failed check.
+
+Usage:
+    python test/bench_burst.py --concurrency 8 --wells 40 --latency-ms 30
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from ddr_generator import generate_ddr_pdf  # noqa: E402
+from graph_stub import default_stub, function_for, post_pdf, quiet  # noqa: E402
+
+
+def invoke(module, pdf_bytes):
+    status, body, _, _ = post_pdf(module, pdf_bytes)
+    return status, body["metrics"] if status == 200 else {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--wells", type=int, default=40, help="unique wells per PDF")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    generated = [generate_ddr_pdf(args.wells, noise=0.0, seed=seed, unique_wells=True) for seed in range(args.concurrency)]
+    pdfs = [pdf for pdf, _ in generated]
+    wells = Counter(record["Well"] for _, records in generated for record in records)
+    results = []
+    failed = False
+    for coalescing in (False, True):
+        stub = default_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, throttle_rate=args.throttle_rate).start()
+        # Measure the writes: let every invocation queue for extraction rather than get a 429
+        ExtractPDFDetails = function_for(stub, ADMISSION_QUEUE_SECONDS=600)
+        ExtractPDFDetails.WRITE_COALESCING = coalescing
+        try:
+            with quiet():
+                started = time.perf_counter()
+                with ThreadPoolExecutor(args.concurrency) as pool:
+                    outcomes = list(pool.map(lambda pdf: invoke(ExtractPDFDetails, pdf), pdfs))
+                elapsed = time.perf_counter() - started
+        finally:
+            stub.stop()
+        writes = {k: v for k, v in stub.calls.items() if k in ("create_item", "item_fields", "batch")}
+        metrics = [metrics for status, metrics in outcomes if status == 200]
+        stages = [m["stages"] for m in metrics]
+        write_ms = [s.get("push", {}).get("wall_ms", 0) + s.get("update", {}).get("wall_ms", 0) for s in stages]
+        row = {
+            "coalescing": coalescing,
+            "invocations": len(pdfs),
+            "ok": len(stages),
+            "seconds": round(elapsed, 3),
+            "write_ms_mean": round(sum(write_ms) / len(write_ms), 1) if write_ms else None,
+            "requests": stub.http_requests,
+            "throttled": stub.calls["429"] + stub.calls["503"],
+            "writes": writes,
+        }
+        if coalescing:
+            row["coalescer"] = dict(ExtractPDFDetails.write_coalescer().stats)
+        created = Counter(item["fields"]["Well"] for item in stub.list_by_name("DDRRecords")["items"].values())
+        problems = []
+        if row["ok"] != row["invocations"]:
+            problems.append(f"{row['invocations'] - row['ok']} invocations failed")
+        if created != wells:
+            problems.append(f"DDR items differ from the wells ({sum((wells - created).values())} missing, "
+                            f"{sum((created - wells).values())} extra)")
+        # stub.calls counts $batch sub-requests too; the HTTP requests are what coalescing saves
+        if coalescing and row["requests"] >= results[0]["requests"]:
+            problems.append("coalescing didn't cut the HTTP requests")
+        if coalescing and any("batch" not in m["graph"] for m in metrics):
+            problems.append("coalesced $batch calls missing from invocation metrics")
+        row["problems"] = problems
+        results.append(row)
+        print(
+            f"coalescing={str(coalescing):<5} ok={row['ok']}/{row['invocations']} {row['seconds']:>7}s "
+            f"push+update={row['write_ms_mean']:>8}ms/invocation "
+            f"requests={row['requests']:<5} throttled={row['throttled']:<4} {writes} "
+            + ("OK" if not problems else "FAIL: " + "; ".join(problems))
+        )
+        failed = failed or bool(problems)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
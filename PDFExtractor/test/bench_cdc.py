@@ -0,0 +1,138 @@
+"""
+Change-data-capture benchmark: consecutive daily DDRs against the local Graph stub.
+
+Sends --days daily reports of the same --wells wells (each day --change-rate of
+them get a new Next Loc/Next Move) through main() twice: once as full syncs
+(?full=true) and once with the per-rig watermarks skipping wells unchanged since
+the previous day. Reports Graph requests, DDR items created and WellPlanAON
+updates per day, and how many WellPlanAON rows end up different between the two
+passes. Checks that the cdc pass skipped exactly the wells whose Next Loc/Next
+Move was already synced (wells without a WellPlanAON item are never watermarked),
+created DDR items only for the others, and that only WellPlanAON rows shared by
+several wells' Next Loc differ between the passes. Exits non-zero on any failed
+check.
+
+Usage:
+    python test/bench_cdc.py --days 5 --wells 100 --change-rate 0.2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from ddr_generator import generate_ddr_days  # noqa: E402
+from graph_stub import default_stub, function_for, post_pdf, quiet  # noqa: E402
+
+
+def run_main(module, pdf_bytes, params):
+    with quiet():
+        status, body, _, _ = post_pdf(module, pdf_bytes, params)
+    if status != 200:
+        raise RuntimeError(f"main() returned {status}: {str(body)[:300]}")
+    return body
+
+
+def expected_skips(reports, planned):
+    """
+    Wells the watermarks should skip each day: those whose Next Loc/Next Move
+    were synced before. A well is synced when its Next Loc has a WellPlanAON item.
+    """
+    synced = {}
+    skips = []
+    for _, records in reports:
+        skipped = 0
+        for record in records:
+            mark = (record["NextLOC"], record["NextMoveDate"])
+            if synced.get(record["Well"]) == mark:
+                skipped += 1
+            elif (record["Rig"], record["NextLOC"]) in planned:
+                synced[record["Well"]] = mark
+        skips.append(skipped)
+    return skips
+
+
+def run_pass(args, reports, full_sync):
+    stub = default_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+    # Every day is a different PDF, but keep earlier passes' journals out of the way; nothing synced yet
+    ExtractPDFDetails = function_for(stub, watermarks=True)
+    days = []
+    try:
+        for day, (pdf_bytes, _) in enumerate(reports):
+            before = stub.http_requests
+            started = time.perf_counter()
+            result = run_main(ExtractPDFDetails, pdf_bytes, {"full": "true"} if full_sync else {})
+            days.append({
+                "day": day,
+                "requests": stub.http_requests - before,
+                "seconds": round(time.perf_counter() - started, 2),
+                "skipped": result["unchanged_wells_skipped"],
+                "wellplanaon_updates": result["wellplanaon_updates"],
+            })
+    finally:
+        stub.stop()
+    plan = {
+        (item["fields"]["RigName"], item["fields"]["WellName"]): (item["fields"]["StartDate"], item["fields"]["EndDate"])
+        for item in stub.list_by_name("WellPlanAON")["items"].values()
+    }
+    return days, len(stub.list_by_name("DDRRecords")["items"]), plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=5)
+    parser.add_argument("--wells", type=int, default=100)
+    parser.add_argument("--change-rate", type=float, default=0.2)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    reports = generate_ddr_days(args.days, args.wells, args.change_rate)
+    results = {}
+    plans = {}
+    problems = []
+    for mode, full_sync in (("full", True), ("cdc", False)):
+        days, ddr_items, plans[mode] = run_pass(args, reports, full_sync)
+        results[mode] = {"days": days, "ddr_items": ddr_items}
+        for row in days:
+            print(
+                f"{mode:<4} day={row['day']} requests={row['requests']:<5} seconds={row['seconds']:<6} "
+                f"skipped={row['skipped']:<4} wellplanaon_updates={row['wellplanaon_updates']}"
+            )
+        print(f"{mode:<4} total requests={sum(row['requests'] for row in days)} ddr_items={ddr_items}")
+    differing = [key for key in plans["full"] if plans["full"][key] != plans["cdc"].get(key)]
+    results["wellplanaon_rows_differing"] = len(differing)
+    print(f"WellPlanAON rows differing between full and cdc: {len(differing)}")
+
+    skips = expected_skips(reports, set(plans["full"]))
+    cdc_days = results["cdc"]["days"]
+    if [row["skipped"] for row in cdc_days] != skips:
+        problems.append(f"cdc skipped {[row['skipped'] for row in cdc_days]} wells, expected {skips}")
+    if any(row["skipped"] for row in results["full"]["days"]):
+        problems.append("full sync skipped wells")
+    changed = sum(len(records) for _, records in reports) - sum(skips)
+    if results["cdc"]["ddr_items"] != changed:
+        problems.append(f"cdc created {results['cdc']['ddr_items']} DDR items for {changed} changed wells")
+    # Wells sharing a Next Loc overwrite each other's item: a skipped one no longer does
+    shared = set()
+    for _, records in reports:
+        reported = Counter((record["Rig"], record["NextLOC"]) for record in records)
+        shared.update(key for key, count in reported.items() if count > 1)
+    if any(key not in shared for key in differing):
+        problems.append(f"{sum(key not in shared for key in differing)} WellPlanAON rows of unshared Next Locs differ")
+    print("OK" if not problems else "FAIL: " + "; ".join(problems))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
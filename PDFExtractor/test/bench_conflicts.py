@@ -0,0 +1,158 @@
+"""
+Parallel WellPlanAON updates with and without eTag (If-Match) writes.
+
+--workers runs, each for a different DDR, plan updates for --shared WellPlanAON
+items they all report (each with its own Next Move date) plus --unique items of
+their own, against the local Graph stub. After every run has planned and before
+any writes, a planner changes the duration (EndDate) of the shared items in
+SharePoint. Then the runs write their updates:
+  - serialized:         one run at a time, plain PATCHes (the old workaround)
+  - parallel:           all runs at once, plain PATCHes
+  - parallel-if-match:  all runs at once, PATCHes with If-Match; 412s are
+                        re-read, re-planned and retried
+Reports wall time, Graph requests and 412s, and how many planner edits were
+lost (items whose final duration isn't the planner's). Exits non-zero if the
+If-Match mode lost any edit, failed any update or didn't re-read the shared
+items it got 412s for.
+
+Usage:
+    python test/bench_conflicts.py --workers 6 --shared 10 --unique 20
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from graph_stub import default_stub, function_for, quiet  # noqa: E402
+
+MODES = [
+    ("serialized", False, False),
+    ("parallel", True, False),
+    ("parallel-if-match", True, True),
+]
+
+
+def workloads(stub, args):
+    items = sorted(stub.list_by_name("WellPlanAON")["items"].values(), key=lambda item: int(item["id"]))
+    # Every other item, so no two planned items are neighbours on a rig
+    items = items[::2]
+    shared = items[:args.shared]
+    runs = []
+    for worker in range(args.workers):
+        own = items[args.shared + worker * args.unique:args.shared + (worker + 1) * args.unique]
+        move = datetime(2026, 1, 1) + timedelta(days=worker)
+        runs.append([
+            {
+                "Rig": item["fields"]["RigName"],
+                "NextLOC": item["fields"]["WellName"],
+                "NextMoveDate": move.strftime("%d/%m/%Y"),
+            }
+            for item in shared + own
+        ])
+    return runs, [item["id"] for item in shared]
+
+
+def duration(fields):
+    return (datetime.fromisoformat(fields["EndDate"][:10]) - datetime.fromisoformat(fields["StartDate"][:10])).days
+
+
+def planner_edit(stub, shared_ids):
+    # Lengthen each shared item by 10 days, as a planner editing the list would
+    expected = {}
+    lst = stub.list_by_name("WellPlanAON")
+    for item_id in shared_ids:
+        fields = lst["items"][item_id]["fields"]
+        expected[item_id] = duration(fields) + 10
+        end = datetime.fromisoformat(fields["StartDate"][:10]) + timedelta(days=expected[item_id])
+        stub.edit_item("WellPlanAON", item_id, EndDate=end.strftime("%Y-%m-%dT00:00:00Z"))
+    return expected
+
+
+def run_mode(args, parallel, if_match):
+    stub = default_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+    ExtractPDFDetails = function_for(stub)
+    ExtractPDFDetails.WRITE_COALESCING = not args.no_coalescing
+    ExtractPDFDetails.WELLPLANAON_IF_MATCH = if_match
+    runs, shared_ids = workloads(stub, args)
+    expected = {}
+    # Every run plans before the planner's edit, and writes after it
+    planned = threading.Barrier(len(runs), action=lambda: expected.update(planner_edit(stub, shared_ids)))
+
+    def plan(records):
+        rows = ExtractPDFDetails.fetch_wellplanaon_rows(records)
+        return ExtractPDFDetails.reconcile_wellplanaon(records, rows)[0]
+
+    def run(records):
+        updates = plan(records)
+        planned.wait()
+        return ExtractPDFDetails.apply_wellplanaon_updates(updates)
+
+    try:
+        with quiet():
+            ExtractPDFDetails.get_list_id(ExtractPDFDetails.get_site_id(), "WellPlanAON")
+            before = stub.http_requests
+            calls_before = dict(stub.calls)
+            started = time.perf_counter()
+            if parallel:
+                with ThreadPoolExecutor(len(runs)) as pool:
+                    logs = list(pool.map(run, runs))
+            else:
+                all_updates = [plan(records) for records in runs]
+                expected.update(planner_edit(stub, shared_ids))
+                logs = [ExtractPDFDetails.apply_wellplanaon_updates(updates) for updates in all_updates]
+            elapsed = time.perf_counter() - started
+    finally:
+        stub.stop()
+    items = stub.list_by_name("WellPlanAON")["items"]
+    lost = sum(duration(items[item_id]["fields"]) != days for item_id, days in expected.items())
+    return {
+        "seconds": round(elapsed, 3),
+        "requests": stub.http_requests - before,
+        "conflicts": stub.calls["412"] - calls_before.get("412", 0),
+        "re_reads": stub.calls["get_item"] - calls_before.get("get_item", 0),
+        "failed_updates": sum(len(log) for log in logs),
+        "lost_planner_edits": lost,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=6)
+    parser.add_argument("--shared", type=int, default=10, help="WellPlanAON items every run updates")
+    parser.add_argument("--unique", type=int, default=20, help="WellPlanAON items only one run updates")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--no-coalescing", action="store_true", help="write item by item instead of through $batch")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, parallel, if_match in MODES:
+        results[name] = run_mode(args, parallel, if_match)
+        print(f"{name:<18} " + "  ".join(f"{k}={v}" for k, v in results[name].items()))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    problems = []
+    safe = results["parallel-if-match"]
+    if safe["lost_planner_edits"] or safe["failed_updates"]:
+        problems.append(f"if-match lost {safe['lost_planner_edits']} edits and failed {safe['failed_updates']} updates")
+    if safe["re_reads"] < safe["conflicts"] or (args.shared and not safe["conflicts"]):
+        problems.append(f"if-match re-read {safe['re_reads']} items for {safe['conflicts']} conflicts")
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Duplicate-submission benchmark: the same DDR PDF fired several times at once.
+
+Runs --duplicates invocations of main() with an identical PDF in parallel
+threads against the local Graph stub, with single-flight off and on. Reports
+wall time, how many invocations ran the pipeline themselves, HTTP requests seen
+by the stub and how many DDR items were created. Checks that with single-flight
+on every invocation got a 200 and exactly one DDR item exists per well. Exits
+non-zero if not.
+
+With --workers N the duplicates are instead spread over N worker processes
+sharing file leases (SINGLE_FLIGHT_LEASE=file) and a run journal directory, to
+exercise the cross-worker path.
+
+Usage:
+    python test/bench_duplicates.py --duplicates 6 --wells 30 --latency-ms 30
+    python test/bench_duplicates.py --duplicates 6 --workers 3
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from ddr_generator import generate_ddr_pdf  # noqa: E402
+from graph_stub import default_stub, function_for, post_pdf, quiet  # noqa: E402
+
+
+def invoke(module, pdf_bytes):
+    status, _, headers, _ = post_pdf(module, pdf_bytes)
+    return status, headers.get("x-single-flight") == "attached"
+
+
+def run_threads(module, pdf_bytes, duplicates, single_flight):
+    module.SINGLE_FLIGHT = single_flight
+    with quiet():
+        with ThreadPoolExecutor(duplicates) as pool:
+            return list(pool.map(lambda _: invoke(module, pdf_bytes), range(duplicates)))
+
+
+def worker(pdf_path, duplicates):
+    # One worker process of the --workers mode; the parent's environment points it at the stub
+    import ExtractPDFDetails
+
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+    print(json.dumps(run_threads(ExtractPDFDetails, pdf_bytes, duplicates, os.environ["SINGLE_FLIGHT"] == "true")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duplicates", type=int, default=6)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--wells", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        return worker(args.worker, args.duplicates)
+
+    pdf_bytes = generate_ddr_pdf(args.wells, noise=0.0, seed=7, unique_wells=True)[0]
+    results = []
+    failed = False
+    for enabled in (False, True):
+        stub = default_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+        env = dict(stub.env())
+        # A fresh journal and lease directory per pass, shared by its workers
+        env["JOURNAL_DIR"] = tempfile.mkdtemp(prefix="journal-")
+        env["SINGLE_FLIGHT_LEASE_DIR"] = tempfile.mkdtemp(prefix="leases-")
+        # Measure what single-flight saves, not what skipping already-synced wells does
+        env["WATERMARK_BACKEND"] = "off"
+        env["SINGLE_FLIGHT"] = str(enabled).lower()
+        env["SINGLE_FLIGHT_LEASE"] = "file" if enabled and args.workers > 1 else "off"
+        # Let duplicates queue for extraction rather than get a 429
+        env["ADMISSION_QUEUE_SECONDS"] = "600"
+        try:
+            started = time.perf_counter()
+            if args.workers > 1:
+                with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                    f.write(pdf_bytes)
+                per_worker = max(1, args.duplicates // args.workers)
+                procs = [
+                    subprocess.Popen(
+                        [sys.executable, __file__, "--worker", f.name, "--duplicates", str(per_worker)],
+                        env={**os.environ, **env}, stdout=subprocess.PIPE, text=True,
+                    )
+                    for _ in range(args.workers)
+                ]
+                outcomes = [tuple(o) for proc in procs for o in json.loads(proc.communicate()[0].splitlines()[-1])]
+                os.unlink(f.name)
+            else:
+                # Both passes share this process; the journal would answer the second from the first
+                module = function_for(stub, ADMISSION_QUEUE_SECONDS=env["ADMISSION_QUEUE_SECONDS"])
+                outcomes = run_threads(module, pdf_bytes, args.duplicates, enabled)
+            elapsed = time.perf_counter() - started
+        finally:
+            stub.stop()
+        items = stub.list_by_name("DDRRecords")["items"]
+        row = {
+            "single_flight": enabled,
+            "workers": args.workers,
+            "invocations": len(outcomes),
+            "statuses": sorted(status for status, _ in outcomes),
+            "attached": sum(attached for _, attached in outcomes),
+            "seconds": round(elapsed, 3),
+            "requests": stub.http_requests,
+            "ddr_items": len(items),
+            "wells": len({item["fields"]["Well"] for item in items.values()}),
+        }
+        problems = []
+        if enabled:
+            if set(row["statuses"]) != {200}:
+                problems.append(f"statuses {row['statuses']}")
+            if row["ddr_items"] != row["wells"] or row["wells"] != args.wells:
+                problems.append(f"{row['ddr_items']} DDR items for {args.wells} wells")
+        row["problems"] = problems
+        results.append(row)
+        print(
+            f"single_flight={str(enabled):<5} invocations={row['invocations']} attached={row['attached']} "
+            f"{row['seconds']:>7}s requests={row['requests']:<5} "
+            f"ddr_items={row['ddr_items']} (wells {row['wells']}) statuses={row['statuses']}"
+            + ("" if not enabled else " OK" if not problems else " FAIL: " + "; ".join(problems))
+        )
+        failed = failed or bool(problems)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+Extraction benchmark for extract_tables_from_pdf.
+
+Generates synthetic DDR PDFs (see ddr_generator.py) and runs every extraction
+mode on them in a fresh process, reporting pages/sec, per-page latency
+percentiles and peak memory (process peak RSS, which includes MuPDF's native
+allocations). Each mode's output is checked against the current implementation
+("current") and against the generator's expected records, so a faster mode
+cannot silently change results. The extracted records are then reconciled
+against --reconcile-trials randomized WellPlanAON fixtures with both
+reconcile_wellplanaon and reconcile_wellplanaon_reference (some Rig/NextLOC pairs
+repeated with other dates), which must leave the items on the same dates, log
+the same missing entries, and the vectorized one plan each item at most once. Exits non-zero on any mismatch.
+
+Usage:
+    python test/bench_extraction.py --pages 20 100 --noise 0.2
+    python test/bench_extraction.py --mode fast=ExtractPDFDetails.fast:extract_tables_from_pdf
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from ddr_generator import generate_ddr_pdf  # noqa: E402
+
+# Extraction modes to benchmark: name -> "module:function"
+MODES = {
+    "current": "ExtractPDFDetails:extract_tables_from_pdf",
+}
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _run_mode(target, pdf_bytes, queue):
+    """Child process: run one extraction and report timings and memory."""
+    sys.stdout = open(os.devnull, "w")  # extraction prints warnings per page
+    module_name, function_name = target.split(":")
+    extract = getattr(importlib.import_module(module_name), function_name)
+    from ExtractPDFDetails.instrumentation import start_run
+
+    stats = start_run()
+    stats.pages = []
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    started = time.perf_counter()
+    records = extract(io.BytesIO(pdf_bytes))
+    elapsed = time.perf_counter() - started
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "records": records,
+        "elapsed": elapsed,
+        "page_ms": [p["elapsed_ms"] for p in stats.pages],
+        "rss_peak_mb": rss_after / 1024,
+        "rss_growth_mb": (rss_after - rss_before) / 1024,
+    })
+
+
+def wellplanaon_fixture(records, rng):
+    """
+    WellPlanAON rows for the records' (Rig, NextLOC) pairs: some pairs have none,
+    others one or two items (rig name in another case now and then) starting on
+    the Next Move date, on another date or without dates.
+    """
+    from ExtractPDFDetails import wellplanaon_fields
+
+    pairs = sorted({(r.get("Rig", ""), r.get("NextLOC", "")) for r in records})
+    rows = []
+    for rig, next_loc in pairs:
+        if rng.random() < 0.3:
+            continue
+        for _ in range(rng.choice((1, 1, 2))):
+            start = f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z"
+            end = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T00:00:00Z"
+            if rng.random() < 0.1:
+                start = end = None
+            fields = {
+                "RigName": rig.upper() if rng.random() < 0.2 else rig,
+                "WellName": next_loc,
+                "StartDate": start,
+                "EndDate": end,
+            }
+            rows.append(wellplanaon_fields({"id": str(len(rows) + 1), "fields": fields}))
+    return rows
+
+
+def check_reconcile(records, trials, seed):
+    """
+    Count the fixtures on which the vectorized and reference reconciliations
+    disagree: on the items' final dates (the reference writing item by item to a
+    live fixture), on the log, or by planning an item more than once.
+    """
+    from ExtractPDFDetails import _join_key, reconcile_wellplanaon, reconcile_wellplanaon_reference
+
+    def stamp(value):
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    rng = random.Random(seed)
+    mismatches = 0
+    for _ in range(trials):
+        rows = wellplanaon_fixture(records, rng)
+        # Some wells move on the date their item already starts, which needs no update
+        starts = {r["WellName"]: r["StartDate"] for r in rows if r["StartDate"]}
+        trial = []
+        for record in records:
+            start = starts.get(record.get("NextLOC"))
+            if start and rng.random() < 0.2:
+                record = dict(record, NextMoveDate=f"{start[8:10]}/{start[5:7]}/{start[:4]}")
+            trial.append(record)
+        # Some Rig/NextLOC pairs come up again later in the PDF, with another date or the item's own
+        for record in rng.sample(trial, min(len(trial), 5)):
+            start = starts.get(record.get("NextLOC"))
+            if start and rng.random() < 0.5:
+                trial.append(dict(record, NextMoveDate=f"{start[8:10]}/{start[5:7]}/{start[:4]}"))
+            else:
+                trial.append(dict(record, NextMoveDate=f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2027"))
+
+        live = {r["ID"]: dict(r) for r in rows}
+
+        def fetch_entries(rig, next_loc):
+            key = (_join_key(rig), _join_key(next_loc))
+            return [dict(r) for r in live.values() if (_join_key(r["RigName"]), _join_key(r["WellName"])) == key]
+
+        def update_item(item_id, start, end):
+            live[item_id].update(StartDate=stamp(start), EndDate=stamp(end))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            reference_log = reconcile_wellplanaon_reference(trial, fetch_entries=fetch_entries, update_item=update_item)
+            updates, log = reconcile_wellplanaon(trial, [dict(r) for r in rows])
+        planned = {r["ID"]: dict(r) for r in rows}
+        for update in updates:
+            planned[update["ID"]].update(StartDate=stamp(update["StartDate"]), EndDate=stamp(update["EndDate"]))
+        final = {item_id: (r["StartDate"], r["EndDate"]) for item_id, r in live.items()}
+        if (
+            {item_id: (r["StartDate"], r["EndDate"]) for item_id, r in planned.items()} != final
+            or log != reference_log
+            or len({u["ID"] for u in updates}) != len(updates)
+        ):
+            mismatches += 1
+    return mismatches
+
+
+def run_mode(target, pdf_bytes):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_run_mode, args=(target, pdf_bytes, queue))
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--rigs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", action="append", default=[], help="extra mode as name=module:function")
+    parser.add_argument("--reconcile-trials", type=int, default=50)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    modes = dict(MODES)
+    for spec in args.mode:
+        name, target = spec.split("=", 1)
+        modes[name] = target
+
+    results = []
+    failed = False
+    for pages in args.pages:
+        pdf_bytes, expected = generate_ddr_pdf(pages, args.noise, args.rigs, args.seed)
+        baseline = None
+        for name, target in modes.items():
+            run = run_mode(target, pdf_bytes)
+            if baseline is None:
+                baseline = run["records"]
+            matches_current = run["records"] == baseline
+            matches_expected = run["records"] == expected
+            failed = failed or not (matches_current and matches_expected)
+            page_ms = run["page_ms"]
+            row = {
+                "mode": name,
+                "pages": pages,
+                "records": len(run["records"]),
+                "seconds": round(run["elapsed"], 3),
+                "pages_per_sec": round(pages / run["elapsed"], 2),
+                "page_p50_ms": round(_percentile(page_ms, 50), 1),
+                "page_p95_ms": round(_percentile(page_ms, 95), 1),
+                "page_p99_ms": round(_percentile(page_ms, 99), 1),
+                "page_mean_ms": round(statistics.fmean(page_ms), 1) if page_ms else 0.0,
+                "rss_peak_mb": round(run["rss_peak_mb"], 1),
+                "rss_growth_mb": round(run["rss_growth_mb"], 1),
+                "matches_current": matches_current,
+                "matches_expected": matches_expected,
+            }
+            results.append(row)
+            print(
+                f"{name:>10} pages={pages:<5} {row['pages_per_sec']:>8} pages/s  "
+                f"p50={row['page_p50_ms']}ms p95={row['page_p95_ms']}ms p99={row['page_p99_ms']}ms  "
+                f"rss_peak={row['rss_peak_mb']}MB (+{row['rss_growth_mb']}MB)  "
+                f"current={'ok' if matches_current else 'MISMATCH'} expected={'ok' if matches_expected else 'MISMATCH'}"
+            )
+        if args.reconcile_trials:
+            mismatches = check_reconcile(baseline, args.reconcile_trials, args.seed)
+            failed = failed or mismatches > 0
+            print(
+                f"{'reconcile':>10} pages={pages:<5} vectorized vs reference: "
+                f"{args.reconcile_trials - mismatches}/{args.reconcile_trials} fixtures agree"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
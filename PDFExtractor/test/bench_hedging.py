@@ -0,0 +1,173 @@
+"""
+Tail-latency benchmark for hedged Graph GETs and the circuit breaker.
+
+Against the local Graph stub with occasional multi-second stalls, runs
+--lookups WellPlanAON $filter queries (fetch_filtered_wellplanaon_entries)
+with hedging off and on, and reports latency percentiles, how many requests
+were hedged and the extra requests that cost. Checks that hedging cut the p99
+and sent no more extra requests than it hedged.
+
+Then, without stalls, runs the lookups from --concurrency threads at once
+(more than the hedge pool's threads), with hedge delays learnt from these
+lookups alone, and checks that no more than --max-hedged-share of them were
+hedged: a request waiting for a thread must not count as a slow one.
+
+Then makes SharePoint fail every request and repeats the lookups with the
+circuit breaker off and on: reports how many lookups were still answered (from
+the last good responses) and the mean time per lookup, and checks that with the
+breaker every lookup after it opened was answered without a request.
+Exits non-zero if a check fails.
+
+Usage:
+    python test/bench_hedging.py --lookups 300 --stall-rate 0.03 --stall-ms 2000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from graph_stub import default_stub, function_for, quiet  # noqa: E402
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def run_lookups(module, pairs):
+    latencies = []
+    answered = 0
+    for rig, well in pairs:
+        started = time.perf_counter()
+        try:
+            module.fetch_filtered_wellplanaon_entries(rig, well)
+            answered += 1
+        except Exception:
+            pass
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, answered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lookups", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--stall-rate", type=float, default=0.03)
+    parser.add_argument("--stall-ms", type=float, default=2000.0)
+    parser.add_argument("--concurrency", type=int, default=48)
+    parser.add_argument("--max-hedged-share", type=float, default=0.15)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stub = default_stub(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, stall_rate=args.stall_rate, stall_ms=args.stall_ms
+    ).start()
+    ExtractPDFDetails = function_for(stub)
+    from ExtractPDFDetails import resilience
+
+    rows = list(stub.list_by_name("WellPlanAON")["items"].values())
+    pairs = [(row["fields"]["RigName"], row["fields"]["WellName"]) for row in rows]
+    pairs = [pairs[i % len(pairs)] for i in range(args.lookups)]
+    results = {"hedging": [], "concurrent": None, "circuit_breaker": []}
+    problems = []
+    hedge_endpoints = set(ExtractPDFDetails.HEDGE_ENDPOINTS)
+    try:
+        with quiet():
+            ExtractPDFDetails.get_list_id(ExtractPDFDetails.get_site_id(), ExtractPDFDetails.WELLPLANAON_LIST_NAME)
+        for hedging in (False, True):
+            ExtractPDFDetails.HEDGE_ENDPOINTS = hedge_endpoints if hedging else set()
+            resilience.stats.clear()
+            before = stub.http_requests
+            with quiet():
+                latencies, _ = run_lookups(ExtractPDFDetails, pairs)
+            row = {
+                "hedging": hedging,
+                "p50_ms": round(_percentile(latencies, 50), 1),
+                "p95_ms": round(_percentile(latencies, 95), 1),
+                "p99_ms": round(_percentile(latencies, 99), 1),
+                "max_ms": round(max(latencies), 1),
+                "requests": stub.http_requests - before,
+                "hedged": resilience.stats["hedged"],
+                "hedge_won": resilience.stats["hedge_won"],
+            }
+            results["hedging"].append(row)
+            print(
+                f"hedging={str(hedging):<5} p50={row['p50_ms']:>7}ms p95={row['p95_ms']:>7}ms "
+                f"p99={row['p99_ms']:>7}ms max={row['max_ms']:>7}ms requests={row['requests']} "
+                f"hedged={row['hedged']} won={row['hedge_won']}"
+            )
+
+        off, on = results["hedging"]
+        if args.stall_rate and on["p99_ms"] >= off["p99_ms"]:
+            problems.append(f"hedging didn't cut the p99 ({off['p99_ms']}ms -> {on['p99_ms']}ms)")
+        if on["requests"] - off["requests"] > on["hedged"]:
+            problems.append(f"hedging cost {on['requests'] - off['requests']} extra requests for {on['hedged']} hedges")
+
+        # Many lookups at once, none of them slow
+        stub.stall_rate = 0.0
+        resilience.stats.clear()
+        resilience._trackers.clear()
+        before = stub.http_requests
+        batches = [pairs[i::args.concurrency] for i in range(args.concurrency)]
+        with quiet():
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                list(pool.map(lambda batch: run_lookups(ExtractPDFDetails, batch), batches))
+        hedged_share = resilience.stats["hedged"] / len(pairs)
+        results["concurrent"] = {
+            "threads": args.concurrency,
+            "requests": stub.http_requests - before,
+            "hedged": resilience.stats["hedged"],
+        }
+        print(
+            f"concurrent x{args.concurrency} without stalls: requests={results['concurrent']['requests']} "
+            f"hedged={resilience.stats['hedged']} ({hedged_share:.0%})"
+        )
+        if hedged_share > args.max_hedged_share:
+            problems.append(f"{hedged_share:.0%} of the concurrent lookups were hedged")
+
+        # SharePoint goes down: every request fails
+        stub.unavailable_rate = 1.0
+        for breaker in (False, True):
+            ExtractPDFDetails.CIRCUIT_BREAKER = breaker
+            before = stub.http_requests
+            with quiet():
+                latencies, answered = run_lookups(ExtractPDFDetails, pairs)
+            row = {
+                "circuit_breaker": breaker,
+                "answered": answered,
+                "mean_ms": round(statistics.mean(latencies), 2),
+                "requests": stub.http_requests - before,
+                "state": resilience.snapshot()["circuits"],
+            }
+            results["circuit_breaker"].append(row)
+            print(
+                f"outage, circuit_breaker={str(breaker):<5} answered={answered}/{len(pairs)} "
+                f"mean={row['mean_ms']}ms/lookup requests={row['requests']} circuits={row['state']}"
+            )
+    finally:
+        stub.stop()
+    tripped = results["circuit_breaker"][1]
+    if tripped["answered"] < len(pairs) - tripped["requests"]:
+        problems.append(f"with the breaker open only {tripped['answered']}/{len(pairs)} lookups were answered")
+    if tripped["requests"] > resilience.CIRCUIT_FAILURE_THRESHOLD:
+        problems.append(f"the breaker let {tripped['requests']} requests through an outage")
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+WellPlanAON lookup cost as the list grows past SharePoint's 5,000-item threshold.
+
+For each --sizes list size, seeds the local Graph stub's WellPlanAON list (with
+RigName/WellName indexed or not) and runs the per-(Rig, NextLOC) lookup
+(fetch_wellplanaon_rows) for --pairs pairs in --invocations back-to-back
+invocations, under each query mode:
+  - auto on indexed columns: $filter per pair
+  - filter on non-indexed columns: $filter per pair with the Prefer header
+  - auto on non-indexed columns: one list scan, then lookups from the index
+Reports Graph requests, time and failures per invocation, and checks that no
+invocation failed, that every mode found the same WellPlanAON rows, and that the
+scan read the list once (one request per page) and answered later invocations
+from its index without a request. Exits non-zero if a check fails.
+
+Usage:
+    python test/bench_large_list.py --sizes 1000 6000 20000 --pairs 30 --invocations 2
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from graph_stub import GraphStub, function_for, quiet, seed_wellplanaon  # noqa: E402
+
+SCENARIOS = [
+    ("indexed", ("RigName", "WellName"), "auto"),
+    ("prefer", (), "filter"),
+    ("scan", (), "auto"),
+]
+
+
+def run_scenario(args, size, indexed_columns, mode, pairs):
+    stub = GraphStub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, page_size=args.page_size)
+    stub.add_list("DDRRecords")
+    stub.add_list("WellPlanAON", indexed_columns=indexed_columns)
+    stub.add_drive("Reports")
+    seed_wellplanaon(stub, "WellPlanAON", rigs=10, wells_per_rig=size // 10)
+    stub.start()
+    ExtractPDFDetails = function_for(stub)
+    ExtractPDFDetails.WELLPLANAON_QUERY_MODE = mode
+    # No hedged duplicates, so request counts are the lookups' own
+    ExtractPDFDetails.HEDGE_ENDPOINTS = set()
+    records = [{"Rig": rig, "NextLOC": well} for rig, well in pairs]
+    invocations = []
+    found = None
+    try:
+        with quiet():
+            # Token, site and list IDs are resolved before the first invocation
+            ExtractPDFDetails.get_list_id(ExtractPDFDetails.get_site_id(), "WellPlanAON")
+        for _ in range(args.invocations):
+            before = stub.http_requests
+            started = time.perf_counter()
+            error = None
+            try:
+                with quiet():
+                    rows = ExtractPDFDetails.fetch_wellplanaon_rows(records)
+                found = sorted(row["ID"] for row in rows)
+            except Exception as ex:
+                error = str(ex)[:120]
+            invocations.append({
+                "requests": stub.http_requests - before,
+                "seconds": round(time.perf_counter() - started, 3),
+                "error": error,
+            })
+    finally:
+        stub.stop()
+    return invocations, found
+
+
+def scenario_problems(stub_page_size, size, name, invocations):
+    problems = [f"invocation {i + 1} failed: {inv['error']}" for i, inv in enumerate(invocations) if inv["error"]]
+    if name == "scan" and not problems:
+        # Column lookup plus one request per page of the list
+        pages = -(-size // stub_page_size)
+        if invocations[0]["requests"] > pages + 1:
+            problems.append(f"first scan took {invocations[0]['requests']} requests for {pages} pages")
+        if any(inv["requests"] for inv in invocations[1:]):
+            problems.append("later invocations didn't use the scanned index")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 6000, 20000])
+    parser.add_argument("--pairs", type=int, default=30)
+    parser.add_argument("--invocations", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--page-size", type=int, default=200, help="items per page the stub returns")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    results = []
+    failed = False
+    for size in args.sizes:
+        pairs = [(f"AD-{rng.randint(1, 10)}", None) for _ in range(args.pairs)]
+        pairs = [(rig, f"W-{rig[3:]}{rng.randint(0, size // 10 - 1):02d}") for rig, _ in pairs]
+        found = {}
+        for name, indexed_columns, mode in SCENARIOS:
+            invocations, found[name] = run_scenario(args, size, indexed_columns, mode, pairs)
+            results.append({"size": size, "scenario": name, "invocations": invocations})
+            print(
+                f"size={size:<6} {name:<8} "
+                + "  ".join(
+                    f"requests={inv['requests']:<4} {inv['seconds']:6.2f}s" + (f" ERROR {inv['error']}" if inv["error"] else "")
+                    for inv in invocations
+                )
+            )
+            for problem in scenario_problems(args.page_size, size, name, invocations):
+                print(f"size={size} {name}: {problem}")
+                failed = True
+        if len({json.dumps(rows) for rows in found.values()}) != 1:
+            print(f"size={size}: scenarios found different WellPlanAON rows")
+            failed = True
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
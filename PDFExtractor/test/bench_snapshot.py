@@ -0,0 +1,153 @@
+"""
+Warm-start benchmark for the SQLite WellPlanAON snapshot.
+
+Seeds the local Graph stub with a --size item WellPlanAON list. One instance
+syncs a snapshot. Then --changes items are edited and --deletes removed, and a
+new instance (cold module state, as after a scale-out) runs the lookup for
+--pairs (Rig, NextLOC) pairs:
+  - filter:   no snapshot, RigName/WellName indexed: $filter per pair
+  - scan:     no snapshot, columns not indexed: one full list scan
+  - snapshot: opens the snapshot and catches up through list item delta
+Reports Graph requests and time of the first lookup and the snapshot load
+time, and checks that every mode found the same (current) WellPlanAON rows,
+that the snapshot holds every item left after the deletes, and that catching up
+took fewer requests than either mode without a snapshot. Exits non-zero if a
+check fails.
+
+Usage:
+    python test/bench_snapshot.py --size 20000 --pairs 30 --changes 25 --deletes 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from graph_stub import GraphStub, function_for, quiet, seed_wellplanaon  # noqa: E402
+
+
+def make_stub(args, indexed):
+    stub = GraphStub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    stub.add_list("DDRRecords")
+    stub.add_list("WellPlanAON", indexed_columns=("RigName", "WellName") if indexed else ())
+    stub.add_drive("Reports")
+    seed_wellplanaon(stub, "WellPlanAON", rigs=10, wells_per_rig=args.size // 10)
+    return stub.start()
+
+
+def edit_list(stub, args):
+    # Other instances and people keep editing the plan between syncs
+    rng = random.Random(3)
+    lst = stub.list_by_name("WellPlanAON")
+    with stub.lock:
+        ids = sorted(lst["items"], key=int)
+        for item_id in rng.sample(ids, args.changes):
+            stub.edit_item("WellPlanAON", item_id, StartDate="2030-01-01T00:00:00Z")
+        for item_id in rng.sample([i for i in ids if lst["items"][i]["version"] == 1], args.deletes):
+            del lst["items"][item_id]
+            stub.sequence += 1
+            lst["deleted"][item_id] = stub.sequence
+
+
+def cold_instance(stub, snapshot_path):
+    module = function_for(stub)
+    from ExtractPDFDetails import snapshot
+
+    module.WELLPLANAON_QUERY_MODE = "auto"
+    # No hedged duplicates, so request counts are the lookups' own
+    module.HEDGE_ENDPOINTS = set()
+    snapshot.WELLPLANAON_SNAPSHOT_PATH = snapshot_path or ""
+    snapshot._snapshot = None
+    return module
+
+
+def lookup(module, stub, records):
+    before = stub.http_requests
+    started = time.perf_counter()
+    with quiet():
+        rows = module.fetch_wellplanaon_rows(records)
+    elapsed = time.perf_counter() - started
+    found = sorted((row["ID"], row["StartDate"]) for row in rows)
+    return {"requests": stub.http_requests - before, "seconds": round(elapsed, 3)}, found
+
+
+def snapshot_problems(args, results, found):
+    problems = []
+    if len({json.dumps(rows) for rows in found.values()}) != 1:
+        problems.append("modes disagree on the WellPlanAON rows found")
+    items = 10 * (args.size // 10) - args.deletes
+    if results["snapshot"]["snapshot_rows"] != items:
+        problems.append(f"snapshot holds {results['snapshot']['snapshot_rows']} rows, the list {items}")
+    for mode in ("filter", "scan"):
+        if results["snapshot"]["requests"] >= results[mode]["requests"]:
+            problems.append(
+                f"snapshot catch-up took {results['snapshot']['requests']} requests, {mode} {results[mode]['requests']}"
+            )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--pairs", type=int, default=30)
+    parser.add_argument("--changes", type=int, default=25)
+    parser.add_argument("--deletes", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    rigs = [rng.randint(1, 10) for _ in range(args.pairs)]
+    records = [{"Rig": f"AD-{rig}", "NextLOC": f"W-{rig}{rng.randint(0, args.size // 10 - 1):02d}"} for rig in rigs]
+    results = {}
+    found = {}
+    for mode, indexed in (("filter", True), ("scan", False), ("snapshot", False)):
+        stub = make_stub(args, indexed)
+        snapshot_path = None
+        if mode == "snapshot":
+            snapshot_path = os.path.join(tempfile.mkdtemp(prefix="snapshot-"), "wellplanaon.sqlite")
+        try:
+            if snapshot_path:
+                # An earlier instance left a snapshot behind
+                ExtractPDFDetails = cold_instance(stub, snapshot_path)
+                with quiet():
+                    ExtractPDFDetails.load_wellplanaon_index()
+            edit_list(stub, args)
+            ExtractPDFDetails = cold_instance(stub, snapshot_path)
+            with quiet():
+                # Token, site and list IDs are resolved by warm-up before the first lookup
+                ExtractPDFDetails.get_list_id(ExtractPDFDetails.get_site_id(), "WellPlanAON")
+            results[mode], found[mode] = lookup(ExtractPDFDetails, stub, records)
+            if snapshot_path:
+                started = time.perf_counter()
+                rows = ExtractPDFDetails.open_snapshot().items()
+                results[mode]["snapshot_rows"] = len(rows)
+                results[mode]["snapshot_load_ms"] = round((time.perf_counter() - started) * 1000, 1)
+                results[mode]["snapshot_bytes"] = os.path.getsize(snapshot_path)
+        finally:
+            stub.stop()
+        extra = {k: v for k, v in results[mode].items() if k not in ("requests", "seconds")}
+        print(
+            f"{mode:<8} first lookup: requests={results[mode]['requests']:<4} "
+            f"{results[mode]['seconds']:6.3f}s {extra or ''}"
+        )
+    problems = snapshot_problems(args, results, found)
+    for problem in problems:
+        print(problem)
+    print("OK" if not problems else f"{len(problems)} problem(s)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
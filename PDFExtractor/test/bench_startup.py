@@ -0,0 +1,98 @@
+"""
+Cold-start import budget check for ExtractPDFDetails.
+
+Imports the function module in fresh interpreters under `python -X importtime`
+(after azure.functions, which the Functions worker has already loaded) and
+reports the median import time and the slowest modules it pulls in. Fails
+(exit code 1) when the import exceeds the budget or when any module that must
+stay lazy (pandas, numpy, PyMuPDF, requests, python-dotenv, OpenTelemetry) is
+loaded at import time.
+
+Usage:
+    python test/bench_startup.py --budget-ms 30 --runs 5
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported on first use
+LAZY_MODULES = ("pandas", "numpy", "fitz", "pymupdf", "requests", "dotenv", "opentelemetry", "openpyxl")
+
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+CHECK_LAZY = (
+    "import sys, azure.functions; import ExtractPDFDetails; "
+    f"print(','.join(sorted({{m.split('.')[0] for m in sys.modules}} & set({LAZY_MODULES!r}))))"
+)
+
+
+def _env():
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)  # measure with bytecode caches, as deployed
+    env["PYTHONPATH"] = APP_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def import_profile():
+    """(cumulative import ms of ExtractPDFDetails, [(self_us, cumulative_us, module)] it pulled in)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import azure.functions; import ExtractPDFDetails"],
+        cwd=APP_ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            rows.append((int(match[1]), int(match[2]), len(match[3]), match[4]))
+    # Modules imported by ExtractPDFDetails are the nested lines right before it
+    end = next(i for i, row in enumerate(rows) if row[3] == "ExtractPDFDetails")
+    start = end
+    while start > 0 and rows[start - 1][2] > 1:
+        start -= 1
+    children = [(self_us, cumulative, name) for self_us, cumulative, _, name in rows[start:end]]
+    return rows[end][1] / 1000, children
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "30")))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    import_profile()  # warm the bytecode caches
+    timings = []
+    children = []
+    for _ in range(args.runs):
+        total_ms, children = import_profile()
+        timings.append(total_ms)
+    median_ms = statistics.median(timings)
+
+    print(f"ExtractPDFDetails import: median {median_ms:.1f}ms over {args.runs} runs "
+          f"(min {min(timings):.1f}ms, max {max(timings):.1f}ms, budget {args.budget_ms:.0f}ms)")
+    print("Slowest imports (self / cumulative):")
+    for self_us, cumulative, name in sorted(children, key=lambda row: row[0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f}ms {cumulative / 1000:8.1f}ms  {name}")
+
+    loaded = subprocess.run(
+        [sys.executable, "-c", CHECK_LAZY], cwd=APP_ROOT, env=_env(), capture_output=True, text=True, check=True
+    ).stdout.strip()
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL: import time {median_ms:.1f}ms exceeds the {args.budget_ms:.0f}ms budget")
+        failed = True
+    if loaded:
+        print(f"FAIL: modules loaded eagerly at import: {loaded}")
+        failed = True
+    if not failed:
+        print("OK")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+End-to-end sync load benchmark against the local Graph stub.
+
+Starts graph_stub.GraphStub in-process, points the function at it through
+GRAPH_BASE/LOGIN_BASE, and runs main() on synthetic DDR PDFs with increasing
+numbers of unique wells. Reports Graph calls (as seen by the stub and by the
+function's own accounting), wall time and wells/sec for each run, and checks
+that every run succeeded, created exactly one DDR item per well, moved each
+well's WellPlanAON item to its Next Move date and uploaded a NoEntriesFound log
+(in --log-format) listing exactly the wells without one, through an upload
+session exactly when it is larger than --simple-upload-max-bytes. With
+--log-mode daily, every run after the first must append its rows to the NoEntries
+table of the same daily workbook instead. Exits non-zero on any failed check.
+
+Usage:
+    python test/bench_sync.py --wells 10 50 200 --latency-ms 30 --throttle-rate 0.02
+    python test/bench_sync.py --wells 100 --cascade
+    python test/bench_sync.py --wells 50 --log-format csv --simple-upload-max-bytes 2048
+    python test/bench_sync.py --wells 10 50 200 --log-mode daily
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime
+from urllib.parse import unquote
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from ddr_generator import generate_ddr_pdf  # noqa: E402
+from graph_stub import default_stub, function_for, post_pdf, quiet  # noqa: E402
+
+
+def uploaded_file(stub, url):
+    """Name and content of the file at url in the stub's output library."""
+    name = unquote(url.rsplit("/", 1)[1])
+    return name, next(d for d in stub.drives.values() if d["name"] == "Reports")["files"][name]
+
+
+def logged_rows(stub, url):
+    """(Rig, Well) of every row of the NoEntriesFound file at url in the stub's output library."""
+    name, content = uploaded_file(stub, url)
+    if name.endswith(".csv"):
+        rows = list(csv.DictReader(io.StringIO(content.decode("utf-8-sig"))))
+    else:
+        from openpyxl import load_workbook
+
+        sheet = load_workbook(io.BytesIO(content)).worksheets[0]
+        # A daily workbook's rows are those of its table
+        table = sheet.tables.get("NoEntries")
+        values = sheet.iter_rows(values_only=True) if table is None else (
+            tuple(cell.value for cell in row) for row in sheet[table.ref]
+        )
+        header = next(values)
+        rows = [dict(zip(header, row)) for row in values]
+    return Counter((row["Rig"], row["Well"]) for row in rows)
+
+
+def sync_problems(stub, expected, ddr_before, result, logged_before=Counter()):
+    """
+    What the stub's lists and library say went wrong in syncing the expected
+    records. logged_before holds the rows earlier runs put in the same log.
+    """
+    problems = []
+    ddr_items = list(stub.list_by_name("DDRRecords")["items"].values())[ddr_before:]
+    created = Counter(item["fields"]["Well"] for item in ddr_items)
+    missing = [record["Well"] for record in expected if not created[record["Well"]]]
+    duplicated = [well for well, count in created.items() if count > 1]
+    if missing or duplicated or len(created) != len(expected):
+        problems.append(f"DDR items: {len(missing)} wells missing, {len(duplicated)} duplicated")
+    # Wells that share a Next Loc each move its item, so any of their dates may be the last
+    move_dates = {}
+    for record in expected:
+        move_date = datetime.strptime(record["NextMoveDate"], "%d/%m/%Y").strftime("%Y-%m-%d")
+        move_dates.setdefault((record["Rig"], record["NextLOC"]), set()).add(move_date)
+    planned = set()
+    unmoved = []
+    for item in stub.list_by_name("WellPlanAON")["items"].values():
+        fields = item["fields"]
+        planned.add((fields["RigName"], fields["WellName"]))
+        dates = move_dates.get((fields["RigName"], fields["WellName"]))
+        if dates and fields["StartDate"][:10] not in dates:
+            unmoved.append(item["id"])
+    if unmoved:
+        problems.append(f"{len(unmoved)} WellPlanAON items not at their Next Move date")
+    not_planned = Counter(
+        (record["Rig"], record["NextLOC"]) for record in expected if (record["Rig"], record["NextLOC"]) not in planned
+    )
+    logged = logged_rows(stub, result["uploaded_file_url"]) if result["uploaded_file_url"] else logged_before
+    if logged - logged_before != not_planned or logged_before - logged:
+        problems.append(
+            f"NoEntriesFound log has {sum(logged.values())} rows for "
+            f"{sum(logged_before.values())} logged earlier and {sum(not_planned.values())} wells without a plan"
+        )
+    return problems
+
+
+def upload_problems(stub, module, result, daily_url=None):
+    """
+    Whether the run's log took the upload path its size calls for, or was
+    appended to the daily workbook at daily_url (stub.calls counts this run only).
+    """
+    if not result["uploaded_file_url"]:
+        return []
+    if daily_url:
+        if result["uploaded_file_url"] != daily_url or stub.calls["drive_content"] or not stub.calls["workbook_rows"]:
+            return [f"log not appended to the daily workbook ({result['uploaded_file_url']})"]
+        return []
+    _, content = uploaded_file(stub, result["uploaded_file_url"])
+    in_session = len(content) > module.SIMPLE_UPLOAD_MAX_BYTES
+    chunks = -(-len(content) // module.UPLOAD_CHUNK_BYTES)
+    if in_session and (stub.calls["upload_session"] != 1 or stub.calls["upload_chunk"] < chunks):
+        return [
+            f"{len(content)}-byte log: {stub.calls['upload_session']} upload sessions, "
+            f"{stub.calls['upload_chunk']} chunks (expected 1 and {chunks})"
+        ]
+    if not in_session and (stub.calls["upload_session"] or stub.calls["drive_content"] != 1):
+        return [f"{len(content)}-byte log not uploaded with a single PUT"]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--wells", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--unavailable-rate", type=float, default=0.0)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--cascade", action="store_true", help="run with ?cascade=true")
+    parser.add_argument("--log-format", choices=["xlsx", "csv"], default="xlsx", help="NoEntriesFound log format")
+    parser.add_argument("--simple-upload-max-bytes", type=int, help="larger logs go through an upload session")
+    parser.add_argument("--log-mode", choices=["per-run", "daily"], default="per-run", help="NO_ENTRIES_LOG_MODE")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    stub = default_stub(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        throttle_rate=args.throttle_rate,
+        unavailable_rate=args.unavailable_rate,
+        page_size=args.page_size,
+    ).start()
+    ExtractPDFDetails = function_for(stub)
+    ExtractPDFDetails.NO_ENTRIES_LOG_FORMAT = args.log_format
+    ExtractPDFDetails.NO_ENTRIES_LOG_MODE = args.log_mode
+    if args.simple_upload_max_bytes is not None:
+        ExtractPDFDetails.SIMPLE_UPLOAD_MAX_BYTES = args.simple_upload_max_bytes
+
+    params = {"cascade": "true"} if args.cascade else {}
+    results = []
+    failed = False
+    # The daily workbook and what earlier runs logged into it
+    daily_url = None
+    logged = Counter()
+    try:
+        for wells in args.wells:
+            pdf_bytes, expected = generate_ddr_pdf(wells, noise=0.0, seed=wells, unique_wells=True)
+            stub.calls.clear()
+            ddr_before = len(stub.list_by_name("DDRRecords")["items"])
+            with quiet():
+                status, result, _, elapsed = post_pdf(ExtractPDFDetails, pdf_bytes, params)
+            if status != 200:
+                print(f"wells={len(expected):<5} FAIL after {elapsed:.3f}s ({status}): {str(result)[:300]}")
+                print("    " + ", ".join(f"{k}={v}" for k, v in sorted(stub.calls.items())))
+                results.append({"wells": len(expected), "seconds": round(elapsed, 3), "status": status})
+                failed = True
+                continue
+            problems = sync_problems(stub, expected, ddr_before, result, logged)
+            problems += upload_problems(stub, ExtractPDFDetails, result, daily_url)
+            if args.log_mode == "daily" and result["uploaded_file_url"]:
+                daily_url = result["uploaded_file_url"]
+                logged = logged_rows(stub, daily_url)
+            extract_ms = result["metrics"]["stages"].get("extract", {}).get("wall_ms", 0.0)
+            sync_seconds = elapsed - extract_ms / 1000
+            row = {
+                "wells": len(expected),
+                "seconds": round(elapsed, 3),
+                "sync_seconds": round(sync_seconds, 3),
+                "wells_per_sec": round(len(expected) / sync_seconds, 2) if sync_seconds > 0 else None,
+                "stub_calls": sum(n for name, n in stub.calls.items() if name not in ("429", "503")),
+                "throttled": stub.calls["429"] + stub.calls["503"],
+                "function_graph_calls": result["metrics"]["graph_calls"],
+                "wellplanaon_updates": result.get("wellplanaon_updates"),
+                "calls_by_endpoint": dict(stub.calls),
+                "stages": result["metrics"]["stages"],
+                "problems": problems,
+            }
+            results.append(row)
+            print(
+                f"wells={row['wells']:<5} total={row['seconds']:>7}s sync={row['sync_seconds']:>7}s "
+                f"{row['wells_per_sec']:>8} wells/s  calls={row['stub_calls']:<6} "
+                f"throttled={row['throttled']:<4} updates={row['wellplanaon_updates']} "
+                + ("OK" if not problems else "FAIL: " + "; ".join(problems))
+            )
+            print("    " + ", ".join(f"{k}={v}" for k, v in sorted(stub.calls.items())))
+            failed = failed or bool(problems)
+    finally:
+        stub.stop()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Checks that recorded cassettes don't leak credentials.
+
+Records, against the local Graph stub, a file upload through an upload session
+(pre-authenticated uploadUrl and chunk PUTs, a driveItem with its
+@microsoft.graph.downloadUrl) and a change-notification subscription (the
+function's notificationUrl with its ?code= key, and the clientState). Then
+checks the cassette for the bearer token, the tempauth credentials, the
+function key and the client state, and replays the upload offline to check
+that the redacted cassette still serves it. Exits non-zero on any failed check.
+
+Usage:
+    python test/check_cassette_redaction.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from graph_stub import default_stub, function_for, quiet  # noqa: E402
+
+FUNCTION_KEY = "function-key-that-must-not-leak"
+CLIENT_STATE = "client-state-that-must-not-leak"
+
+
+def use_cassette(module, path, mode):
+    from ExtractPDFDetails import cassette
+
+    cassette.CASSETTE_MODE = mode
+    cassette.CASSETTE_PATH = path
+    cassette._cassette = None
+    module.SIMPLE_UPLOAD_MAX_BYTES = 1024
+    module.UPLOAD_CHUNK_BYTES = 4096
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10000, help="bytes uploaded through the session")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(prefix="cassette-"), "upload.jsonl")
+    data = os.urandom(args.size)
+    stub = default_stub().start()
+    ExtractPDFDetails = function_for(stub)
+    use_cassette(ExtractPDFDetails, path, "record")
+    ExtractPDFDetails.NOTIFICATION_URL = f"https://example.invalid/api/ListNotifications?code={FUNCTION_KEY}"
+    ExtractPDFDetails.NOTIFICATION_CLIENT_STATE = CLIENT_STATE
+    try:
+        with quiet():
+            recorded_url = ExtractPDFDetails.upload_to_output_library("upload.bin", data, "application/octet-stream")
+            ExtractPDFDetails.sync_subscriptions()
+    finally:
+        stub.stop()
+        use_cassette(ExtractPDFDetails, path, "off")
+
+    with open(path) as f:
+        recording = f.read()
+    checks = []
+
+    def check(name, ok, detail=""):
+        checks.append(ok)
+        print(f"{'OK  ' if ok else 'FAIL'} {name} {detail}")
+
+    check("upload went through a session", stub.calls["upload_session"] == 1 and stub.calls["upload_chunk"] > 1,
+          f"({stub.calls['upload_chunk']} chunks)")
+    check("subscriptions recorded", stub.calls["create_subscription"] > 0)
+    for name, secret in (
+        ("bearer token", "stub-token"),
+        ("tempauth credentials", "tempauth"),
+        ("function key", FUNCTION_KEY),
+        ("client state", CLIENT_STATE),
+    ):
+        check(f"no {name} in the cassette", secret not in recording, f"({recording.count(secret)} found)")
+
+    # Offline: the stub is gone, so every response has to come from the cassette
+    ExtractPDFDetails = function_for(stub)
+    use_cassette(ExtractPDFDetails, path, "replay")
+    try:
+        with quiet():
+            replayed_url = ExtractPDFDetails.upload_to_output_library("upload.bin", data, "application/octet-stream")
+        error = None
+    except Exception as ex:
+        replayed_url, error = None, str(ex)[:200]
+    finally:
+        use_cassette(ExtractPDFDetails, path, "off")
+    check("upload replays from the redacted cassette", replayed_url == recorded_url, error or "")
+    sys.exit(0 if all(checks) else 1)
+
+
+if __name__ == "__main__":
+    main()
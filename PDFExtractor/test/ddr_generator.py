@@ -0,0 +1,182 @@
+"""
+Synthetic DDR (daily drilling report) PDF generator.
+
+Produces pages laid out like the DDR tables extract_tables_from_pdf reads: a
+37+ column grid whose merged header carries "RIG: ... WELL: ... DATE: ...",
+"Well Description" in the first column, Act./BP/EP1 Days in column 27 and
+Next Loc/Next Move in column 36. Noise pages (free text and unrelated tables)
+are mixed in. Alongside the PDF bytes the generator returns the records the
+extractor is expected to produce. generate_ddr_days builds a run of daily
+reports for the same wells, most of them unchanged from one day to the next.
+
+Usage:
+    python test/ddr_generator.py out.pdf --pages 200 --noise 0.2 --seed 7
+"""
+import argparse
+import random
+from datetime import date, timedelta
+
+import fitz  # PyMuPDF
+
+PAGE_WIDTH = 1800
+PAGE_HEIGHT = 600
+N_COLUMNS = 38
+N_ROWS = 8
+ROW_HEIGHT = 40
+FIRST_COLUMN_WIDTH = 200
+MARGIN = 20
+
+ACTIVITIES = ["Drilling", "Tripping", "Casing", "Cementing", "Logging", "Completion", "Rig Move"]
+
+
+def _grid():
+    inner = (PAGE_WIDTH - 2 * MARGIN - FIRST_COLUMN_WIDTH) / (N_COLUMNS - 1)
+    xs = [MARGIN, MARGIN + FIRST_COLUMN_WIDTH]
+    xs += [MARGIN + FIRST_COLUMN_WIDTH + i * inner for i in range(1, N_COLUMNS)]
+    ys = [MARGIN * 2 + i * ROW_HEIGHT for i in range(N_ROWS + 1)]
+    return xs, ys
+
+
+def _draw_table(page, xs, ys, merged_header=True):
+    for y in ys:
+        page.draw_line((xs[0], y), (xs[-1], y))
+    for i, x in enumerate(xs):
+        inner = 0 < i < len(xs) - 1
+        top = ys[1] if merged_header and inner else ys[0]
+        page.draw_line((x, top), (x, ys[-1]))
+
+
+def _cell(page, xs, ys, row, col, text, fontsize=5):
+    rect = fitz.Rect(xs[col] + 1, ys[row] + 1, xs[col + 1] - 1, ys[row + 1] - 1)
+    page.insert_textbox(rect, text, fontsize=fontsize)
+
+
+def _ddr_page(doc, rng, rig, well, report_date, next_loc, next_move):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    xs, ys = _grid()
+    _draw_table(page, xs, ys)
+    header = f"RIG: {rig} WELL: {well} DATE: {report_date:%b %d, %Y}"
+    page.insert_textbox(fitz.Rect(xs[0] + 2, ys[0] + 2, xs[-1] - 2, ys[1] - 2), header, fontsize=9)
+    _cell(page, xs, ys, 1, 0, "Well Description", 8)
+    for row in range(2, N_ROWS):
+        _cell(page, xs, ys, row, 0, rng.choice(ACTIVITIES), 8)
+    # Filler readings in the other columns
+    for row in range(1, N_ROWS):
+        for col in range(1, N_COLUMNS):
+            if col not in (27, 36) and rng.random() < 0.6:
+                _cell(page, xs, ys, row, col, f"{rng.uniform(0, 999):.1f}")
+    actuals, bp, ep1 = rng.randint(1, 60), rng.randint(1, 60), rng.randint(1, 60)
+    _cell(page, xs, ys, 1, 27, f"Act. Days: {actuals}")
+    _cell(page, xs, ys, 2, 27, f"BP Days: {bp}")
+    _cell(page, xs, ys, 3, 27, f"EP1 Days: {ep1}")
+    _cell(page, xs, ys, 1, 36, f"Next Loc: {next_loc}")
+    _cell(page, xs, ys, 2, 36, f"Next Move: {next_move:%b %d, %Y}")
+    return {
+        "Date": f"{report_date:%d/%m/%Y}",
+        "Rig": rig,
+        "Well": well,
+        "BP": str(bp),
+        "EP1": str(ep1),
+        "Actuals": str(actuals),
+        "NextLOC": next_loc,
+        "NextMoveDate": f"{next_move:%d/%m/%Y}",
+    }
+
+
+def _noise_page(doc, rng):
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    if rng.random() < 0.5:
+        words = " ".join(rng.choice(ACTIVITIES).lower() for _ in range(400))
+        page.insert_textbox(fitz.Rect(MARGIN, MARGIN, PAGE_WIDTH - MARGIN, PAGE_HEIGHT - MARGIN), words, fontsize=9)
+    else:
+        # A table that is not a DDR table (first cell is not "Well Description")
+        xs, ys = _grid()
+        _draw_table(page, xs, ys, merged_header=False)
+        _cell(page, xs, ys, 0, 0, "Mud Properties", 8)
+        for row in range(1, N_ROWS):
+            for col in range(N_COLUMNS):
+                if rng.random() < 0.5:
+                    _cell(page, xs, ys, row, col, f"{rng.uniform(0, 99):.2f}")
+
+
+def generate_ddr_pdf(pages=50, noise=0.2, rigs=10, seed=0, unique_wells=False):
+    """
+    Build a synthetic DDR PDF with the given number of pages, a noise page
+    ratio and rig count. With unique_wells every DDR page reports a different
+    well. Returns (pdf_bytes, expected_records) where the records are what
+    extract_tables_from_pdf should return.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    expected = []
+    start = date(2025, 8, 1)
+    for page_num in range(pages):
+        if rng.random() < noise:
+            _noise_page(doc, rng)
+            continue
+        rig_num = rng.randint(1, rigs)
+        report_date = start + timedelta(days=rng.randint(0, 30))
+        record = _ddr_page(
+            doc,
+            rng,
+            rig=f"AD-{rig_num}",
+            well=f"X-{page_num}" if unique_wells else f"W-{rig_num}{rng.randint(0, 99):02d}",
+            report_date=report_date,
+            next_loc=f"W-{rig_num}{rng.randint(0, 59):02d}",
+            next_move=report_date + timedelta(days=rng.randint(1, 45)),
+        )
+        record = {"ID": len(expected), **record}
+        expected.append(record)
+    pdf_bytes = doc.tobytes()
+    doc.close()
+    return pdf_bytes, expected
+
+
+def generate_ddr_days(days=5, wells=50, change_rate=0.2, rigs=10, seed=0):
+    """
+    Build consecutive daily DDR PDFs for the same wells. Each day every well
+    is reported again with a new date and new day counts; change_rate of them
+    also get a new Next Loc/Next Move. Returns [(pdf_bytes, expected_records)]
+    per day.
+    """
+    rng = random.Random(seed)
+    start = date(2025, 8, 1)
+    wells_state = []
+    for index in range(wells):
+        rig_num = rng.randint(1, rigs)
+        wells_state.append({
+            "rig": f"AD-{rig_num}",
+            "well": f"X-{index}",
+            "next_loc": f"W-{rig_num}{rng.randint(0, 59):02d}",
+            "next_move": start + timedelta(days=rng.randint(1, 45)),
+        })
+    reports = []
+    for day in range(days):
+        report_date = start + timedelta(days=day)
+        if day:
+            for well in wells_state:
+                if rng.random() < change_rate:
+                    well["next_loc"] = f"W-{well['rig'][3:]}{rng.randint(0, 59):02d}"
+                    well["next_move"] = report_date + timedelta(days=rng.randint(1, 45))
+        doc = fitz.open()
+        expected = []
+        for well in wells_state:
+            record = _ddr_page(doc, rng, well["rig"], well["well"], report_date, well["next_loc"], well["next_move"])
+            expected.append({"ID": len(expected), **record})
+        reports.append((doc.tobytes(), expected))
+        doc.close()
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output")
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--noise", type=float, default=0.2)
+    parser.add_argument("--rigs", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    pdf_bytes, expected = generate_ddr_pdf(args.pages, args.noise, args.rigs, args.seed)
+    with open(args.output, "wb") as f:
+        f.write(pdf_bytes)
+    print(f"Wrote {args.output}: {args.pages} pages, {len(expected)} DDR records")
@@ -0,0 +1,649 @@
+"""
+Local Microsoft Graph / SharePoint stub for offline load tests.
+
+Implements the endpoints the function uses against an in-memory site:
+token, sites-by-path, lists, list items (with $filter on fields/X eq '...',
+$expand=fields, $top and @odata.nextLink paging), item fields PATCH, single
+items, list item delta, subscriptions, drives, drive content PUT, resumable
+upload sessions, workbook sessions with table rows/add, and JSON $batch.
+Latency, stalls, 429/503 injection and page size are configurable, and
+requests to a route can be held at a gate until a test lets them through.
+
+Point the function at it with GRAPH_BASE (and LOGIN_BASE for the token):
+    python test/graph_stub.py --port 8765 --latency-ms 40 --throttle-rate 0.02
+    GRAPH_BASE=http://127.0.0.1:8765/v1.0 LOGIN_BASE=http://127.0.0.1:8765 func start
+
+Benchmarks that run the function in-process use function_for(stub) to get
+ExtractPDFDetails as a fresh instance pointed at the stub, and post_pdf() to
+call main().
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+SITE_HOST = "contoso.sharepoint.com"
+SITE_PATH = "/sites/DDR"
+
+
+class StubResponse:
+    def __init__(self, status, body=None, headers=None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+
+class GraphStub:
+    """
+    In-memory SharePoint site served over HTTP. Lists hold items as dicts of
+    fields; every change bumps a sequence number used for eTags and delta.
+    """
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, throttle_rate=0.0, unavailable_rate=0.0,
+                 retry_after=0, page_size=200, seed=0, stall_rate=0.0, stall_ms=3000.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.throttle_rate = throttle_rate
+        self.unavailable_rate = unavailable_rate
+        self.retry_after = retry_after
+        self.page_size = page_size
+        self.rng = random.Random(seed)
+        self.site_id = f"{SITE_HOST},{uuid.UUID(int=1)},{uuid.UUID(int=2)}"
+        self.lists = {}
+        self.drives = {}
+        self.upload_sessions = {}
+        self.workbook_sessions = set()
+        self.subscriptions = {}
+        self.calls = Counter()
+        # Route name -> threading.Event requests to that route wait for before they are counted and served
+        self.gates = {}
+        # HTTP requests received, not counting $batch sub-requests
+        self.http_requests = 0
+        self.lock = threading.RLock()
+        self.sequence = 0
+        self.server = None
+        self.base_url = None
+
+    # --- seeding -----------------------------------------------------------
+
+    def add_list(self, name, indexed_columns=()):
+        with self.lock:
+            list_id = str(uuid.uuid5(uuid.NAMESPACE_URL, name))
+            self.lists[list_id] = {
+                "id": list_id,
+                "name": name,
+                "items": {},
+                "next_id": 1,
+                "indexed": set(indexed_columns),
+                "deleted": {},
+            }
+            return list_id
+
+    def add_drive(self, name):
+        with self.lock:
+            drive_id = "b!" + uuid.uuid5(uuid.NAMESPACE_URL, name).hex
+            self.drives[drive_id] = {"id": drive_id, "name": name, "files": {}}
+            return drive_id
+
+    def list_by_name(self, name):
+        return next(l for l in self.lists.values() if l["name"] == name)
+
+    def add_items(self, list_name, rows):
+        with self.lock:
+            lst = self.list_by_name(list_name)
+            return [self._create_item(lst, dict(row)) for row in rows]
+
+    def edit_item(self, list_name, item_id, **fields):
+        """Change an item as an edit in SharePoint would (new eTag, shows up in delta)."""
+        with self.lock:
+            item = self.list_by_name(list_name)["items"][item_id]
+            item["fields"].update(fields)
+            item["version"] += 1
+            self.sequence += 1
+            item["sequence"] = self.sequence
+
+    def _create_item(self, lst, fields):
+        item_id = str(lst["next_id"])
+        lst["next_id"] += 1
+        self.sequence += 1
+        fields["id"] = item_id
+        lst["items"][item_id] = {"id": item_id, "fields": fields, "version": 1, "sequence": self.sequence}
+        return item_id
+
+    # --- serving -----------------------------------------------------------
+
+    def start(self, host="127.0.0.1", port=0):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self):
+                with stub.lock:
+                    stub.http_requests += 1
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                resp = stub.handle(self.command, self.path, dict(self.headers), raw)
+                body = resp.body
+                if isinstance(body, (dict, list)):
+                    payload = json.dumps(body).encode()
+                    content_type = "application/json"
+                else:
+                    payload = body or b""
+                    content_type = resp.headers.get("Content-Type", "text/plain")
+                self.send_response(resp.status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for key, value in resp.headers.items():
+                    if key != "Content-Type":
+                        self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = _handle
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.base_url = f"http://{host}:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def env(self, list_name="DDRRecords", wellplanaon_list_name="WellPlanAON", output_library="Reports"):
+        """Environment variables pointing the function at this stub."""
+        return {
+            "GRAPH_BASE": f"{self.base_url}/v1.0",
+            "LOGIN_BASE": self.base_url,
+            "TENANT_ID": "stub-tenant",
+            "CLIENT_ID": "stub-client",
+            "CLIENT_SECRET": "stub-secret",
+            "SHAREPOINT_SITE_URL": f"https://{SITE_HOST}{SITE_PATH}",
+            "SHAREPOINT_LIST_NAME": list_name,
+            "SHAREPOINT_WELLPLANAON_LIST_NAME": wellplanaon_list_name,
+            "SHAREPOINT_OUTPUT_LIBRARY": output_library,
+        }
+
+    def handle(self, method, path, headers, raw, inject=True, delay=True):
+        """
+        Dispatch one request; also used for $batch sub-requests, which share
+        the latency of their batch.
+        """
+        if delay and (self.latency_ms or self.jitter_ms):
+            time.sleep(max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        if delay and self.stall_rate and self.rng.random() < self.stall_rate:
+            # An occasional multi-second stall, as SharePoint shows on single GETs
+            with self.lock:
+                self.calls["stall"] += 1
+            time.sleep(self.stall_ms / 1000)
+        split = urlsplit(path)
+        route_path = split.path
+        query = {k: v[0] for k, v in parse_qs(split.query).items()}
+        if inject and not route_path.endswith("/token"):
+            roll = self.rng.random()
+            if roll < self.throttle_rate:
+                self.calls["429"] += 1
+                return StubResponse(429, {"error": {"code": "TooManyRequests"}}, {"Retry-After": str(self.retry_after)})
+            if roll < self.throttle_rate + self.unavailable_rate:
+                self.calls["503"] += 1
+                return StubResponse(503, {"error": {"code": "serviceNotAvailable"}}, {"Retry-After": str(self.retry_after)})
+        body = None
+        content_type = headers.get("Content-Type") or headers.get("content-type") or ""
+        if raw:
+            body = raw
+            if "json" in content_type:
+                try:
+                    body = json.loads(raw)
+                except ValueError:
+                    pass
+        for pattern, verb, name, handler in self.ROUTES:
+            match = re.fullmatch(pattern, route_path)
+            if match and verb == method:
+                gate = self.gates.get(name)
+                if gate is not None:
+                    gate.wait()
+                with self.lock:
+                    self.calls[name] += 1
+                try:
+                    return handler(self, match, query, headers, body)
+                except KeyError as ex:
+                    return StubResponse(404, {"error": {"code": "itemNotFound", "message": str(ex)}})
+        self.calls["unmatched"] += 1
+        return StubResponse(404, {"error": {"code": "invalidRequest", "message": f"{method} {route_path}"}})
+
+    # --- handlers ----------------------------------------------------------
+
+    def _token(self, match, query, headers, body):
+        return StubResponse(200, {"token_type": "Bearer", "expires_in": 3599, "access_token": "stub-token"})
+
+    def _site(self, match, query, headers, body):
+        return StubResponse(200, {"id": self.site_id, "webUrl": f"https://{SITE_HOST}{SITE_PATH}"})
+
+    def _lists(self, match, query, headers, body):
+        return StubResponse(200, {"value": [{"id": l["id"], "name": l["name"]} for l in self.lists.values()]})
+
+    def _columns(self, match, query, headers, body):
+        lst = self.lists[match["list"]]
+        names = set()
+        for item in lst["items"].values():
+            names.update(item["fields"])
+        return StubResponse(200, {"value": [
+            {"name": name, "indexed": name in lst["indexed"]} for name in sorted(names)
+        ]})
+
+    def _item_json(self, item, expand=True, select=None):
+        fields = dict(item["fields"])
+        if select:
+            fields = {k: v for k, v in fields.items() if k in select or k == "id"}
+        etag = f'"{uuid.UUID(int=int(item["id"]))},{item["version"]}"'
+        fields["@odata.etag"] = etag
+        data = {"id": item["id"], "eTag": etag}
+        if expand:
+            data["fields"] = fields
+        return data
+
+    def _filter(self, lst, expression):
+        clauses = re.findall(r"fields/(\w+) eq '((?:[^']|'')*)'", expression or "")
+        if expression and not clauses:
+            raise ValueError(f"Unsupported $filter: {expression}")
+        unindexed = [name for name, _ in clauses if name not in lst["indexed"]]
+        matches = []
+        for item in lst["items"].values():
+            fields = item["fields"]
+            if all(str(fields.get(name, "")).casefold() == value.replace("''", "'").casefold()
+                   for name, value in clauses):
+                matches.append(item)
+        return matches, unindexed
+
+    def _page(self, items, query, url_path, serialize):
+        top = min(int(query.get("$top", self.page_size)), self.page_size)
+        skip = int(query.get("$skiptoken", 0))
+        page = items[skip:skip + top]
+        data = {"value": [serialize(item) for item in page]}
+        if skip + top < len(items):
+            next_query = dict(query)
+            next_query["$skiptoken"] = str(skip + top)
+            encoded = "&".join(f"{k}={quote(str(v))}" for k, v in next_query.items())
+            data["@odata.nextLink"] = f"{self.base_url}{url_path}?{encoded}"
+        return data
+
+    def _select(self, query):
+        expand = query.get("$expand", "")
+        match = re.search(r"fields\(\$select=([^)]*)\)", expand)
+        return set(match.group(1).split(",")) if match else None
+
+    def _list_items(self, match, query, headers, body):
+        lst = self.lists[match["list"]]
+        try:
+            items, unindexed = self._filter(lst, query.get("$filter"))
+        except ValueError as ex:
+            return StubResponse(400, {"error": {"code": "invalidRequest", "message": str(ex)}})
+        prefer = headers.get("Prefer", "") or headers.get("prefer", "")
+        if unindexed and len(lst["items"]) > 5000 and "HonorNonIndexedQueriesWarningMayFailRandomly" not in prefer:
+            return StubResponse(400, {"error": {"code": "invalidRequest",
+                                                "message": f"Field(s) {unindexed} cannot be referenced in filter"}})
+        select = self._select(query)
+        expand = "fields" in query.get("$expand", "")
+        return StubResponse(200, self._page(items, query, match.group(0),
+                                            lambda item: self._item_json(item, expand, select)))
+
+    def _create(self, match, query, headers, body):
+        lst = self.lists[match["list"]]
+        with self.lock:
+            item_id = self._create_item(lst, dict(body.get("fields", {})))
+            return StubResponse(201, self._item_json(lst["items"][item_id]))
+
+    def _get_item(self, match, query, headers, body):
+        lst = self.lists[match["list"]]
+        return StubResponse(200, self._item_json(lst["items"][match["item"]]))
+
+    def _patch_fields(self, match, query, headers, body):
+        lst = self.lists[match["list"]]
+        with self.lock:
+            item = lst["items"][match["item"]]
+            if_match = headers.get("If-Match") or headers.get("if-match")
+            if if_match and if_match not in ("*", self._item_json(item)["eTag"]):
+                self.calls["412"] += 1
+                return StubResponse(412, {"error": {"code": "preconditionFailed", "message": "eTag mismatch"}})
+            item["fields"].update(body or {})
+            item["version"] += 1
+            self.sequence += 1
+            item["sequence"] = self.sequence
+            return StubResponse(200, self._item_json(item)["fields"])
+
+    def _delta(self, match, query, headers, body):
+        lst = self.lists[match["list"]]
+        if query.get("token") == "latest":
+            # Start tracking from now, without the current items
+            delta_link = f"{self.base_url}{match.group(0)}?token={self.sequence}"
+            return StubResponse(200, {"value": [], "@odata.deltaLink": delta_link})
+        since = int(query.get("token", 0))
+        changed = sorted((i for i in lst["items"].values() if i["sequence"] > since), key=lambda i: i["sequence"])
+        data = self._page(changed, query, match.group(0), lambda item: self._item_json(item, True, self._select(query)))
+        data["value"].extend(
+            {"id": item_id, "deleted": {"state": "deleted"}}
+            for item_id, seq in lst["deleted"].items() if seq > since
+        )
+        if "@odata.nextLink" not in data:
+            data["@odata.deltaLink"] = f"{self.base_url}{match.group(0)}?token={self.sequence}"
+        return StubResponse(200, data)
+
+    def _list_subscriptions(self, match, query, headers, body):
+        return StubResponse(200, {"value": list(self.subscriptions.values())})
+
+    def _create_subscription(self, match, query, headers, body):
+        # Graph would first POST ?validationToken= to notificationUrl; the stub trusts it
+        with self.lock:
+            sub_id = str(uuid.uuid4())
+            self.subscriptions[sub_id] = {"id": sub_id, **body}
+            return StubResponse(201, self.subscriptions[sub_id])
+
+    def _renew_subscription(self, match, query, headers, body):
+        with self.lock:
+            sub = self.subscriptions.get(match["sub"])
+            if sub is None:
+                return StubResponse(404, {"error": {"code": "ResourceNotFound", "message": "Subscription not found"}})
+            sub["expirationDateTime"] = body["expirationDateTime"]
+            return StubResponse(200, sub)
+
+    def _drives(self, match, query, headers, body):
+        return StubResponse(200, {"value": [{"id": d["id"], "name": d["name"]} for d in self.drives.values()]})
+
+    def _put_content(self, match, query, headers, body):
+        drive = self.drives[match["drive"]]
+        name = unquote(match["name"])
+        conflict = query.get("@microsoft.graph.conflictBehavior")
+        if conflict == "fail" and name in drive["files"]:
+            return StubResponse(409, {"error": {"code": "nameAlreadyExists"}})
+        content = body if isinstance(body, bytes) else json.dumps(body).encode()
+        drive["files"][name] = content
+        return StubResponse(201, self._drive_item(drive, name, content))
+
+    def _drive_item(self, drive, name, content):
+        return {
+            "id": uuid.uuid5(uuid.NAMESPACE_URL, name).hex,
+            "name": name,
+            "size": len(content),
+            "webUrl": f"https://{SITE_HOST}{SITE_PATH}/{quote(drive['name'])}/{quote(name)}",
+            # Pre-authenticated, like Graph's: the query is the credential
+            "@microsoft.graph.downloadUrl": f"{self.base_url}/download/{quote(name)}?tempauth={uuid.uuid4().hex}",
+        }
+
+    def _create_upload_session(self, match, query, headers, body):
+        drive = self.drives[match["drive"]]
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.upload_sessions[session_id] = {"drive": drive, "name": unquote(match["name"]), "data": bytearray()}
+        upload_url = f"{self.base_url}/upload/{session_id}?tempauth={uuid.uuid4().hex}"
+        return StubResponse(200, {"uploadUrl": upload_url, "nextExpectedRanges": ["0-"]})
+
+    def _upload_status(self, match, query, headers, body):
+        session = self.upload_sessions[match["session"]]
+        return StubResponse(200, {"nextExpectedRanges": [f"{len(session['data'])}-"]})
+
+    def _upload_chunk(self, match, query, headers, body):
+        if headers.get("Authorization") or headers.get("authorization"):
+            return StubResponse(401, {"error": {"code": "unauthenticated", "message": "uploadUrl is pre-authenticated"}})
+        session = self.upload_sessions[match["session"]]
+        content_range = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+)", headers.get("Content-Range", ""))
+        if not content_range:
+            return StubResponse(400, {"error": {"code": "invalidRange"}})
+        start, end, total = (int(g) for g in content_range.groups())
+        chunk = body or b""
+        with self.lock:
+            if start != len(session["data"]) or end - start + 1 != len(chunk):
+                return StubResponse(416, {"error": {"code": "invalidRange"},
+                                          "nextExpectedRanges": [f"{len(session['data'])}-"]})
+            session["data"].extend(chunk)
+            if len(session["data"]) < total:
+                return StubResponse(202, {"nextExpectedRanges": [f"{len(session['data'])}-"]})
+            del self.upload_sessions[match["session"]]
+            content = bytes(session["data"])
+            session["drive"]["files"][session["name"]] = content
+            return StubResponse(201, self._drive_item(session["drive"], session["name"], content))
+
+    def _cancel_upload(self, match, query, headers, body):
+        with self.lock:
+            self.upload_sessions.pop(match["session"], None)
+        return StubResponse(204, b"")
+
+    def _file_by_id(self, drive, item_id):
+        for name, content in drive["files"].items():
+            if uuid.uuid5(uuid.NAMESPACE_URL, name).hex == item_id:
+                return name, content
+        raise KeyError(item_id)
+
+    def _get_drive_item(self, match, query, headers, body):
+        drive = self.drives[match["drive"]]
+        name = unquote(match["name"])
+        return StubResponse(200, self._drive_item(drive, name, drive["files"][name]))
+
+    def _create_workbook_session(self, match, query, headers, body):
+        drive = self.drives[match["drive"]]
+        self._file_by_id(drive, match["item"])
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.workbook_sessions.add(session_id)
+        return StubResponse(201, {"id": session_id, "persistChanges": bool((body or {}).get("persistChanges"))})
+
+    def _add_table_rows(self, match, query, headers, body):
+        from openpyxl import load_workbook
+        from openpyxl.utils import get_column_letter, range_boundaries
+
+        session_id = headers.get("workbook-session-id")
+        if session_id and session_id not in self.workbook_sessions:
+            return StubResponse(404, {"error": {"code": "InvalidSessionReCreatable"}})
+        drive = self.drives[match["drive"]]
+        values = (body or {}).get("values", [])
+        with self.lock:
+            name, content = self._file_by_id(drive, match["item"])
+            workbook = load_workbook(io.BytesIO(content))
+            sheet = next((ws for ws in workbook.worksheets if match["table"] in ws.tables), None)
+            if sheet is None:
+                return StubResponse(404, {"error": {"code": "ItemNotFound", "message": match["table"]}})
+            table = sheet.tables[match["table"]]
+            min_col, min_row, max_col, max_row = range_boundaries(table.ref)
+            index = max_row - min_row
+            for row in values:
+                max_row += 1
+                for offset, value in enumerate(row):
+                    sheet.cell(row=max_row, column=min_col + offset, value=value)
+            table.ref = f"{get_column_letter(min_col)}{min_row}:{get_column_letter(max_col)}{max_row}"
+            if table.autoFilter:
+                table.autoFilter.ref = table.ref
+            out = io.BytesIO()
+            workbook.save(out)
+            drive["files"][name] = out.getvalue()
+        return StubResponse(201, {"index": index, "values": values})
+
+    def _batch(self, match, query, headers, body):
+        requests_ = (body or {}).get("requests", [])
+        if len(requests_) > 20:
+            return StubResponse(400, {"error": {"code": "invalidRequest", "message": "Too many requests in batch"}})
+        responses = []
+        for sub in requests_:
+            sub_headers = dict(headers)
+            sub_headers.update(sub.get("headers") or {})
+            raw = json.dumps(sub["body"]).encode() if "body" in sub else b""
+            resp = self.handle(sub["method"], "/v1.0" + sub["url"], sub_headers, raw, delay=False)
+            responses.append({"id": sub["id"], "status": resp.status, "headers": resp.headers, "body": resp.body})
+        return StubResponse(200, {"responses": responses})
+
+    SITE = r"/v1.0/sites/(?P<site>[^/]+)"
+    LIST = SITE + r"/lists/(?P<list>[^/]+)"
+    ROUTES = [
+        (r"/[^/]+/oauth2/v2\.0/token", "POST", "token", _token),
+        (r"/v1\.0/\$batch", "POST", "batch", _batch),
+        (r"/v1\.0/subscriptions", "GET", "subscriptions", _list_subscriptions),
+        (r"/v1\.0/subscriptions", "POST", "create_subscription", _create_subscription),
+        (r"/v1\.0/subscriptions/(?P<sub>[^/]+)", "PATCH", "renew_subscription", _renew_subscription),
+        (r"/v1\.0/sites/[^/:]+:/.+", "GET", "site", _site),
+        (SITE + r"/lists", "GET", "lists", _lists),
+        (LIST + r"/columns", "GET", "columns", _columns),
+        (LIST + r"/items/delta", "GET", "delta", _delta),
+        (LIST + r"/items", "GET", "list_items", _list_items),
+        (LIST + r"/items", "POST", "create_item", _create),
+        (LIST + r"/items/(?P<item>[^/]+)", "GET", "get_item", _get_item),
+        (LIST + r"/items/(?P<item>[^/]+)/fields", "PATCH", "item_fields", _patch_fields),
+        (SITE + r"/drives", "GET", "drives", _drives),
+        (r"/v1\.0/drives/(?P<drive>[^/]+)/root:/(?P<name>[^:]+):/content", "PUT", "drive_content", _put_content),
+        (r"/v1\.0/drives/(?P<drive>[^/]+)/root:/(?P<name>[^:]+):/createUploadSession", "POST", "upload_session",
+         _create_upload_session),
+        (r"/v1\.0/drives/(?P<drive>[^/]+)/root:/(?P<name>[^:]+):?", "GET", "drive_item", _get_drive_item),
+        (r"/v1\.0/drives/(?P<drive>[^/]+)/items/(?P<item>[^/]+)/workbook/createSession", "POST",
+         "workbook_session", _create_workbook_session),
+        (r"/v1\.0/drives/(?P<drive>[^/]+)/items/(?P<item>[^/]+)/workbook/tables/(?P<table>[^/]+)/rows(?:/add)?",
+         "POST", "workbook_rows", _add_table_rows),
+        (r"/upload/(?P<session>[^/]+)", "PUT", "upload_chunk", _upload_chunk),
+        (r"/upload/(?P<session>[^/]+)", "GET", "upload_status", _upload_status),
+        (r"/upload/(?P<session>[^/]+)", "DELETE", "upload_cancel", _cancel_upload),
+    ]
+
+
+def seed_wellplanaon(stub, list_name, rigs=10, wells_per_rig=50, start="2025-08-01"):
+    """Fill a WellPlanAON list with a back-to-back schedule per rig (W-<rig><nn> wells)."""
+    from datetime import datetime, timedelta
+
+    day = datetime.strptime(start, "%Y-%m-%d")
+    rows = []
+    for rig in range(1, rigs + 1):
+        current = day
+        for well in range(wells_per_rig):
+            duration = 5 + (rig * 7 + well * 3) % 20
+            rows.append({
+                "RigName": f"AD-{rig}",
+                "WellName": f"W-{rig}{well:02d}",
+                "StartDate": current.strftime("%Y-%m-%dT00:00:00Z"),
+                "EndDate": (current + timedelta(days=duration)).strftime("%Y-%m-%dT00:00:00Z"),
+            })
+            current += timedelta(days=duration)
+    stub.add_items(list_name, rows)
+
+
+def default_stub(**options):
+    """Stub with the DDR list, a seeded WellPlanAON list and the output library."""
+    stub = GraphStub(**options)
+    stub.add_list("DDRRecords")
+    stub.add_list("WellPlanAON")
+    stub.add_drive("Reports")
+    seed_wellplanaon(stub, "WellPlanAON")
+    return stub
+
+
+def function_for(stub, journal=False, watermarks=False, **settings):
+    """
+    ExtractPDFDetails pointed at stub as a cold instance: nothing resolved,
+    cached or indexed from an earlier pass (token, connection pool, site, list
+    and drive IDs, indexed columns, WellPlanAON index, daily workbooks, write
+    coalescer). settings are exported as environment variables; like the
+    function's own settings they take effect on the module's first import.
+
+    Benchmarks send the same PDFs again from pass to pass, so the run journal
+    and the watermarks are off unless asked for. journal=True gives a file
+    store in a new, empty temporary directory; journal=<path> gives a file
+    store in that directory, so other processes pointed at it share it. The
+    same goes for watermarks.
+    """
+    os.environ.update(stub.env())
+    os.environ.update({name: str(value) for name, value in settings.items()})
+    os.environ["JOURNAL_BACKEND"] = "file" if journal else "off"
+    os.environ["WATERMARK_BACKEND"] = "file" if watermarks else "off"
+    import ExtractPDFDetails as module
+    from ExtractPDFDetails import journal as journal_module, watermarks as watermark_module
+
+    module.GRAPH_BASE = os.environ["GRAPH_BASE"]
+    module.LOGIN_BASE = os.environ["LOGIN_BASE"]
+    module._session = None
+    module._token_cache.update(access_token=None, expires_at=0.0)
+    for cache in (
+        module._site_id_cache, module._list_id_cache, module._drive_id_cache, module._indexed_columns_cache,
+        module._daily_workbooks, module._workbook_sessions,
+    ):
+        cache.clear()
+    module._wellplanaon_index["rows"] = None
+    module._coalescer = None
+
+    journal_module.JOURNAL_BACKEND = os.environ["JOURNAL_BACKEND"]
+    journal_module._store = journal_module.FileJournalStore(
+        journal if isinstance(journal, str) else tempfile.mkdtemp(prefix="journal-")
+    ) if journal else None
+    watermark_module.WATERMARK_BACKEND = os.environ["WATERMARK_BACKEND"]
+    watermark_module._store = watermark_module.FileWatermarkStore(
+        watermarks if isinstance(watermarks, str) else tempfile.mkdtemp(prefix="watermarks-")
+    ) if watermarks else None
+    return module
+
+
+def post_pdf(module, pdf_bytes, params=None, headers=None):
+    """
+    POST pdf_bytes to module.main(); returns (status, body, headers, seconds)
+    with the JSON body decoded when there is one. Its prints are not silenced
+    here (redirecting stdout from several threads at once is unsafe): wrap
+    whole runs in quiet().
+    """
+    import azure.functions as func
+
+    req = func.HttpRequest("POST", "/api/ExtractPDFDetails", body=pdf_bytes, params=params or {}, headers=headers or {})
+    started = time.perf_counter()
+    resp = module.main(req)
+    elapsed = time.perf_counter() - started
+    body = resp.get_body()
+    try:
+        body = json.loads(body)
+    except ValueError:
+        body = body.decode(errors="replace")
+    return resp.status_code, body, resp.headers, elapsed
+
+
+def quiet():
+    """Silence the function's prints for the duration of a with block."""
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--unavailable-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--retry-after", type=int, default=0)
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="fraction of requests stalled")
+    parser.add_argument("--stall-ms", type=float, default=3000.0)
+    parser.add_argument("--page-size", type=int, default=200)
+    args = parser.parse_args()
+    stub = default_stub(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        throttle_rate=args.throttle_rate,
+        unavailable_rate=args.unavailable_rate,
+        retry_after=args.retry_after,
+        page_size=args.page_size,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+    ).start(port=args.port)
+    for key, value in stub.env().items():
+        print(f"{key}={value}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        stub.stop()
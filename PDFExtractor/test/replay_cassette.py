@@ -0,0 +1,92 @@
+"""
+Record Graph traffic into a cassette, or replay a cassette offline.
+
+Recording runs main() once on a PDF with GRAPH_CASSETTE_MODE=record against
+whatever GRAPH_BASE points at (production or the local stub); credentials and
+tokens are redacted. Replaying serves the recorded responses back with
+GRAPH_CASSETTE_MODE=replay, so sync strategies can be timed A/B against the
+exact same list contents. Writes a strategy did not record (e.g. $batch vs
+per-item PATCH) are answered with the median recorded write latency; reads
+must have been recorded, so a strategy that reads differently (cascade reads
+whole rig schedules) needs a cassette recorded with that strategy.
+
+Usage:
+    python test/replay_cassette.py record run.jsonl ddr.pdf
+    python test/replay_cassette.py replay run.jsonl ddr.pdf --strategy per-item --strategy cascade --timing
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+# Request parameters selecting each sync strategy
+STRATEGIES = {
+    "per-item": {},
+    "cascade": {"cascade": "true"},
+}
+
+
+def run(pdf_bytes, params):
+    import azure.functions as func
+    import ExtractPDFDetails
+
+    req = func.HttpRequest("POST", "/api/ExtractPDFDetails", body=pdf_bytes, params=params)
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        resp = ExtractPDFDetails.main(req)
+        elapsed = time.perf_counter() - started
+    body = resp.get_body()
+    return resp.status_code, (json.loads(body) if resp.status_code == 200 else body.decode()), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("action", choices=["record", "replay"])
+    parser.add_argument("cassette")
+    parser.add_argument("pdf")
+    parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES))
+    parser.add_argument("--timing", action="store_true", help="replay with the recorded response times")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    os.environ["GRAPH_CASSETTE_MODE"] = args.action
+    # Replays repeat the same PDF; the run journal would answer them without any Graph traffic
+    # and the watermarks would skip all of its wells
+    os.environ["JOURNAL_BACKEND"] = "off"
+    os.environ["WATERMARK_BACKEND"] = "off"
+    os.environ["GRAPH_CASSETTE_PATH"] = args.cassette
+    os.environ["GRAPH_CASSETTE_REPLAY_TIMING"] = "true" if args.timing else "false"
+    from ExtractPDFDetails.cassette import active_cassette
+
+    with open(args.pdf, "rb") as f:
+        pdf_bytes = f.read()
+
+    strategies = args.strategy or ["per-item"]
+    if args.action == "record":
+        status, result, elapsed = run(pdf_bytes, STRATEGIES[strategies[0]])
+        print(f"recorded {args.cassette}: status={status} in {elapsed:.3f}s")
+        return
+
+    for strategy in strategies:
+        for attempt in range(args.repeat):
+            active_cassette().reset()
+            status, result, elapsed = run(pdf_bytes, STRATEGIES[strategy])
+            if status != 200:
+                print(f"{strategy:>10} #{attempt + 1}: status={status} {result[:200]}")
+                continue
+            metrics = result["metrics"]
+            print(
+                f"{strategy:>10} #{attempt + 1}: {elapsed:.3f}s graph_calls={metrics['graph_calls']} "
+                f"updates={result.get('wellplanaon_updates')} "
+                + " ".join(f"{name}={s['wall_ms']}ms" for name, s in metrics["stages"].items())
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Graph change-notification simulator.
+
+With --url, posts what Graph would to a running ListNotifications function: a
+subscription validation request (checks the token is echoed back) and then a
+change notification for each --lists list of the local Graph stub's site.
+
+Without --url, runs the whole flow in-process against the local Graph stub and
+checks it:
+  - sync_subscriptions creates one subscription per list, and renews them
+    (no duplicates) when run again,
+  - ListNotifications echoes the validation token,
+  - notifications are acknowledged (202) before their catch-up work runs,
+  - a WellPlanAON index kept for an hour serves edited items stale until a
+    notification arrives, and current ones right after (with and without a
+    snapshot),
+  - a DDR item edited in SharePoint loses its watermark on notification, while
+    items the function pushed itself keep theirs,
+  - notifications with the wrong clientState change nothing.
+Exits non-zero on any failed check.
+
+Usage:
+    python test/simulate_notifications.py
+    python test/simulate_notifications.py --url "http://localhost:7071/api/ListNotifications?code=..." \\
+        --client-state secret --lists WellPlanAON DDRRecords
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The functions are imported as PDFExtractor.<function>, as the host loads them
+sys.path.insert(0, os.path.dirname(os.path.dirname(HERE)))
+sys.path.insert(0, HERE)
+
+from graph_stub import GraphStub, default_stub  # noqa: E402
+
+
+def stub_resource(list_name):
+    # The stub derives its site and list IDs from fixed values, so a running stub has these
+    stub = GraphStub()
+    return f"sites/{stub.site_id}/lists/{uuid.uuid5(uuid.NAMESPACE_URL, list_name)}"
+
+
+def sample_notifications(resources, client_state):
+    """A Graph change-notification POST body with one notification per resource."""
+    return {"value": [
+        {
+            "subscriptionId": str(uuid.uuid4()),
+            "clientState": client_state,
+            "changeType": "updated",
+            "resource": resource,
+            "tenantId": "stub-tenant",
+            "subscriptionExpirationDateTime": "2099-01-01T00:00:00Z",
+        }
+        for resource in resources
+    ]}
+
+
+def post_to_url(args):
+    token = f"validation-{uuid.uuid4()}"
+    sep = "&" if "?" in args.url else "?"
+    req = urllib.request.Request(
+        f"{args.url}{sep}validationToken={urllib.parse.quote(token)}", data=b"", method="POST",
+        headers={"Content-Type": "text/plain"},
+    )
+    with urllib.request.urlopen(req) as resp:
+        echoed = resp.read().decode()
+    print(f"validation: {'OK' if echoed == token else 'FAIL (got ' + echoed[:80] + ')'}")
+    body = sample_notifications([stub_resource(name) for name in args.lists], args.client_state)
+    req = urllib.request.Request(
+        args.url, data=json.dumps(body).encode(), method="POST", headers={"Content-Type": "application/json"}
+    )
+    started = time.perf_counter()
+    with urllib.request.urlopen(req) as resp:
+        print(f"notification: {resp.status} in {(time.perf_counter() - started) * 1000:.0f}ms {resp.read().decode()}")
+    return echoed == token
+
+
+def notify(module, notify_main, body, acknowledged=None):
+    """
+    Post body to ListNotifications and wait for the catch-up it queued. Returns
+    the status, the ms until the response, and the catch-up's summaries.
+    acknowledged, if given, is called as soon as the response is back.
+    """
+    import azure.functions as func
+
+    req = func.HttpRequest(
+        "POST", "/api/ListNotifications", body=json.dumps(body).encode(), headers={"Content-Type": "application/json"}
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        resp = notify_main(req)
+        ack_ms = (time.perf_counter() - started) * 1000
+        if acknowledged:
+            acknowledged()
+        done, handled = module.notification_catch_up().wait(timeout=60)
+    if not done:
+        raise RuntimeError("change-notification catch-up did not finish within 60s")
+    return resp.status_code, ack_ms, handled
+
+
+def stale_rows(module, stub, item_ids):
+    # Items whose dates the lookup answers differently from the list itself
+    items = stub.list_by_name("WellPlanAON")["items"]
+    records = [{"Rig": items[i]["fields"]["RigName"], "NextLOC": items[i]["fields"]["WellName"]} for i in item_ids]
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = {row["ID"]: row for row in module.fetch_wellplanaon_rows(records)}
+    return sum(rows[i]["StartDate"] != items[i]["fields"]["StartDate"] for i in item_ids)
+
+
+def run_in_process(args):
+    stub = default_stub(latency_ms=args.latency_ms).start()
+    os.environ.update(stub.env())
+    os.environ["GRAPH_NOTIFICATION_URL"] = "https://example.invalid/api/ListNotifications?code=stub"
+    os.environ["GRAPH_NOTIFICATION_CLIENT_STATE"] = args.client_state
+    os.environ["GRAPH_DELTA_LINK_DIR"] = tempfile.mkdtemp(prefix="delta-")
+    os.environ["WATERMARK_DIR"] = tempfile.mkdtemp(prefix="watermarks-")
+    from PDFExtractor import ExtractPDFDetails as module
+    from PDFExtractor.ExtractPDFDetails import snapshot, watermarks
+    from PDFExtractor.ListNotifications import main as notify_main
+
+    # Lookups are served from an index kept for an hour; only notifications keep it current
+    module.WELLPLANAON_INDEX_TTL = 3600
+    module.WELLPLANAON_QUERY_MODE = "scan"
+    checks = []
+
+    def check(name, ok, detail=""):
+        checks.append(ok)
+        print(f"{'OK  ' if ok else 'FAIL'} {name} {detail}")
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            first = module.sync_subscriptions()
+            second = module.sync_subscriptions()
+        check("subscriptions created", sorted(s["action"] for s in first.values()) == ["created", "created"], first)
+        check(
+            "subscriptions renewed",
+            len(stub.subscriptions) == 2 and all(s["action"] == "renewed" for s in second.values()),
+            f"({len(stub.subscriptions)} in Graph)",
+        )
+
+        import azure.functions as func
+
+        validation = func.HttpRequest("POST", "/api/ListNotifications", body=b"", params={"validationToken": "abc 123"})
+        resp = notify_main(validation)
+        check("validation token echoed", resp.status_code == 200 and resp.get_body() == b"abc 123")
+
+        wellplanaon = stub_resource("WellPlanAON")
+        items = stub.list_by_name("WellPlanAON")["items"]
+        for use_snapshot in (False, True):
+            snapshot.WELLPLANAON_SNAPSHOT_PATH = (
+                os.path.join(tempfile.mkdtemp(prefix="snapshot-"), "wellplanaon.sqlite") if use_snapshot else ""
+            )
+            snapshot._snapshot = None
+            module._wellplanaon_index["rows"] = None
+            edited = [str(i) for i in range(1 + use_snapshot * 40, 11 + use_snapshot * 40)]
+            with contextlib.redirect_stdout(io.StringIO()):
+                module.load_wellplanaon_index()
+            for item_id in edited:
+                stub.edit_item("WellPlanAON", item_id, StartDate="2031-01-01T00:00:00Z")
+            before = stale_rows(module, stub, edited)
+            notify(module, notify_main, sample_notifications([wellplanaon], "wrong-secret"))
+            ignored = stale_rows(module, stub, edited)
+            requests_before, deltas_before = stub.http_requests, stub.calls["delta"]
+            # Delta pulls wait at a gate until the 202 is back, so the catch-up can't finish first
+            gate = stub.gates["delta"] = threading.Event()
+            at_ack = {}
+
+            def acknowledged():
+                at_ack["pending"] = not module.notification_catch_up().wait(timeout=0)[0]
+                at_ack["deltas"] = stub.calls["delta"] - deltas_before
+                gate.set()
+
+            started = time.perf_counter()
+            status, ack_ms, handled = notify(
+                module, notify_main, sample_notifications([wellplanaon] * 3, args.client_state), acknowledged
+            )
+            del stub.gates["delta"]
+            handled_ms = (time.perf_counter() - started) * 1000
+            handled_requests = stub.http_requests - requests_before
+            after = stale_rows(module, stub, edited)
+            label = "snapshot" if use_snapshot else "no snapshot"
+            check(
+                f"WellPlanAON edits current after notification ({label})",
+                before == len(edited) and ignored == len(edited) and after == 0 and status == 202,
+                f"stale before={before} after wrong clientState={ignored} after={after}; "
+                f"handled in {handled_ms:.0f}ms with {handled_requests} request(s) {handled}",
+            )
+            if use_snapshot:
+                check(
+                    "notification acknowledged before its catch-up",
+                    status == 202 and at_ack["pending"] and at_ack["deltas"] == 0 and stub.calls["delta"] > deltas_before,
+                    f"202 in {ack_ms:.1f}ms with the catch-up {'pending' if at_ack['pending'] else 'done'} "
+                    f"and {at_ack['deltas']} delta request(s) served; catch-up {handled_ms:.0f}ms",
+                )
+
+        # A DDR run pushes and watermarks some wells; then a planner edits one of their items
+        records = [
+            {"Rig": "AD-1", "Well": f"N-{n}", "Date": "01/09/2025", "NextLOC": "W-101", "NextMoveDate": "05/09/2025"}
+            for n in range(5)
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            module.push_to_sharepoint(records)
+        watermarks.open_watermarks().commit(records)
+        ddr_items = stub.list_by_name("DDRRecords")["items"]
+        edited_id = next(i for i, item in ddr_items.items() if item["fields"]["Well"] == "N-2")
+        stub.edit_item("DDRRecords", edited_id, NextLOC="W-150")
+        _, _, handled = notify(module, notify_main, sample_notifications([stub_resource("DDRRecords")], args.client_state))
+        changed = [r["Well"] for r in watermarks.open_watermarks().changed(records)]
+        check(
+            "edited DDR item loses its watermark",
+            changed == ["N-2"],
+            f"wells to sync again: {changed}; {handled}",
+        )
+    finally:
+        stub.stop()
+    return all(checks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="ListNotifications URL of a running function (omit to run in-process)")
+    parser.add_argument("--client-state", default="stub-client-state")
+    parser.add_argument("--lists", nargs="+", default=["WellPlanAON", "DDRRecords"])
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    ok = post_to_url(args) if args.url else run_in_process(args)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Concurrency stress test: many main() calls at once in one process.
+
+Runs --requests distinct DDR PDFs through main() on --threads threads (as the
+Functions host does with PYTHON_THREADPOOL_THREAD_COUNT), from a cold module
+state, against the local Graph stub. For each thread count it checks that:
+  - every invocation succeeded,
+  - the DDR items created are exactly the extracted records of every PDF (no
+    lost, duplicated or cross-contaminated rows),
+  - the token, site and lists were fetched once despite the concurrent cold start,
+and reports PDFs/sec. Exits non-zero on any failed check.
+
+Usage:
+    python test/stress_concurrency.py --requests 16 --threads 1 4 8 --wells 20 --latency-ms 30
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from ddr_generator import generate_ddr_pdf  # noqa: E402
+from graph_stub import default_stub, function_for, post_pdf, quiet  # noqa: E402
+
+
+def invoke(module, pdf_bytes):
+    return post_pdf(module, pdf_bytes)[0]
+
+
+def expected_items(records):
+    # push_to_sharepoint creates one item per distinct well, first occurrence wins
+    by_well = {}
+    for record in records:
+        by_well.setdefault(record["Well"], record)
+    return Counter((r["Well"], r["Rig"], r["Date"], r["NextLOC"]) for r in by_well.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=16)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--wells", type=int, default=20, help="DDR pages per PDF")
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    args = parser.parse_args()
+
+    generated = [generate_ddr_pdf(args.wells, noise=0.1, seed=seed) for seed in range(args.requests)]
+    pdfs = [pdf for pdf, _ in generated]
+    expected = sum((expected_items(records) for _, records in generated), Counter())
+
+    failed = False
+    baseline = None
+    for threads in args.threads:
+        stub = default_stub(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+        # Cold instance for every pass; measure raw concurrency: let every request queue
+        # for extraction rather than get a 429
+        ExtractPDFDetails = function_for(stub, ADMISSION_QUEUE_SECONDS=600)
+        try:
+            with quiet():
+                started = time.perf_counter()
+                with ThreadPoolExecutor(threads) as pool:
+                    statuses = list(pool.map(lambda pdf: invoke(ExtractPDFDetails, pdf), pdfs))
+                elapsed = time.perf_counter() - started
+        finally:
+            stub.stop()
+
+        items = stub.list_by_name("DDRRecords")["items"].values()
+        created = Counter(
+            (i["fields"]["Well"], i["fields"]["Rig"], i["fields"]["Title"], i["fields"]["NextLOC"]) for i in items
+        )
+        problems = []
+        if any(status != 200 for status in statuses):
+            problems.append(f"statuses {Counter(statuses)}")
+        if created != expected:
+            missing = sum((expected - created).values())
+            extra = sum((created - expected).values())
+            problems.append(f"DDR items differ from the extracted records ({missing} missing, {extra} unexpected)")
+        for endpoint in ("token", "site", "lists"):
+            if stub.calls[endpoint] != 1:
+                problems.append(f"{endpoint} fetched {stub.calls[endpoint]} times")
+        rate = len(pdfs) / elapsed
+        baseline = baseline or rate
+        print(
+            f"threads={threads:<3} {len(pdfs)} PDFs in {elapsed:6.2f}s  {rate:5.2f} PDFs/s "
+            f"(x{rate / baseline:.2f})  requests={stub.http_requests:<5} "
+            + ("OK" if not problems else "FAIL: " + "; ".join(problems))
+        )
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()